@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Audio Ring Buffer
+Fixed-capacity, array-backed storage for a room's recent audio samples
+
+Samples live in one preallocated float64 array with a row per field. Every
+sample is written twice (at position p and p + capacity), so the most recent n
+samples are always a contiguous slice and can be handed out as zero-copy views.
+"""
+
+from typing import Dict, Any, List
+
+import numpy as np
+
+# Row of each field in the storage array
+LEFT = 0
+RIGHT = 1
+DIFFERENCE = 2
+AVERAGE = 3
+TIMESTAMP = 4
+FIELDS = ('leftMic', 'rightMic', 'difference', 'averageLevel', 'timestamp')
+
+
+class AudioRingBuffer:
+    """Ring buffer of (leftMic, rightMic, difference, averageLevel, timestamp) samples"""
+
+    __slots__ = ('capacity', '_data', '_write', '_size')
+
+    def __init__(self, capacity: int = 150):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._data = np.zeros((len(FIELDS), 2 * capacity), dtype=np.float64)
+        self._write = 0  # Next write position in [0, capacity)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def maxlen(self) -> int:
+        """Capacity, named like deque.maxlen"""
+        return self.capacity
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the sample storage"""
+        return self._data.nbytes
+
+    def clear(self):
+        self._write = 0
+        self._size = 0
+
+    def append(self, left: float, right: float, difference: float, average: float, timestamp: float):
+        """Add one sample, overwriting the oldest when full"""
+        data = self._data
+        pos = self._write
+        mirror = pos + self.capacity
+        data[LEFT, pos] = data[LEFT, mirror] = left
+        data[RIGHT, pos] = data[RIGHT, mirror] = right
+        data[DIFFERENCE, pos] = data[DIFFERENCE, mirror] = difference
+        data[AVERAGE, pos] = data[AVERAGE, mirror] = average
+        data[TIMESTAMP, pos] = data[TIMESTAMP, mirror] = timestamp
+
+        self._write = pos + 1 if pos + 1 < self.capacity else 0
+        if self._size < self.capacity:
+            self._size += 1
+
+    def extend(self, columns: np.ndarray):
+        """Add several samples given as a (5, k) array in FIELDS order"""
+        count = columns.shape[1]
+        if count == 0:
+            return
+        if count > self.capacity:
+            columns = columns[:, -self.capacity:]
+            self._write = (self._write + count - self.capacity) % self.capacity
+            count = self.capacity
+
+        positions = (self._write + np.arange(count)) % self.capacity
+        self._data[:, positions] = columns
+        self._data[:, positions + self.capacity] = columns
+        self._write = (self._write + count) % self.capacity
+        self._size = min(self.capacity, self._size + count)
+
+    def window(self, n: int = None) -> np.ndarray:
+        """Zero-copy (5, n) view of the most recent n samples (default: all), oldest first"""
+        n = self._size if n is None else min(n, self._size)
+        end = self._write + self.capacity
+        return self._data[:, end - n:end]
+
+    def left(self, n: int = None) -> np.ndarray:
+        return self.window(n)[LEFT]
+
+    def right(self, n: int = None) -> np.ndarray:
+        return self.window(n)[RIGHT]
+
+    def differences(self, n: int = None) -> np.ndarray:
+        return self.window(n)[DIFFERENCE]
+
+    def levels(self, n: int = None) -> np.ndarray:
+        return self.window(n)[AVERAGE]
+
+    def timestamps(self, n: int = None) -> np.ndarray:
+        return self.window(n)[TIMESTAMP]
+
+    def value(self, field: int, index: int) -> float:
+        """One field of the sample at index (0 = oldest, -1 = newest)"""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ring buffer index out of range")
+        return float(self._data[field, self._write + self.capacity - self._size + index])
+
+    def to_dicts(self, n: int = None) -> List[Dict[str, Any]]:
+        """Most recent samples as dicts (for export, not for the hot path)"""
+        window = self.window(n)
+        return [dict(zip(FIELDS, column)) for column in window.T.tolist()]
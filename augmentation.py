@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+Data Augmentation
+Vectorized, parallel version of the MeetingAudioAugmenter in data_augmenter.ipynb
+
+Each original recording (recordings/<session_id>_audio.json with
+labels/<session_id>_labels.json, listed in labels/sessions_master.csv) is
+loaded once into NumPy columns. Its variants go through the notebook's chain
+(time stretch, pitch shift, stereo position, background noise, energy level,
+turn-taking) as (variants, samples) matrices: variants sharing a stretch
+factor are stretched once and every other step updates all of their rows in
+a few array operations. Random draws come from one NumPy generator per
+variant, seeded from (seed, recording, variant), so results are deterministic
+for a fixed seed whatever the number of processes or the order they finish in.
+Recordings are spread over a process pool and written as they complete.
+
+Output formats:
+    columns   a directory of raw column files, as NumPy reads them with
+              np.memmap (see load_augmented); one row per sample, with
+              session_index pointing into labels.jsonl
+    json      the notebook's layout: <id>_audio.json and <id>_labels.json per variant
+
+Both write augmented_sessions_master.csv as the notebook did.
+
+Usage:
+    python augmentation.py --data-dir ./ --seed 0 --jobs 8
+    python augmentation.py --format json --output augmented_data
+"""
+
+import os
+import sys
+import csv
+import copy
+import json
+import time
+import shutil
+import logging
+import argparse
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+AUGMENTED_FORMAT = 1
+MANIFEST_NAME = 'manifest.json'
+LABELS_NAME = 'labels.jsonl'
+MASTER_CSV_NAME = 'augmented_sessions_master.csv'
+DEFAULT_VARIANTS = 60
+
+# Sample columns of the output (float64), besides the int32 session_index
+COLUMNS = ('leftMic', 'rightMic', 'difference', 'averageLevel', 'timestamp', 'local_timestamp')
+LEVEL_COLUMNS = ('leftMic', 'rightMic', 'difference', 'averageLevel')
+
+# Augmentation parameter choices of the notebook
+TIME_STRETCHES = (0.8, 0.9, 1.0, 1.1, 1.2)
+PITCH_SHIFTS = (-2, -1, 0, 1, 2)
+STEREO_POSITIONS = (-0.6, -0.3, 0, 0.3, 0.6)
+BACKGROUND_NOISES = ('none', 'low', 'medium', 'high')
+ENERGY_LEVELS = ('low', 'medium', 'high')
+MEETING_TYPES = ('discussion', 'presentation', 'brainstorm', 'argument')
+
+NOISE_RANGES = {'low': (1, 3), 'medium': (3, 6), 'high': (6, 10)}  # dB added per sample
+ENERGY_ADJUSTMENTS = {'low': (0.8, 0.6), 'high': (1.2, 1.4)}  # (volume, variation) multipliers
+MIN_STRETCHED_LENGTH = 10
+
+MASTER_CSV_FIELDS = ('session_id', 'start_time', 'duration_seconds', 'sample_count', 'speaker_count',
+                     'meeting_type', 'energy_level', 'background_noise', 'original_session_id', 'notes')
+
+
+class Recording:
+    """Sample columns and labels of one original recording"""
+
+    def __init__(self, session_id: str, columns: Dict[str, np.ndarray], local_datetime: List[str],
+                 labels: Dict[str, Any]):
+        self.session_id = session_id
+        self.columns = columns
+        self.local_datetime = local_datetime
+        self.labels = labels
+
+    @classmethod
+    def load(cls, session_id: str, audio_file: Path, labels_file: Path) -> 'Recording':
+        with open(audio_file, 'r') as f:
+            samples = json.load(f)
+        with open(labels_file, 'r') as f:
+            labels = json.load(f)
+        columns = {name: np.array([sample[name] for sample in samples], dtype=np.float64) for name in COLUMNS}
+        return cls(session_id, columns, [sample.get('local_datetime', '') for sample in samples], labels)
+
+    def __len__(self) -> int:
+        return len(self.columns['leftMic'])
+
+
+def generate_variations(count: int, seed: int) -> List[Dict[str, Any]]:
+    """Augmentation parameters shared by every recording, drawn as the notebook does"""
+    rng = np.random.default_rng(seed)
+    choices = (('time_stretch', TIME_STRETCHES), ('pitch_shift', PITCH_SHIFTS),
+               ('stereo_position', STEREO_POSITIONS), ('background_noise', BACKGROUND_NOISES),
+               ('energy_level', ENERGY_LEVELS), ('meeting_type', MEETING_TYPES))
+    return [{name: options[rng.integers(len(options))] for name, options in choices} for _ in range(count)]
+
+
+def variant_rng(seed: int, recording_index: int, variant_index: int) -> np.random.Generator:
+    """Random stream of one variant of one recording, independent of every other"""
+    return np.random.default_rng([seed, recording_index, variant_index])
+
+
+def time_stretch(columns: Dict[str, np.ndarray], factor: float) -> Optional[Dict[str, np.ndarray]]:
+    """Linearly resampled columns, or None where the notebook keeps the recording as it is"""
+    length = len(columns['leftMic'])
+    new_length = int(length / factor)
+    if factor == 1.0 or new_length < MIN_STRETCHED_LENGTH:
+        return None
+
+    positions = np.linspace(0, length - 1, new_length)
+    indices = np.arange(length)
+    left = np.interp(positions, indices, columns['leftMic'])
+    right = np.interp(positions, indices, columns['rightMic'])
+    steps = np.arange(new_length)
+    return {
+        'leftMic': left,
+        'rightMic': right,
+        'difference': left - right,
+        'averageLevel': (left + right) / 2,
+        'timestamp': columns['timestamp'][0] + steps * 1000.0,  # Approximate timestamps, as in the notebook
+        'local_timestamp': columns['local_timestamp'][0] + steps
+    }
+
+
+class VariantBatch:
+    """Level columns of several variants of the same length as (variants, samples) matrices"""
+
+    def __init__(self, columns: Dict[str, np.ndarray], variations: List[Dict[str, Any]],
+                 rngs: List[np.random.Generator]):
+        self.levels = {name: np.tile(columns[name], (len(variations), 1)) for name in LEVEL_COLUMNS}
+        self.variations = variations
+        self.rngs = rngs
+        self.length = len(columns['leftMic'])
+
+    def rows(self, key: str, active) -> np.ndarray:
+        return np.array([index for index, variation in enumerate(self.variations) if active(variation[key])],
+                        dtype=np.intp)
+
+    def parameter(self, rows: np.ndarray, key: str, transform=float) -> np.ndarray:
+        """Per-row parameter as a column vector"""
+        return np.array([transform(self.variations[row][key]) for row in rows], dtype=np.float64)[:, np.newaxis]
+
+    def uniform(self, rows: np.ndarray, shape: Tuple[int, ...]) -> np.ndarray:
+        """One block of uniform draws per row, from that row's own generator"""
+        return np.stack([self.rngs[row].random(shape) for row in rows])
+
+    def store(self, rows: np.ndarray, left: np.ndarray, right: np.ndarray, difference: bool = True):
+        levels = self.levels
+        levels['leftMic'][rows] = left
+        levels['rightMic'][rows] = right
+        if difference:
+            levels['difference'][rows] = left - right
+        levels['averageLevel'][rows] = (left + right) / 2
+
+    def pitch_shift(self):
+        """Scale levels by the pitch ratio with +-5% jitter per sample (simulates other voices)"""
+        rows = self.rows('pitch_shift', lambda shift: shift != 0)
+        if not len(rows):
+            return
+        ratio = 2 ** (self.parameter(rows, 'pitch_shift') / 12.0)
+        jitter = 0.95 + 0.1 * self.uniform(rows, (self.length, 2))
+        left = np.clip(self.levels['leftMic'][rows] * jitter[..., 0] * ratio, 20, 90)
+        right = np.clip(self.levels['rightMic'][rows] * jitter[..., 1] * ratio, 20, 90)
+        self.store(rows, left, right)
+
+    def stereo_position(self):
+        """Move the speaker left (negative) or right (positive)"""
+        rows = self.rows('stereo_position', lambda position: position != 0)
+        if not len(rows):
+            return
+        position = self.parameter(rows, 'stereo_position')
+        toward_right = position > 0
+        left_gain = np.where(toward_right, 1 - position * 0.3, 1 + np.abs(position) * 0.2)
+        right_gain = np.where(toward_right, 1 + position * 0.2, 1 - np.abs(position) * 0.3)
+        self.store(rows, self.levels['leftMic'][rows] * left_gain, self.levels['rightMic'][rows] * right_gain)
+
+    def background_noise(self):
+        """Add uniform noise in the dB range of the noise level"""
+        rows = self.rows('background_noise', lambda level: level in NOISE_RANGES)
+        if not len(rows):
+            return
+        low = self.parameter(rows, 'background_noise', lambda level: NOISE_RANGES[level][0])[..., np.newaxis]
+        high = self.parameter(rows, 'background_noise', lambda level: NOISE_RANGES[level][1])[..., np.newaxis]
+        noise = low + (high - low) * self.uniform(rows, (self.length, 2))
+        self.store(rows, self.levels['leftMic'][rows] + noise[..., 0], self.levels['rightMic'][rows] + noise[..., 1])
+
+    def energy_level(self):
+        """Scale volume and spread around the recording's mean level"""
+        rows = self.rows('energy_level', lambda level: level in ENERGY_ADJUSTMENTS)
+        if not len(rows):
+            return
+        volume = self.parameter(rows, 'energy_level', lambda level: ENERGY_ADJUSTMENTS[level][0])
+        variation = self.parameter(rows, 'energy_level', lambda level: ENERGY_ADJUSTMENTS[level][1])
+        mean = self.levels['averageLevel'][rows].mean(axis=1, keepdims=True)
+        left = np.clip(((self.levels['leftMic'][rows] - mean) * variation + mean) * volume, 25, 85)
+        right = np.clip(((self.levels['rightMic'][rows] - mean) * variation + mean) * volume, 25, 85)
+        self.store(rows, left, right)
+
+    def turn_taking(self):
+        """Speaker patterns of the target meeting type"""
+        left_levels, right_levels = self.levels['leftMic'], self.levels['rightMic']
+
+        # Brainstorm: 15% of samples (after the first) swap sides
+        rows = self.rows('meeting_type', lambda kind: kind == 'brainstorm')
+        if len(rows):
+            swap = np.zeros((len(rows), self.length), dtype=bool)
+            swap[:, 1:] = self.uniform(rows, (max(self.length - 1, 0),)) < 0.15
+            left, right = left_levels[rows], right_levels[rows]
+            self.store(rows, np.where(swap, right, left), np.where(swap, left, right))
+
+        # Presentation: one side dominates 80% of samples
+        rows = self.rows('meeting_type', lambda kind: kind == 'presentation')
+        if len(rows):
+            dominant_left = np.array([self.rngs[row].integers(2) == 0 for row in rows])[:, np.newaxis]
+            dominant = self.uniform(rows, (self.length,)) < 0.8
+            left = np.where(dominant, left_levels[rows] * np.where(dominant_left, 1.3, 0.7), left_levels[rows])
+            right = np.where(dominant, right_levels[rows] * np.where(dominant_left, 0.7, 1.3), right_levels[rows])
+            difference = self.levels['difference'][rows]
+            average = self.levels['averageLevel'][rows]
+            self.store(rows, left, right)
+            # Samples the speaker did not dominate keep their previous difference and average
+            self.levels['difference'][rows] = np.where(dominant, left - right, difference)
+            self.levels['averageLevel'][rows] = np.where(dominant, (left + right) / 2, average)
+
+        # Argument: 25% of samples overlap, both sides 20% louder (the notebook leaves difference as it was)
+        rows = self.rows('meeting_type', lambda kind: kind == 'argument')
+        if len(rows):
+            overlap = self.uniform(rows, (self.length,)) < 0.25
+            average = self.levels['averageLevel'][rows]
+            left = np.where(overlap, left_levels[rows] * 1.2, left_levels[rows])
+            right = np.where(overlap, right_levels[rows] * 1.2, right_levels[rows])
+            self.store(rows, left, right, difference=False)
+            self.levels['averageLevel'][rows] = np.where(overlap, (left + right) / 2, average)
+
+    def apply(self) -> Dict[str, np.ndarray]:
+        """Run the chain after the time stretch, in the notebook's order"""
+        self.pitch_shift()
+        self.stereo_position()
+        self.background_noise()
+        self.energy_level()
+        self.turn_taking()
+        return self.levels
+
+
+def variant_labels(labels: Dict[str, Any], variation: Dict[str, Any], sample_count: int,
+                   session_id: str, original_session_id: str, generated_time: str) -> Dict[str, Any]:
+    """Labels of one variant: the original labels updated with the augmentation's effects"""
+    new_labels = copy.deepcopy(labels)
+    new_labels['energy_level'] = variation['energy_level']
+    new_labels['background_noise'] = variation['background_noise']
+    new_labels['meeting_type'] = variation['meeting_type']
+    new_labels['sample_count'] = sample_count
+    if 'duration_seconds' in labels:
+        new_labels['duration_seconds'] = labels['duration_seconds'] / variation['time_stretch']
+    new_labels['session_id'] = session_id
+    new_labels['original_session_id'] = original_session_id
+    new_labels['augmentation_params'] = variation
+    new_labels['generated_time'] = generated_time
+    return new_labels
+
+
+def augment_recording(recording: Recording, recording_index: int, variations: List[Dict[str, Any]],
+                      seed: int, generated_time: str) -> List[Dict[str, Any]]:
+    """Every variant of one recording: {'session_id', 'columns', 'labels', 'stretched'} in variation order"""
+    groups: Dict[float, List[int]] = {}
+    for index, variation in enumerate(variations):
+        groups.setdefault(variation['time_stretch'], []).append(index)
+
+    variants: List[Optional[Dict[str, Any]]] = [None] * len(variations)
+    for factor, indices in groups.items():
+        stretched = time_stretch(recording.columns, factor)
+        base = stretched if stretched is not None else recording.columns
+        batch = VariantBatch(base, [variations[index] for index in indices],
+                             [variant_rng(seed, recording_index, index) for index in indices])
+        levels = batch.apply()
+        for row, index in enumerate(indices):
+            columns = {name: levels[name][row] for name in LEVEL_COLUMNS}
+            columns['timestamp'] = base['timestamp']
+            columns['local_timestamp'] = base['local_timestamp']
+            session_id = f"{recording.session_id}_aug_{index:03d}"
+            variants[index] = {
+                'session_id': session_id,
+                'columns': columns,
+                'labels': variant_labels(recording.labels, variations[index], len(columns['leftMic']),
+                                         session_id, recording.session_id, generated_time),
+                'stretched': stretched is not None
+            }
+    return variants
+
+
+def _worker_augment(task: Tuple) -> Dict[str, Any]:
+    """Load and augment one recording inside a pool worker; errors are returned, not raised"""
+    recording_index, session_id, audio_file, labels_file, variations, seed, generated_time = task
+    try:
+        recording = Recording.load(session_id, audio_file, labels_file)
+        return {
+            'session_id': session_id,
+            'samples': len(recording),
+            'local_datetime': recording.local_datetime,
+            'variants': augment_recording(recording, recording_index, variations, seed, generated_time)
+        }
+    except Exception as e:
+        return {'session_id': session_id, 'error': f"{type(e).__name__}: {e}"}
+
+
+def master_csv_row(labels: Dict[str, Any]) -> Dict[str, Any]:
+    """augmented_sessions_master.csv row of a variant, as the notebook wrote it"""
+    return {
+        'session_id': labels['session_id'],
+        'start_time': labels.get('start_time', ''),
+        'duration_seconds': labels.get('duration_seconds', 0),
+        'sample_count': labels.get('sample_count', 0),
+        'speaker_count': labels.get('speaker_count', 'unknown'),
+        'meeting_type': labels.get('meeting_type', 'unknown'),
+        'energy_level': labels.get('energy_level', 'unknown'),
+        'background_noise': labels.get('background_noise', 'unknown'),
+        'original_session_id': labels.get('original_session_id', ''),
+        'notes': 'Augmented sample'
+    }
+
+
+class ColumnarWriter:
+    """Streams variants into a directory of raw column files
+
+    The directory is assembled next to its final path and renamed into place
+    with the manifest written, so readers never see a partial dataset.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.staging = self.path.parent / f'.{self.path.name}.tmp'
+        if self.staging.exists():
+            shutil.rmtree(self.staging)
+        self.staging.mkdir(parents=True)
+        self.column_files = {name: open(self.staging / f'{name}.bin', 'wb') for name in ('session_index',) + COLUMNS}
+        self.labels_file = open(self.staging / LABELS_NAME, 'w')
+        self.csv_file = open(self.staging / MASTER_CSV_NAME, 'w', newline='')
+        self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=MASTER_CSV_FIELDS + ('row_offset',))
+        self.csv_writer.writeheader()
+        self.rows = 0
+        self.sessions = 0
+
+    def write(self, variant: Dict[str, Any], local_datetime: List[str]):
+        columns = variant['columns']
+        count = len(columns['leftMic'])
+        np.full(count, self.sessions, dtype=np.int32).tofile(self.column_files['session_index'])
+        for name in COLUMNS:
+            np.asarray(columns[name], dtype=np.float64).tofile(self.column_files[name])
+
+        labels = variant['labels']
+        self.labels_file.write(json.dumps({**labels, 'row_offset': self.rows}) + '\n')
+        self.csv_writer.writerow({**master_csv_row(labels), 'row_offset': self.rows})
+        self.rows += count
+        self.sessions += 1
+
+    def _close_files(self):
+        for f in list(self.column_files.values()) + [self.labels_file, self.csv_file]:
+            f.close()
+
+    def close(self, metadata: Dict[str, Any]) -> Path:
+        self._close_files()
+        manifest = {
+            'format': AUGMENTED_FORMAT,
+            'rows': self.rows,
+            'sessions': self.sessions,
+            'columns': {'session_index': 'int32', **{name: 'float64' for name in COLUMNS}},
+            **metadata
+        }
+        with open(self.staging / MANIFEST_NAME, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        self.staging.rename(self.path)
+        return self.path
+
+    def abort(self):
+        self._close_files()
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+
+class JsonWriter:
+    """Writes variants in the notebook's per-session JSON layout"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.csv_file = open(self.path / MASTER_CSV_NAME, 'w', newline='')
+        self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=MASTER_CSV_FIELDS)
+        self.csv_writer.writeheader()
+        self.rows = 0
+        self.sessions = 0
+
+    def write(self, variant: Dict[str, Any], local_datetime: List[str]):
+        columns = {name: variant['columns'][name].tolist() for name in COLUMNS}
+        count = len(columns['leftMic'])
+        # Stretched samples keep the first sample's local_datetime, as in the notebook
+        datetimes = [local_datetime[0] if local_datetime else ''] * count if variant['stretched'] else local_datetime
+        samples = [
+            {**{name: columns[name][index] for name in COLUMNS}, 'local_datetime': datetimes[index]}
+            for index in range(count)
+        ]
+        with open(self.path / f"{variant['session_id']}_audio.json", 'w') as f:
+            json.dump(samples, f, indent=2)
+        with open(self.path / f"{variant['session_id']}_labels.json", 'w') as f:
+            json.dump(variant['labels'], f, indent=2)
+        self.csv_writer.writerow(master_csv_row(variant['labels']))
+        self.rows += count
+        self.sessions += 1
+
+    def close(self, metadata: Dict[str, Any]) -> Path:
+        self.csv_file.close()
+        return self.path
+
+    def abort(self):
+        self.csv_file.close()
+
+
+def load_augmented(path: Path, mmap: bool = True) -> Dict[str, Any]:
+    """Columns (memory-mapped by default), per-variant labels and manifest of a columnar output"""
+    path = Path(path)
+    with open(path / MANIFEST_NAME) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != AUGMENTED_FORMAT:
+        raise ValueError(f"Unsupported augmented data format {manifest.get('format')} in {path}")
+
+    columns = {}
+    for name, dtype in manifest['columns'].items():
+        file_path = path / f'{name}.bin'
+        if mmap and manifest['rows']:
+            columns[name] = np.memmap(file_path, dtype=dtype, mode='r', shape=(manifest['rows'],))
+        else:
+            columns[name] = np.fromfile(file_path, dtype=dtype)
+    with open(path / LABELS_NAME) as f:
+        sessions = [json.loads(line) for line in f]
+    return {'manifest': manifest, 'columns': columns, 'sessions': sessions}
+
+
+def iter_augmented_sessions(path: Path) -> Iterator[Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+    """(labels, columns) of every variant in a columnar output"""
+    data = load_augmented(path)
+    for labels in data['sessions']:
+        start = labels['row_offset']
+        end = start + labels['sample_count']
+        yield labels, {name: column[start:end] for name, column in data['columns'].items()
+                       if name != 'session_index'}
+
+
+def original_sessions(data_dir: Path) -> List[Tuple[str, Path, Path]]:
+    """(session_id, audio file, labels file) of the master CSV's recordings that have both files"""
+    recordings_dir = data_dir / 'recordings'
+    labels_dir = data_dir / 'labels'
+    with open(labels_dir / 'sessions_master.csv', newline='') as f:
+        session_ids = [row['session_id'] for row in csv.DictReader(f)]
+
+    sessions = []
+    for session_id in session_ids:
+        audio_file = recordings_dir / f"{session_id}_audio.json"
+        labels_file = labels_dir / f"{session_id}_labels.json"
+        if audio_file.exists() and labels_file.exists():
+            sessions.append((session_id, audio_file, labels_file))
+        else:
+            logger.warning(f"⚠️ Missing files for {session_id}, skipped")
+    return sessions
+
+
+def augment_dataset(data_dir: str = './', output: Optional[str] = None, seed: int = 0,
+                    variants: int = DEFAULT_VARIANTS, jobs: Optional[int] = None,
+                    output_format: str = 'columns') -> Dict[str, Any]:
+    """Augment every original recording across a process pool and stream the variants to disk"""
+    data_dir = Path(data_dir)
+    if output is None:
+        output = data_dir / 'augmented_data' / ('augmented_audio' if output_format == 'columns' else '')
+    sessions = original_sessions(data_dir)
+    if not sessions:
+        raise FileNotFoundError(f"No recordings with labels found in {data_dir}")
+
+    variations = generate_variations(variants, seed)
+    generated_time = datetime.now().isoformat()
+    tasks = [(index, session_id, audio_file, labels_file, variations, seed, generated_time)
+             for index, (session_id, audio_file, labels_file) in enumerate(sessions)]
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+
+    logger.info(f"🎛️ Augmenting {len(tasks)} recordings x {variants} variants on {jobs} processes "
+                f"(seed {seed}, {output_format} output to {output})")
+    start = time.perf_counter()
+    writer = ColumnarWriter(output) if output_format == 'columns' else JsonWriter(output)
+    failed = []
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # A few recordings in flight per worker keeps memory bounded; results are written in order
+            pending = []
+            next_task = 0
+            while next_task < len(tasks) or pending:
+                while next_task < len(tasks) and len(pending) < jobs * 2:
+                    pending.append(executor.submit(_worker_augment, tasks[next_task]))
+                    next_task += 1
+                result = pending.pop(0).result()
+                if 'error' in result:
+                    logger.error(f"❌ Could not augment {result['session_id']}: {result['error']}")
+                    failed.append(result['session_id'])
+                    continue
+                for variant in result['variants']:
+                    writer.write(variant, result['local_datetime'])
+                logger.info(f"   {result['session_id']}: {result['samples']} samples -> "
+                            f"{len(result['variants'])} variants")
+        path = writer.close({'seed': seed, 'variants_per_recording': variants,
+                             'recordings': len(tasks) - len(failed), 'generated_time': generated_time})
+    except BaseException:
+        writer.abort()
+        raise
+    elapsed = time.perf_counter() - start
+
+    logger.info(f"✅ Wrote {writer.sessions} variants ({writer.rows} samples) to {path} in {elapsed:.1f}s")
+    return {
+        'recordings': len(tasks) - len(failed),
+        'failed': failed,
+        'variants': writer.sessions,
+        'samples': writer.rows,
+        'seconds': elapsed,
+        'output': str(path)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Meeting audio data augmentation')
+    parser.add_argument('--data-dir', default='./',
+                        help='Directory with recordings/ and labels/ (default: ./)')
+    parser.add_argument('--output', default=None,
+                        help='Output path (default: augmented_data/augmented_audio, or augmented_data for json)')
+    parser.add_argument('--format', choices=['columns', 'json'], default='columns',
+                        help='Columnar directory or the notebook\'s per-session JSON files (default: columns)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed; the same seed gives the same dataset (default: 0)')
+    parser.add_argument('--variants', type=int, default=DEFAULT_VARIANTS,
+                        help=f'Variants per original recording (default: {DEFAULT_VARIANTS})')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    try:
+        augment_dataset(args.data_dir, args.output, seed=args.seed, variants=args.variants,
+                        jobs=args.jobs, output_format=args.format)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
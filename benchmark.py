@@ -0,0 +1,712 @@
+#!/usr/bin/env python3
+"""
+ML Model Server Benchmarks
+Measures the throughput of the server's prediction pipeline
+
+Usage:
+    python benchmark.py batch --models-dir ./trained_models --batch-sizes 1 2 4 8 16 32 64
+    python benchmark.py batch --json results.json
+    python benchmark.py plan --batch-sizes 1 32
+    python benchmark.py cache --repeat-ratio 0.8 --decimals 4
+    python benchmark.py buffer --sessions 1000
+    python benchmark.py windows --hours 4
+    python benchmark.py load --clients 50 --rate 10 --duration 30 --json load.json
+    python benchmark.py startup --runs 5
+    python benchmark.py forest --batch-sizes 1 8 32 256
+
+Results are printed as a table and can be written as JSON for comparison across versions.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from collections import deque
+from typing import Dict, Any, List
+
+import numpy as np
+
+import binary_protocol
+from feature_engine import RollingFeatureEngine, compute_window_features, sliding_window_features
+from sessions import RoomSession
+
+logger = logging.getLogger(__name__)
+
+
+def load_server(models_dir: str, **options):
+    """Create an MLModelServer with its models loaded (no network listener)
+
+    The prediction cache is off unless asked for, so repeated inputs are really predicted.
+    """
+    from ml_model_server import MLModelServer
+    logging.getLogger().setLevel(logging.WARNING)
+
+    options.setdefault('prediction_cache_size', 0)
+    server = MLModelServer(models_dir=models_dir, **options)
+    if not server.load_models():
+        print(f"❌ Could not load models from {models_dir}")
+        sys.exit(1)
+    return server
+
+
+def synthetic_features(count: int, seed: int = 0, window: int = 150) -> List[Dict[str, float]]:
+    """Feature dicts computed from random meeting-like sample windows"""
+    rng = np.random.default_rng(seed)
+    features = []
+    for _ in range(count):
+        engine = RollingFeatureEngine(capacity=window)
+        levels = rng.normal(rng.uniform(40, 70), rng.uniform(2, 15), window)
+        differences = rng.normal(rng.uniform(-3, 3), rng.uniform(0.5, 6), window)
+        for i in range(window):
+            engine.append(levels[i], differences[i], i * 1000.0)
+        features.append(engine.features())
+    return features
+
+
+def time_repeated(func, min_time: float = 1.0, min_repeats: int = 3) -> float:
+    """Average seconds per call of func, repeating for at least min_time"""
+    func()  # Warm-up
+    repeats = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        repeats += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time and repeats >= min_repeats:
+            return elapsed / repeats
+
+
+def bench_batch(args) -> Dict[str, Any]:
+    """Predictions per second of make_predictions_batch versus batch size"""
+    server = load_server(args.models_dir)
+    pool = synthetic_features(max(args.batch_sizes), seed=args.seed)
+
+    results = []
+    for batch_size in args.batch_sizes:
+        batch = pool[:batch_size]
+        seconds = time_repeated(lambda: server.make_predictions_batch(batch), min_time=args.min_time)
+        results.append({
+            'batch_size': batch_size,
+            'batch_latency_ms': seconds * 1000,
+            'latency_per_prediction_ms': seconds * 1000 / batch_size,
+            'predictions_per_second': batch_size / seconds
+        })
+
+    print(f"\n{'batch':>6} {'batch ms':>10} {'ms/pred':>10} {'pred/s':>10}")
+    for row in results:
+        print(f"{row['batch_size']:>6} {row['batch_latency_ms']:>10.2f} "
+              f"{row['latency_per_prediction_ms']:>10.3f} {row['predictions_per_second']:>10.1f}")
+
+    return {'benchmark': 'batch', 'models': list(server.models.keys()), 'results': results}
+
+
+def bench_plan(args) -> Dict[str, Any]:
+    """Latency per prediction of the compiled plan versus the pandas path"""
+    server = load_server(args.models_dir)
+    pool = synthetic_features(max(args.batch_sizes), seed=args.seed)
+
+    paths = {
+        'dataframe': server.make_predictions_batch_dataframe,
+        'compiled_plan': server.prediction_plan.predict
+    }
+
+    results = []
+    for batch_size in args.batch_sizes:
+        batch = pool[:batch_size]
+        row = {'batch_size': batch_size}
+        for path_name, predict in paths.items():
+            seconds = time_repeated(lambda: predict(batch), min_time=args.min_time)
+            row[f'{path_name}_ms_per_prediction'] = seconds * 1000 / batch_size
+        row['speedup'] = row['dataframe_ms_per_prediction'] / row['compiled_plan_ms_per_prediction']
+        results.append(row)
+
+    print(f"\n{'batch':>6} {'pandas ms/pred':>15} {'plan ms/pred':>13} {'speedup':>8}")
+    for row in results:
+        print(f"{row['batch_size']:>6} {row['dataframe_ms_per_prediction']:>15.3f} "
+              f"{row['compiled_plan_ms_per_prediction']:>13.3f} {row['speedup']:>7.2f}x")
+
+    return {'benchmark': 'plan', 'models': list(server.models.keys()), 'results': results}
+
+
+def bench_forest(args) -> Dict[str, Any]:
+    """Latency of scikit-learn forests versus forest_engine, per model and end to end"""
+    from forest_engine import compile_forest
+
+    sklearn_server = load_server(args.models_dir, use_bundles=False, forest_engine=False)
+    engine_server = load_server(args.models_dir, use_bundles=False, forest_engine=True)
+    pool = synthetic_features(max(args.batch_sizes), seed=args.seed)
+    matrix = sklearn_server.prediction_plan.vectorize(pool).copy()
+
+    results = []
+    for plan in sklearn_server.prediction_plan.model_plans:
+        engine = compile_forest(plan.model)
+        if engine is None:
+            continue
+        predict = 'predict' if plan.is_regression else 'predict_proba'
+        for batch_size in args.batch_sizes:
+            rows = plan.scale(matrix[:batch_size], sklearn_server.feature_columns)
+            # The engine has to reproduce scikit-learn bit for bit
+            exact = bool(np.array_equal(getattr(plan.model, predict)(rows), getattr(engine, predict)(rows)))
+            sklearn_s = time_repeated(lambda: getattr(plan.model, predict)(rows), min_time=args.min_time)
+            engine_s = time_repeated(lambda: getattr(engine, predict)(rows), min_time=args.min_time)
+            results.append({'model': plan.name, **engine.describe(), 'batch_size': batch_size,
+                            'sklearn_ms': sklearn_s * 1000, 'engine_ms': engine_s * 1000,
+                            'speedup': sklearn_s / engine_s, 'exact': exact})
+
+    end_to_end = []
+    for batch_size in args.batch_sizes:
+        batch = pool[:batch_size]
+        sklearn_s = time_repeated(lambda: sklearn_server.make_predictions_batch(batch), min_time=args.min_time)
+        engine_s = time_repeated(lambda: engine_server.make_predictions_batch(batch), min_time=args.min_time)
+        end_to_end.append({'batch_size': batch_size, 'sklearn_ms': sklearn_s * 1000, 'engine_ms': engine_s * 1000,
+                           'speedup': sklearn_s / engine_s,
+                           'identical': sklearn_server.make_predictions_batch(batch)
+                           == engine_server.make_predictions_batch(batch)})
+
+    print(f"\n{'model':>22} {'trees':>6} {'batch':>6} {'sklearn ms':>11} {'engine ms':>10} {'speedup':>8} exact")
+    for row in results:
+        print(f"{row['model']:>22} {row['trees']:>6} {row['batch_size']:>6} {row['sklearn_ms']:>11.3f} "
+              f"{row['engine_ms']:>10.3f} {row['speedup']:>7.1f}x {'yes' if row['exact'] else 'NO'}")
+    print(f"\n{'make_predictions_batch':>22} {'':>6} {'batch':>6} {'sklearn ms':>11} {'engine ms':>10} {'speedup':>8} same")
+    for row in end_to_end:
+        print(f"{'':>22} {'':>6} {row['batch_size']:>6} {row['sklearn_ms']:>11.3f} {row['engine_ms']:>10.3f} "
+              f"{row['speedup']:>7.1f}x {'yes' if row['identical'] else 'NO'}")
+
+    return {'benchmark': 'forest', 'results': results, 'end_to_end': end_to_end}
+
+
+def bench_cache(args) -> Dict[str, Any]:
+    """Average prediction cost with and without the prediction cache on a stream with repeated windows"""
+    rng = np.random.default_rng(args.seed)
+    unique = synthetic_features(args.unique, seed=args.seed)
+    stream = []
+    for _ in range(args.predictions):
+        if stream and rng.random() < args.repeat_ratio:
+            # A repeated window: identical, or differing only by float noise below the quantization
+            features = dict(stream[rng.integers(len(stream))])
+            features = {name: value + rng.uniform(-1e-9, 1e-9) for name, value in features.items()}
+        else:
+            features = unique[rng.integers(len(unique))]
+        stream.append(features)
+
+    uncached = load_server(args.models_dir)
+    cached = load_server(args.models_dir, prediction_cache_size=args.cache_size,
+                         prediction_cache_decimals=args.decimals)
+
+    results = {}
+    outputs = {}
+    for name, server in (('uncached', uncached), ('cached', cached)):
+        start = time.perf_counter()
+        outputs[name] = [server.make_predictions(features) for features in stream]
+        results[f'{name}_ms_per_prediction'] = (time.perf_counter() - start) * 1000 / len(stream)
+    results['speedup'] = results['uncached_ms_per_prediction'] / results['cached_ms_per_prediction']
+    results['cache'] = cached.prediction_cache_stats()
+
+    # Differences caused by rounding the features
+    value_mismatches = 0
+    max_confidence_delta = 0.0
+    for plain, quantized in zip(outputs['uncached'], outputs['cached']):
+        for model_name, result in plain.items():
+            other = quantized.get(model_name, {})
+            if result.get('value') != other.get('value'):
+                value_mismatches += 1
+            if 'confidence' in result and 'confidence' in other:
+                max_confidence_delta = max(max_confidence_delta, abs(result['confidence'] - other['confidence']))
+    results['value_mismatches'] = value_mismatches
+    results['max_confidence_delta'] = max_confidence_delta
+
+    cache = results['cache']
+    print(f"\n{len(stream)} predictions, {args.repeat_ratio:.0%} repeated windows, {args.decimals} decimals")
+    print(f"  uncached          {results['uncached_ms_per_prediction']:>8.3f} ms/pred")
+    print(f"  cached            {results['cached_ms_per_prediction']:>8.3f} ms/pred "
+          f"({results['speedup']:.2f}x, hit rate {cache['hit_rate']:.1%}, {cache['entries']} entries)")
+    print(f"  rounding effect   {value_mismatches} changed values, max confidence delta {max_confidence_delta:.2e}")
+
+    return {'benchmark': 'cache', 'predictions': len(stream), 'repeat_ratio': args.repeat_ratio,
+            'decimals': args.decimals, 'cache_size': args.cache_size, **results}
+
+
+def synthetic_samples(count: int, seed: int = 0) -> List[Dict[str, float]]:
+    """Audio sample dicts shaped like the ESP32 messages"""
+    rng = np.random.default_rng(seed)
+    left = rng.normal(55, 8, count)
+    right = rng.normal(55, 8, count)
+    return [{
+        'timestamp': i * 1000.0,
+        'leftMic': float(left[i]),
+        'rightMic': float(right[i]),
+        'difference': float(left[i] - right[i]),
+        'averageLevel': float((left[i] + right[i]) / 2)
+    } for i in range(count)]
+
+
+def legacy_window_features(buffer) -> Dict[str, float]:
+    """Feature extraction as done on the deque-of-dicts buffer: copy, split, compute"""
+    recent = list(buffer)
+    return compute_window_features(
+        np.array([s['averageLevel'] for s in recent]),
+        np.array([s['difference'] for s in recent]),
+        np.array([s['timestamp'] for s in recent])
+    )
+
+
+def bench_buffer(args) -> Dict[str, Any]:
+    """Memory per room and extraction latency of the ring buffer versus a deque of dicts"""
+    samples = synthetic_samples(args.buffer_size * 2, seed=args.seed)
+
+    def measure_memory(create) -> float:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        rooms = [create() for _ in range(args.sessions)]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del rooms
+        return (after - before) / args.sessions
+
+    def legacy_room():
+        buffer = deque(maxlen=args.buffer_size)
+        for sample in samples:
+            # Every message arrives as its own freshly parsed dict
+            buffer.append(dict(sample))
+        return buffer
+
+    def ring_room():
+        session = RoomSession('bench', buffer_size=args.buffer_size)
+        for sample in samples:
+            session.add_sample(sample)
+        return session
+
+    legacy_bytes = measure_memory(legacy_room)
+    ring_bytes = measure_memory(ring_room)
+
+    legacy = legacy_room()
+    session = ring_room()
+    ring = session.audio_buffer
+    cases = {
+        'deque_of_dicts': lambda: legacy_window_features(legacy),
+        'ring_buffer_views': lambda: compute_window_features(ring.levels(), ring.differences(), ring.timestamps()),
+        'rolling_engine': session.feature_engine.features
+    }
+    latency = {name: time_repeated(func, min_time=args.min_time) * 1e6 for name, func in cases.items()}
+
+    print(f"\nMemory per room ({args.buffer_size} samples, {args.sessions} rooms):")
+    print(f"  deque of dicts        {legacy_bytes / 1024:>8.1f} KiB")
+    print(f"  RoomSession (ring)    {ring_bytes / 1024:>8.1f} KiB  (sample storage {ring.nbytes / 1024:.1f} KiB)")
+    print("\nFeature extraction latency:")
+    for name, micros in latency.items():
+        print(f"  {name:<22}{micros:>8.1f} µs")
+
+    return {
+        'benchmark': 'buffer',
+        'buffer_size': args.buffer_size,
+        'sessions': args.sessions,
+        'memory_bytes_per_room': {'deque_of_dicts': legacy_bytes, 'ring_session': ring_bytes},
+        'ring_storage_bytes': ring.nbytes,
+        'extraction_latency_us': latency
+    }
+
+
+def bench_windows(args) -> Dict[str, Any]:
+    """Features for every window of a long recording: per-window, rolling and vectorized"""
+    rng = np.random.default_rng(args.seed)
+    length = int(args.hours * 3600 * args.rate)
+    levels = rng.normal(55, 10, length)
+    differences = rng.normal(0, 4, length)
+    timestamps = np.arange(length) * (1000.0 / args.rate)
+    starts = np.arange(0, length - args.window + 1, args.stride)
+    print(f"\nRecording: {length} samples ({args.hours} h at {args.rate} Hz), "
+          f"{len(starts)} windows of {args.window} (stride {args.stride})")
+
+    # The per-window reference is timed on evenly spaced windows and extrapolated
+    sample = starts[np.linspace(0, len(starts) - 1, min(args.reference_windows, len(starts))).astype(int)]
+    begin = time.perf_counter()
+    for start in sample:
+        end = start + args.window
+        compute_window_features(levels[start:end], differences[start:end], timestamps[start:end])
+    per_window = (time.perf_counter() - begin) / len(sample) * len(starts)
+
+    begin = time.perf_counter()
+    engine = RollingFeatureEngine(capacity=args.window)
+    for i in range(length):
+        engine.append(levels[i], differences[i], timestamps[i])
+        if i + 1 >= args.window and (i + 1 - args.window) % args.stride == 0:
+            engine.features()
+    rolling = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    sliding_window_features(levels, differences, timestamps, window=args.window, stride=args.stride)
+    vectorized = time.perf_counter() - begin
+
+    results = {
+        'per_window_seconds': per_window,
+        'rolling_engine_seconds': rolling,
+        'vectorized_seconds': vectorized
+    }
+    print(f"  per-window (extrapolated) {per_window:>9.2f} s")
+    print(f"  rolling engine            {rolling:>9.2f} s")
+    print(f"  vectorized                {vectorized:>9.2f} s  "
+          f"({per_window / vectorized:.0f}x vs per-window, {rolling / vectorized:.1f}x vs rolling)")
+
+    return {
+        'benchmark': 'windows',
+        'samples': length,
+        'windows': len(starts),
+        'window': args.window,
+        'stride': args.stride,
+        'results': results
+    }
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max summary of a list of measurements"""
+    if not values:
+        return {'count': 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': len(values), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(max(values))}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def monitor_loop_lag(lags: List[float], interval: float = 0.05):
+    """Record how late the event loop wakes up a sleeping task, in ms"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def load_client(index: int, url: str, args, samples: List[Dict[str, float]],
+                      stop: asyncio.Event, results: Dict[str, Any]):
+    """One simulated ESP32/browser relay: streams audio_data for its room and times predictions"""
+    import websockets
+
+    room = f'load-{index}'
+    async with websockets.connect(url, max_queue=None) as websocket:
+        await websocket.recv()  # Welcome
+        if args.protocol == 'binary':
+            await websocket.send(json.dumps({'type': 'select_protocol', 'protocol': 'binary', 'rooms': [room]}))
+            await websocket.recv()
+
+        async def receive():
+            async for message in websocket:
+                data = json.loads(message)
+                if data.get('type') == 'ml_predictions' and data.get('room') == room:
+                    # Sample timestamps are wall-clock send times, so this is trigger-to-delivery latency
+                    results['latencies'].append(time.time() * 1000 - data['latest_sample_timestamp'])
+                    results['predictions'] += 1
+
+        receiver = asyncio.ensure_future(receive())
+        loop = asyncio.get_running_loop()
+        period = 1.0 / args.rate
+        next_send = loop.time() + (index / max(args.clients, 1)) * period  # Spread clients over the period
+        position = index * 7
+        try:
+            while not stop.is_set():
+                delay = next_send - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_send += period
+
+                sample = dict(samples[position % len(samples)], timestamp=time.time() * 1000)
+                position += 1
+                if args.protocol == 'binary':
+                    await websocket.send(binary_protocol.encode_samples(0, [sample]))
+                else:
+                    await websocket.send(json.dumps({'type': 'audio_data', 'room': room, **sample}))
+                results['samples_sent'] += 1
+        finally:
+            receiver.cancel()
+
+
+async def run_load(args) -> Dict[str, Any]:
+    """Start a server in this process, drive it with simulated clients and collect measurements"""
+    import websockets
+    from ml_model_server import MLModelServer
+    logging.getLogger().setLevel(logging.WARNING)
+
+    port = free_port()
+    server = MLModelServer(models_dir=args.models_dir, host='127.0.0.1', port=port,
+                           max_sessions=max(1000, args.clients))
+    server.prediction_interval = args.prediction_interval
+    server.scheduler.enabled = not args.fixed_schedule
+    server.model_poll_interval = 0
+    server_task = asyncio.ensure_future(server.start_server())
+
+    url = f'ws://127.0.0.1:{port}'
+    for _ in range(300):
+        if server_task.done():
+            raise RuntimeError(f"Server failed to start; are there models in {args.models_dir}?")
+        try:
+            async with websockets.connect(url):
+                break
+        except OSError:
+            await asyncio.sleep(0.1)
+
+    if args.replay:
+        with open(args.replay) as f:
+            samples = [{key: float(sample.get(key, 0)) for key in ('leftMic', 'rightMic', 'difference', 'averageLevel')}
+                       for sample in json.load(f)]
+    else:
+        samples = synthetic_samples(3600, seed=args.seed)
+
+    results = {'latencies': [], 'predictions': 0, 'samples_sent': 0}
+    lags = []
+    stop = asyncio.Event()
+    rss_before = rss_bytes()
+    processed_before = server.stats['samples_processed']
+    runs_before, skipped_before = server.stats['predictions_made'], server.stats['predictions_skipped']
+
+    lag_task = asyncio.ensure_future(monitor_loop_lag(lags))
+    clients = [asyncio.ensure_future(load_client(i, url, args, samples, stop, results))
+               for i in range(args.clients)]
+    start = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*clients, return_exceptions=True)
+    lag_task.cancel()
+
+    sessions = max(len(server.sessions), 1)
+    report = {
+        'clients': args.clients,
+        'rate_per_client': args.rate,
+        'duration_s': elapsed,
+        'protocol': args.protocol,
+        'prediction_interval_s': args.prediction_interval,
+        'samples_sent': results['samples_sent'],
+        'samples_processed': server.stats['samples_processed'] - processed_before,
+        'ingest_samples_per_second': (server.stats['samples_processed'] - processed_before) / elapsed,
+        'predictions_received': results['predictions'],
+        'inference_runs': server.stats['predictions_made'] - runs_before,
+        'inference_skipped': server.stats['predictions_skipped'] - skipped_before,
+        'prediction_latency_ms': percentiles(results['latencies']),
+        'event_loop_lag_ms': percentiles(lags),
+        'rss_bytes_per_session': (rss_bytes() - rss_before) / sessions,
+        'sessions': len(server.sessions),
+        'batching': server.batcher.get_stats(),
+        'errors': server.stats['errors']
+    }
+
+    server_task.cancel()
+    await asyncio.gather(server_task, return_exceptions=True)
+    return report
+
+
+def bench_load(args) -> Dict[str, Any]:
+    """End-to-end load test: ingest throughput, prediction latency, loop lag and memory"""
+    report = asyncio.run(run_load(args))
+
+    latency = report['prediction_latency_ms']
+    lag = report['event_loop_lag_ms']
+    print(f"\n{report['clients']} clients x {report['rate_per_client']} Hz for {report['duration_s']:.1f}s "
+          f"({report['protocol']})")
+    print(f"  ingest            {report['ingest_samples_per_second']:>10.1f} samples/s "
+          f"({report['samples_processed']}/{report['samples_sent']} processed)")
+    if latency['count']:
+        print(f"  prediction        p50 {latency['p50']:.1f} ms  p95 {latency['p95']:.1f} ms  "
+              f"p99 {latency['p99']:.1f} ms  ({latency['count']} predictions)")
+    print(f"  inference         {report['inference_runs']:>10} runs, {report['inference_skipped']} reused "
+          f"({'fixed' if args.fixed_schedule else 'adaptive'} schedule)")
+    if lag['count']:
+        print(f"  event loop lag    p50 {lag['p50']:.2f} ms  p99 {lag['p99']:.2f} ms  max {lag['max']:.2f} ms")
+    print(f"  RSS per session   {report['rss_bytes_per_session'] / 1024:>10.1f} KiB ({report['sessions']} sessions)")
+
+    return {'benchmark': 'load', **report}
+
+
+# Runs in a fresh interpreter: import, load and first prediction timings as one JSON line
+STARTUP_SCRIPT = '''
+import json, sys, time, warnings
+start = time.perf_counter()
+warnings.filterwarnings('ignore')
+from ml_model_server import MLModelServer
+imported = time.perf_counter()
+server = MLModelServer(models_dir=sys.argv[1], use_bundles=sys.argv[2] == 'bundle')
+loaded = server.load_models()
+ready = time.perf_counter()
+prediction = server.make_predictions({name: 0.0 for name in server.feature_columns})
+first = time.perf_counter()
+print(json.dumps({'loaded': loaded, 'version': server.model_version, 'models': sorted(prediction),
+                  'import_s': imported - start, 'load_s': ready - imported, 'first_prediction_s': first - ready,
+                  'sklearn_imported': 'sklearn' in sys.modules, 'pandas_imported': 'pandas' in sys.modules}))
+'''
+
+
+def bench_startup(args) -> Dict[str, Any]:
+    """Time to first prediction of a fresh process, loading pickles versus a precompiled bundle"""
+    from model_bundle import scan_bundles, build_bundle
+    from model_registry import load_model_set, newest_complete_set
+    from pathlib import Path
+
+    models_dir = Path(args.models_dir).resolve()
+    version, _ = newest_complete_set(models_dir, use_bundles=False)
+    workdir = None
+    if version is None or version not in scan_bundles(models_dir):
+        # Bundle a scratch copy (symlinks to the pickles) rather than writing into models_dir
+        workdir = Path(tempfile.mkdtemp(prefix='startup_bench_'))
+        for artifact in models_dir.glob('*.pkl'):
+            (workdir / artifact.name).symlink_to(artifact)
+        model_set = load_model_set(workdir, use_bundles=False)
+        if model_set is None:
+            print(f"❌ Could not load models from {models_dir}")
+            sys.exit(1)
+        build_bundle(model_set, workdir)
+        models_dir = workdir
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    try:
+        for mode in ('pickle', 'bundle'):
+            runs = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, str(models_dir), mode],
+                                        cwd=repo_dir, capture_output=True, text=True, check=True)
+                run = json.loads(output.stdout.strip().splitlines()[-1])
+                run['process_s'] = time.perf_counter() - start
+                runs.append(run)
+            timings = {key: float(np.median([run[key] for run in runs]))
+                       for key in ('import_s', 'load_s', 'first_prediction_s', 'process_s')}
+            results[mode] = {**timings, 'models': runs[0]['models'],
+                             'sklearn_imported': runs[0]['sklearn_imported'],
+                             'pandas_imported': runs[0]['pandas_imported']}
+    finally:
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\nTime to first prediction, median of {args.runs} fresh processes")
+    print(f"{'mode':>8} {'import':>9} {'load':>9} {'1st pred':>9} {'process':>9}  sklearn pandas")
+    for mode, row in results.items():
+        print(f"{mode:>8} {row['import_s'] * 1000:>7.0f}ms {row['load_s'] * 1000:>7.0f}ms "
+              f"{row['first_prediction_s'] * 1000:>7.1f}ms {row['process_s'] * 1000:>7.0f}ms  "
+              f"{'yes' if row['sklearn_imported'] else 'no':>7} {'yes' if row['pandas_imported'] else 'no':>6}")
+    speedup = results['pickle']['process_s'] / results['bundle']['process_s']
+    print(f"  bundle starts {speedup:.2f}x faster (whole process, interpreter start included)")
+
+    return {'benchmark': 'startup', 'version': version, 'runs': args.runs, 'results': results,
+            'speedup': speedup}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the ML Model Server')
+    parser.add_argument('--models-dir', default='./trained_models',
+                       help='Directory containing trained models (default: ./trained_models)')
+    parser.add_argument('--json', dest='json_path',
+                       help='Write results as JSON to this file')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Random seed for synthetic data (default: 0)')
+    parser.add_argument('--min-time', type=float, default=1.0,
+                       help='Minimum seconds spent timing each case (default: 1.0)')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    batch_parser = subparsers.add_parser('batch', help='Prediction throughput versus batch size')
+    batch_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64],
+                              help='Batch sizes to measure (default: 1 2 4 8 16 32 64)')
+    batch_parser.set_defaults(func=bench_batch)
+
+    plan_parser = subparsers.add_parser('plan', help='Compiled prediction plan versus the pandas path')
+    plan_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32],
+                             help='Batch sizes to measure (default: 1 8 32)')
+    plan_parser.set_defaults(func=bench_plan)
+
+    forest_parser = subparsers.add_parser('forest', help='scikit-learn forests versus the vectorized forest engine')
+    forest_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 256],
+                               help='Batch sizes to measure (default: 1 8 32 256)')
+    forest_parser.set_defaults(func=bench_forest)
+
+    cache_parser = subparsers.add_parser('cache', help='Prediction cost with and without the prediction cache')
+    cache_parser.add_argument('--predictions', type=int, default=2000,
+                              help='Predictions in the stream (default: 2000)')
+    cache_parser.add_argument('--unique', type=int, default=200,
+                              help='Distinct synthetic windows drawn from (default: 200)')
+    cache_parser.add_argument('--repeat-ratio', type=float, default=0.8,
+                              help='Share of predictions that repeat an earlier window (default: 0.8)')
+    cache_parser.add_argument('--cache-size', type=int, default=4096,
+                              help='Cache entries (default: 4096)')
+    cache_parser.add_argument('--decimals', type=int, default=4,
+                              help='Decimals features are rounded to (default: 4)')
+    cache_parser.set_defaults(func=bench_cache)
+
+    buffer_parser = subparsers.add_parser('buffer', help='Ring buffer memory and feature extraction latency')
+    buffer_parser.add_argument('--buffer-size', type=int, default=150,
+                               help='Samples per room (default: 150)')
+    buffer_parser.add_argument('--sessions', type=int, default=200,
+                               help='Rooms created for the memory measurement (default: 200)')
+    buffer_parser.set_defaults(func=bench_buffer)
+
+    windows_parser = subparsers.add_parser('windows', help='Sliding-window features over a long recording')
+    windows_parser.add_argument('--hours', type=float, default=4.0,
+                                help='Recording length in hours (default: 4)')
+    windows_parser.add_argument('--rate', type=float, default=1.0,
+                                help='Samples per second (default: 1)')
+    windows_parser.add_argument('--window', type=int, default=150,
+                                help='Samples per window (default: 150)')
+    windows_parser.add_argument('--stride', type=int, default=1,
+                                help='Samples between window starts (default: 1)')
+    windows_parser.add_argument('--reference-windows', type=int, default=500,
+                                help='Windows timed for the per-window estimate (default: 500)')
+    windows_parser.set_defaults(func=bench_windows)
+
+    load_parser = subparsers.add_parser('load', help='End-to-end load test with simulated clients')
+    load_parser.add_argument('--clients', type=int, default=20,
+                             help='Concurrent simulated clients, one room each (default: 20)')
+    load_parser.add_argument('--rate', type=float, default=10.0,
+                             help='audio_data messages per second per client (default: 10)')
+    load_parser.add_argument('--duration', type=float, default=30.0,
+                             help='Seconds of load (default: 30)')
+    load_parser.add_argument('--prediction-interval', type=float, default=1.0,
+                             help='Server prediction interval in seconds (default: 1)')
+    load_parser.add_argument('--fixed-schedule', action='store_true',
+                             help='Disable adaptive scheduling and run inference every interval')
+    load_parser.add_argument('--protocol', choices=['json', 'binary'], default='json',
+                             help='Audio frame protocol used by the clients (default: json)')
+    load_parser.add_argument('--replay', metavar='RECORDING',
+                             help='Replay samples from a recordings/*_audio.json file instead of synthetic ones')
+    load_parser.set_defaults(func=bench_load)
+
+    startup_parser = subparsers.add_parser('startup', help='Time to first prediction: pickles versus a model bundle')
+    startup_parser.add_argument('--runs', type=int, default=5,
+                                help='Fresh processes timed per mode (default: 5)')
+    startup_parser.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+
+    # Keep model loading chatter and sklearn feature-name warnings out of the results
+    logging.getLogger().setLevel(logging.WARNING)
+    warnings.filterwarnings('ignore', category=UserWarning)
+
+    report = args.func(args)
+    report['timestamp'] = time.time()
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
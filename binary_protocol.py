@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Binary Audio Protocol
+Compact binary WebSocket frames for audio_data, as an alternative to JSON
+
+A client opts in per connection after the welcome message:
+    -> {"type": "select_protocol", "protocol": "binary", "rooms": ["lab-a", "lab-b"]}
+    <- {"type": "protocol_selected", "protocol": "binary", "rooms": {"lab-a": 0, "lab-b": 1}}
+
+Binary frames then carry the room index assigned in the reply. All values are
+little-endian:
+
+    header   <B frame type> <B reserved> <H room index>          4 bytes
+    single   header (type 1) + 1 record                          28 bytes
+    batch    header (type 2) + <I count> + count records         8 + 24*count bytes
+    record   <d timestamp ms> <f leftMic> <f rightMic> <f difference> <f averageLevel>
+
+JSON messages (including JSON audio_data) remain accepted on every connection.
+"""
+
+import struct
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+FRAME_SINGLE = 1
+FRAME_BATCH = 2
+MAX_BATCH_SAMPLES = 4096
+MAX_ROOMS_PER_CONNECTION = 256
+
+HEADER = struct.Struct('<BBH')
+BATCH_COUNT = struct.Struct('<I')
+SAMPLE_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('leftMic', '<f4'),
+    ('rightMic', '<f4'),
+    ('difference', '<f4'),
+    ('averageLevel', '<f4')
+])
+
+
+class BinaryProtocolError(ValueError):
+    """Raised for malformed binary frames"""
+
+
+def describe() -> Dict[str, Any]:
+    """Frame layout advertised in the welcome message"""
+    return {
+        'byte_order': 'little',
+        'header': 'B frame_type, B reserved, H room_index',
+        'frame_types': {'single': FRAME_SINGLE, 'batch': FRAME_BATCH},
+        'batch_count': 'I count (after header)',
+        'record': 'd timestamp_ms, f leftMic, f rightMic, f difference, f averageLevel',
+        'record_size': SAMPLE_DTYPE.itemsize,
+        'max_batch_samples': MAX_BATCH_SAMPLES
+    }
+
+
+def decode_frame(data: bytes) -> Tuple[int, np.ndarray]:
+    """Room index and structured sample records of one binary frame (zero-copy view)"""
+    if len(data) < HEADER.size:
+        raise BinaryProtocolError("Frame shorter than header")
+    frame_type, _, room_index = HEADER.unpack_from(data)
+
+    if frame_type == FRAME_SINGLE:
+        if len(data) != HEADER.size + SAMPLE_DTYPE.itemsize:
+            raise BinaryProtocolError(f"Single-sample frame must be {HEADER.size + SAMPLE_DTYPE.itemsize} bytes")
+        return room_index, np.frombuffer(data, dtype=SAMPLE_DTYPE, count=1, offset=HEADER.size)
+
+    if frame_type == FRAME_BATCH:
+        offset = HEADER.size + BATCH_COUNT.size
+        if len(data) < offset:
+            raise BinaryProtocolError("Batch frame shorter than header")
+        (count,) = BATCH_COUNT.unpack_from(data, HEADER.size)
+        if count > MAX_BATCH_SAMPLES:
+            raise BinaryProtocolError(f"Batch of {count} samples exceeds {MAX_BATCH_SAMPLES}")
+        if len(data) != offset + count * SAMPLE_DTYPE.itemsize:
+            raise BinaryProtocolError("Batch frame length does not match its sample count")
+        return room_index, np.frombuffer(data, dtype=SAMPLE_DTYPE, count=count, offset=offset)
+
+    raise BinaryProtocolError(f"Unknown frame type: {frame_type}")
+
+
+def encode_samples(room_index: int, samples: List[Dict[str, float]]) -> bytes:
+    """Binary frame for one or more samples (single frame when there is exactly one)"""
+    records = np.zeros(len(samples), dtype=SAMPLE_DTYPE)
+    for i, sample in enumerate(samples):
+        for field in SAMPLE_DTYPE.names:
+            records[i][field] = sample.get(field, 0)
+
+    if len(samples) == 1:
+        return HEADER.pack(FRAME_SINGLE, 0, room_index) + records.tobytes()
+    return HEADER.pack(FRAME_BATCH, 0, room_index) + BATCH_COUNT.pack(len(samples)) + records.tobytes()
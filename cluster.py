@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Multi-process Serving
+Run several server processes on one port with rooms pinned to a worker
+
+The parent process loads the models, freezes the garbage collector's view of
+them and forks N workers, so the model arrays are shared copy-on-write. Every
+worker binds its own listening socket on the public port with SO_REUSEPORT and
+the kernel spreads new connections across them.
+
+Each room belongs to one worker (CRC32 of the room id modulo N), so its buffer,
+feature state and history stay in one process. A connection is routed by the
+`room` query parameter of its URL, or else by the room of its first message. A
+connection that lands on another worker is relayed to the owner's private
+loopback port; the owner skips its welcome when the landing worker already sent one.
+
+A connection is relayed as a whole, so it can only use rooms of the worker it
+ended up on. Messages about other rooms (audio_data, request_prediction,
+join_room, history queries, or subscribe/select_protocol room lists that span
+workers) are rejected with an error naming the room; clients that follow rooms
+owned by different workers need one connection per room (`?room=<id>`).
+
+The parent doubles as the coordinator: workers report their stats over a pipe
+every second, and the parent sends the cluster-wide totals back for get_stats
+replies. Workers that die are forked again. No external broker is involved.
+"""
+
+import gc
+import time
+import signal
+import zlib
+import socket
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.connection
+from typing import Dict, Any, Optional, List
+from urllib.parse import urlsplit, parse_qs, quote
+
+import websockets
+
+import log_pipeline
+from sessions import DEFAULT_ROOM, normalize_room_id
+
+logger = logging.getLogger(__name__)
+
+STATS_INTERVAL = 1.0
+# Messages whose `room` field is read or written by the receiving worker
+ROOM_MESSAGES = {'audio_data', 'request_prediction', 'join_room', 'get_history', 'get_predictions'}
+RESTART_BACKOFF = 1.0
+# Stats that describe a current level rather than a running total
+MAX_STATS = {'inference_max_queue_depth'}
+
+
+def owner_of(room_id: str, workers: int) -> int:
+    """Index of the worker that owns a room (stable across restarts)"""
+    return zlib.crc32(room_id.encode('utf-8')) % workers
+
+
+def routing_room(data: Dict[str, Any]) -> str:
+    """Room a connection's first message is about"""
+    if data.get('room') not in (None, ''):
+        return normalize_room_id(data['room'])
+    rooms = data.get('rooms')
+    if isinstance(rooms, list) and rooms:
+        return normalize_room_id(rooms[0])
+    return DEFAULT_ROOM
+
+
+def message_rooms(data: Dict[str, Any]) -> List[str]:
+    """Every room a message would read from or write to"""
+    message_type = data.get('type')
+    rooms = []
+    if message_type in ROOM_MESSAGES:
+        rooms.append(normalize_room_id(data.get('room')))
+    elif message_type == 'subscribe' and isinstance(data.get('rooms'), list):
+        rooms.extend(normalize_room_id(room) for room in data['rooms'])
+    elif message_type == 'select_protocol' and data.get('protocol') == 'binary':
+        rooms.extend(normalize_room_id(room) for room in (data.get('rooms') or [DEFAULT_ROOM]))
+    return rooms
+
+
+def reuseport_socket(host: str, port: int, backlog: int = 1024) -> socket.socket:
+    """Listening socket that other processes can bind to the same address"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def aggregate_stats(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cluster-wide totals of the workers' latest stats snapshots"""
+    totals: Dict[str, Any] = {}
+    for snapshot in snapshots:
+        for key, value in snapshot['stats'].items():
+            if key == 'start_time':
+                totals[key] = min(totals.get(key, value), value)
+            elif key in MAX_STATS:
+                totals[key] = max(totals.get(key, value), value)
+            elif isinstance(value, (int, float)):
+                totals[key] = totals.get(key, 0) + value
+    return {
+        'stats': totals,
+        'clients': sum(snapshot['clients'] for snapshot in snapshots),
+        'sessions': sum(snapshot['sessions'] for snapshot in snapshots),
+        'workers': sorted(snapshots, key=lambda snapshot: snapshot['worker'])
+    }
+
+
+class ClusterWorker:
+    """A worker's view of the cluster: routing, relays and the coordinator pipe"""
+
+    def __init__(self, index: int, workers: int, host: str, port: int, conn):
+        self.index = index
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.conn = conn
+        self.cluster_stats: Optional[Dict[str, Any]] = None
+        self.stopped: Optional[asyncio.Future] = None
+
+    @property
+    def internal_port(self) -> int:
+        return self.internal_port_of(self.index)
+
+    def internal_port_of(self, index: int) -> int:
+        """Loopback port on which a worker accepts relayed connections"""
+        return self.port + 1 + index
+
+    def owns(self, room_id: str) -> bool:
+        return owner_of(room_id, self.workers) == self.index
+
+    def foreign_rooms(self, rooms: List[str]) -> List[str]:
+        """Rooms of the list that another worker owns"""
+        return [room_id for room_id in rooms if not self.owns(room_id)]
+
+    def listen_socket(self) -> socket.socket:
+        return reuseport_socket(self.host, self.port)
+
+    @staticmethod
+    def connection_options(websocket, path: Optional[str] = None) -> Dict[str, str]:
+        """Query parameters of a connection's URL (room, relayed, welcome)"""
+        request = getattr(websocket, 'request', None)
+        path = request.path if request is not None else (path or '')
+        return {key: values[0] for key, values in parse_qs(urlsplit(path).query).items()}
+
+    async def relay(self, websocket, room_id: str, client_id: str, first_message=None, welcomed: bool = False):
+        """Pipe a client connection to the worker that owns room_id until either side closes"""
+        owner = owner_of(room_id, self.workers)
+        url = (f"ws://127.0.0.1:{self.internal_port_of(owner)}/?room={quote(room_id)}"
+               f"&relayed={quote(client_id)}&welcome={0 if welcomed else 1}")
+        logger.debug(f"↪️ Relaying {client_id} (room {room_id}) to worker {owner}")
+
+        async with websockets.connect(url, max_size=None) as upstream:
+            if first_message is not None:
+                await upstream.send(first_message)
+
+            async def pump(source, target):
+                async for message in source:
+                    await target.send(message)
+
+            tasks = [asyncio.ensure_future(pump(websocket, upstream)),
+                     asyncio.ensure_future(pump(upstream, websocket))]
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def report_stats(self, snapshot, interval: float = STATS_INTERVAL):
+        """Send stats snapshots to the coordinator and keep its latest totals"""
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.conn.fileno(), self._receive)
+        try:
+            while self.stopped is None or not self.stopped.done():
+                try:
+                    self.conn.send(snapshot())
+                except (BrokenPipeError, EOFError, OSError):
+                    self._lost_coordinator()
+                    break
+                await asyncio.sleep(interval)
+        finally:
+            loop.remove_reader(self.conn.fileno())
+
+    def _receive(self):
+        try:
+            while self.conn.poll():
+                self.cluster_stats = self.conn.recv()
+        except (EOFError, OSError):
+            self._lost_coordinator()
+
+    def _lost_coordinator(self):
+        """The parent is gone; shut this worker down"""
+        asyncio.get_running_loop().remove_reader(self.conn.fileno())
+        if self.stopped is not None and not self.stopped.done():
+            logger.error(f"❌ Worker {self.index} lost its coordinator, stopping")
+            self.stopped.set_result(None)
+
+
+def _run_worker(server, index: int, workers: int, conn, inherited_pipes):
+    """Entry point of a forked worker process"""
+    # Only the parent may hold the coordinator ends, so a dead parent reads as EOF here
+    for pipe in inherited_pipes:
+        pipe.close()
+    log_pipeline.forked_worker()
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # Shut down like Ctrl+C
+    server.cluster = ClusterWorker(index, workers, server.host, server.port, conn)
+    if server.metrics_server is not None:
+        server.metrics_server.port += index
+    try:
+        asyncio.run(server.start_server())
+    except KeyboardInterrupt:
+        pass
+
+
+class Coordinator:
+    """Parent process: forks the workers, restarts them and aggregates their stats"""
+
+    def __init__(self, server, workers: int):
+        if workers < 2:
+            raise ValueError("A cluster needs at least 2 workers")
+        self.server = server
+        self.workers = workers
+        self.context = multiprocessing.get_context('fork')
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.pipes: List[Any] = [None] * workers
+        self.snapshots: Dict[int, Dict[str, Any]] = {}
+        self.restarts = 0
+        self.last_broadcast = 0.0
+
+    def start_worker(self, index: int):
+        parent_conn, child_conn = self.context.Pipe(duplex=True)
+        inherited_pipes = [pipe for pipe in self.pipes if pipe is not None] + [parent_conn]
+        process = self.context.Process(target=_run_worker, name=f'ml-worker-{index}',
+                                       args=(self.server, index, self.workers, child_conn, inherited_pipes),
+                                       daemon=False)
+        process.start()
+        child_conn.close()
+        self.processes[index] = process
+        self.pipes[index] = parent_conn
+        logger.info(f"👷 Worker {index} started (pid {process.pid})")
+
+    def run(self):
+        """Serve until interrupted"""
+        # Models are loaded once here and shared copy-on-write with every worker
+        if not self.server.models and not self.server.load_models():
+            raise RuntimeError(f"Could not load models from {self.server.models_dir}")
+        gc.collect()
+        gc.freeze()  # Keep the collector from touching (and copying) the shared pages
+
+        logger.info(f"🧩 Starting {self.workers} workers on {self.server.host}:{self.server.port} "
+                    f"(relay ports {self.server.port + 1}-{self.server.port + self.workers})")
+        for index in range(self.workers):
+            self.start_worker(index)
+
+        try:
+            while True:
+                self.poll()
+        finally:
+            self.stop()
+
+    def poll(self, timeout: float = STATS_INTERVAL):
+        """Collect snapshots, restart dead workers and send totals back"""
+        ready = multiprocessing.connection.wait(
+            [pipe for pipe in self.pipes if pipe is not None]
+            + [process.sentinel for process in self.processes if process is not None],
+            timeout=timeout
+        )
+        for index, pipe in enumerate(self.pipes):
+            if pipe is None or pipe not in ready:
+                continue
+            try:
+                while pipe.poll():
+                    self.snapshots[index] = pipe.recv()
+            except (EOFError, OSError):
+                pass
+
+        for index, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                logger.error(f"💥 Worker {index} exited with code {process.exitcode}, restarting")
+                self.pipes[index].close()
+                self.snapshots.pop(index, None)
+                self.restarts += 1
+                time.sleep(RESTART_BACKOFF)
+                self.start_worker(index)
+
+        now = time.monotonic()
+        if now - self.last_broadcast < STATS_INTERVAL:
+            return
+        self.last_broadcast = now
+        totals = aggregate_stats(list(self.snapshots.values()))
+        totals['alive'] = sum(1 for process in self.processes if process is not None and process.is_alive())
+        totals['worker_restarts'] = self.restarts
+        for pipe in self.pipes:
+            try:
+                pipe.send(totals)
+            except (BrokenPipeError, OSError):
+                pass
+
+    def stop(self):
+        """Terminate and reap every worker"""
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout=5)
+        for pipe in self.pipes:
+            if pipe is not None:
+                pipe.close()
+
+
+def serve_cluster(server, workers: int):
+    """Run `server` as a coordinator with `workers` forked worker processes"""
+    Coordinator(server, workers).run()
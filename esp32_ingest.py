@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+ESP32 Ingestion
+Read audio levels straight from the ESP32 boards instead of through a browser tab
+
+The 2micsWebSocket.ino sketch runs a WebSocket server on port 81 and broadcasts
+one JSON object per processed window (about two per second):
+    {"leftMic": 45.2, "rightMic": 41.9, "difference": 3.4, "timestamp": 123456, "averageLevel": 43.5}
+
+The ML server can connect to a list of boards as a WebSocket client, one room
+per board, so predictions keep running when no dashboard is open. Each
+DeviceConnection reconnects with exponential backoff (with jitter) after a
+failure, and treats a board that stays silent for stale_timeout seconds as
+disconnected, since a board that drops off WiFi often leaves a half-open TCP
+connection behind. Browsers can still forward audio_data messages as before.
+
+Devices are given as [ROOM=]HOST[:PORT] or [ROOM=]ws://HOST:PORT/PATH; without
+a room the host name is used.
+"""
+
+import json
+import time
+import random
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Callable, Tuple
+
+import websockets
+
+from sessions import normalize_room_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEVICE_PORT = 81
+DEFAULT_STALE_TIMEOUT = 10.0
+DEFAULT_MIN_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+
+
+def parse_device_spec(spec: str) -> Tuple[str, str]:
+    """Room id and WebSocket URL of a [ROOM=]HOST[:PORT] device spec"""
+    room, _, address = spec.partition('=') if '=' in spec.split('://')[0] else ('', '', spec)
+    address = address.strip()
+    if not address:
+        raise ValueError(f"No device address in {spec!r}")
+    if '://' in address:
+        url = address
+        host = address.split('://', 1)[1].split('/', 1)[0].rsplit(':', 1)[0]
+    else:
+        host, _, port = address.partition(':')
+        url = f"ws://{host}:{int(port) if port else DEFAULT_DEVICE_PORT}/"
+    return normalize_room_id(room.strip() or host), url
+
+
+def device_sample(data: Dict[str, Any]) -> Dict[str, float]:
+    """Audio sample of a sketch message, with the defaults the browser relay applied"""
+    left = float(data.get('leftMic') or 0)
+    right = float(data.get('rightMic') or 0)
+    average = data.get('averageLevel')
+    return {
+        'leftMic': left,
+        'rightMic': right,
+        'difference': float(data.get('difference') or 0),
+        'averageLevel': float(average) if average else (left + right) / 2,
+        'timestamp': float(data.get('timestamp') or time.time() * 1000)
+    }
+
+
+class DeviceConnection:
+    """Upstream WebSocket client of one ESP32 board, feeding its samples to a room"""
+
+    def __init__(self, url: str, room_id: str, on_sample: Callable[[str, Dict[str, float]], None],
+                 stale_timeout: float = DEFAULT_STALE_TIMEOUT, min_backoff: float = DEFAULT_MIN_BACKOFF,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF, open_timeout: float = 5.0):
+        self.url = url
+        self.room_id = room_id
+        self.on_sample = on_sample
+        self.stale_timeout = stale_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.open_timeout = open_timeout
+        self.backoff = min_backoff
+        self._task: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.connected = False
+        self.connects = 0
+        self.failures = 0
+        self.samples = 0
+        self.invalid_messages = 0
+        self.last_sample_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> asyncio.Task:
+        """Start the connect/read/reconnect loop"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run(self):
+        """Read the board until cancelled, reconnecting after every failure"""
+        while True:
+            try:
+                await self._read()
+                self.last_error = 'connection closed'
+            except asyncio.CancelledError:
+                self.connected = False
+                raise
+            except asyncio.TimeoutError:
+                self.last_error = f'no data for {self.stale_timeout:g}s'
+            except (OSError, websockets.exceptions.WebSocketException) as e:
+                self.last_error = str(e) or type(e).__name__
+            except Exception as e:
+                logger.error(f"Error reading ESP32 {self.url}: {e}")
+                self.last_error = str(e)
+            if self.connected:
+                logger.warning(f"🔌 ESP32 {self.url} (room {self.room_id}) disconnected: {self.last_error}")
+            self.connected = False
+
+            self.failures += 1
+            delay = self.backoff * random.uniform(0.5, 1.0)  # Jitter keeps boards from reconnecting in step
+            logger.debug(f"Reconnecting to ESP32 {self.url} in {delay:.1f}s ({self.last_error})")
+            await asyncio.sleep(delay)
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+
+    async def _read(self):
+        async with websockets.connect(self.url, open_timeout=self.open_timeout, max_size=2 ** 16) as websocket:
+            self.connected = True
+            self.connects += 1
+            logger.info(f"📡 Connected to ESP32 {self.url} (room {self.room_id})")
+            while True:
+                message = await asyncio.wait_for(websocket.recv(), self.stale_timeout)
+                try:
+                    data = json.loads(message)
+                    if not isinstance(data, dict):
+                        raise ValueError("not a JSON object")
+                    sample = device_sample(data)
+                except (TypeError, ValueError):
+                    self.invalid_messages += 1
+                    continue
+                self.backoff = self.min_backoff  # Healthy again: the next failure retries quickly
+                self.samples += 1
+                self.last_sample_at = time.time()
+                self.on_sample(self.room_id, sample)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'room': self.room_id,
+            'connected': self.connected,
+            'connects': self.connects,
+            'failures': self.failures,
+            'samples': self.samples,
+            'invalid_messages': self.invalid_messages,
+            'seconds_since_sample': time.time() - self.last_sample_at if self.last_sample_at else None,
+            'last_error': self.last_error
+        }
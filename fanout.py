@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Broadcast Fan-out
+Per-client outgoing queues so one slow dashboard cannot stall the others
+
+Broadcasts are put on each subscriber's ClientOutbox and written by a sender task
+per client, so all subscribers are served concurrently and the event loop returns
+to incoming audio straight away. Queues are bounded: when full, the oldest
+droppable message (e.g. a superseded ml_predictions update) is discarded. A client
+whose queue stays at or above its high-water mark for longer than slow_timeout
+is disconnected.
+"""
+
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Callable
+
+from websockets.exceptions import ConnectionClosed
+
+from metrics import CLIENT_SEND_LAG
+
+logger = logging.getLogger(__name__)
+
+SLOW_CLIENT_CLOSE_CODE = 1008  # Policy violation
+SLOW_CLIENT_CLOSE_REASON = 'Client too slow to receive updates'
+
+
+class ClientOutbox:
+    """Bounded outgoing message queue and sender task of one WebSocket client"""
+
+    def __init__(self, websocket, client_id: str, max_queue: int = 8,
+                 high_water: Optional[int] = None, slow_timeout: float = 30.0,
+                 on_close: Optional[Callable[[Any, str], None]] = None):
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+        self.websocket = websocket
+        self.client_id = client_id
+        self.max_queue = max_queue
+        self.high_water = min(high_water or max_queue, max_queue)
+        self.slow_timeout = slow_timeout
+        self.on_close = on_close
+
+        self._queue = deque()  # (message, enqueued_at, droppable)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.over_high_water_since = None
+
+        # Statistics
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        """Start the sender task"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        """Stop sending and drop anything still queued"""
+        self.closed = True
+        self._queue.clear()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    def enqueue(self, message: str, droppable: bool = True) -> bool:
+        """Queue a serialized message; returns False if the client is gone"""
+        if self.closed:
+            return False
+
+        if len(self._queue) >= self.max_queue:
+            self._drop_oldest()
+        self._queue.append((message, time.monotonic(), droppable))
+        self._wakeup.set()
+
+        return not self._check_high_water()
+
+    def _drop_oldest(self):
+        """Make room by discarding the oldest droppable message (or the oldest one)"""
+        for index, (_, _, droppable) in enumerate(self._queue):
+            if droppable:
+                del self._queue[index]
+                break
+        else:
+            self._queue.popleft()
+        self.messages_dropped += 1
+
+    def _check_high_water(self) -> bool:
+        """Track time spent over the high-water mark; disconnects when it lasts too long"""
+        if len(self._queue) < self.high_water:
+            self.over_high_water_since = None
+            return False
+
+        now = time.monotonic()
+        if self.over_high_water_since is None:
+            self.over_high_water_since = now
+            return False
+        if now - self.over_high_water_since < self.slow_timeout:
+            return False
+
+        logger.warning(f"🐢 Disconnecting slow client {self.client_id}: {len(self._queue)} messages queued "
+                       f"for {now - self.over_high_water_since:.1f}s")
+        self._close(SLOW_CLIENT_CLOSE_REASON)
+        asyncio.ensure_future(self._close_connection())
+        return True
+
+    async def _close_connection(self):
+        try:
+            await self.websocket.close(code=SLOW_CLIENT_CLOSE_CODE, reason=SLOW_CLIENT_CLOSE_REASON)
+        except Exception as e:
+            logger.debug(f"Error closing slow client {self.client_id}: {e}")
+
+    def _close(self, reason: str):
+        """Stop the outbox and notify the owner once"""
+        if self.closed:
+            return
+        self.stop()
+        if self.on_close is not None:
+            self.on_close(self.websocket, reason)
+
+    async def _run(self):
+        """Send queued messages in order until the outbox is stopped"""
+        while not self.closed:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            message, enqueued_at, _ = self._queue.popleft()
+            try:
+                await self.websocket.send(message)
+            except ConnectionClosed:
+                self._close('connection closed')
+                return
+            except Exception as e:
+                logger.error(f"Error sending to client {self.client_id}: {e}")
+                self._close(str(e))
+                return
+
+            lag = time.monotonic() - enqueued_at
+            CLIENT_SEND_LAG.observe(lag)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.messages_sent += 1
+            if len(self._queue) < self.high_water:
+                self.over_high_water_since = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-client delivery counters for the stats message"""
+        return {
+            'client': self.client_id,
+            'queued': len(self._queue),
+            'sent': self.messages_sent,
+            'dropped': self.messages_dropped,
+            'last_lag_ms': self.last_lag * 1000,
+            'max_lag_ms': self.max_lag * 1000,
+            'over_high_water_s': time.monotonic() - self.over_high_water_since
+            if self.over_high_water_since is not None else 0.0
+        }
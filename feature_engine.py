@@ -0,0 +1,602 @@
+#!/usr/bin/env python3
+"""
+Feature Extraction Engine
+Computes the 39 meeting-room ML features over a sliding window of audio samples
+
+The batch implementation (compute_window_features) is the reference used during
+training. RollingFeatureEngine keeps the same features up to date incrementally
+as samples are appended and evicted, so a prediction only has to read them.
+sliding_window_features computes them for every window position of a whole
+recording at once, for offline evaluation and training-set generation.
+tests/test_feature_engine.py checks both against the batch implementation.
+"""
+
+import math
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from audio_buffer import AudioRingBuffer, AVERAGE, DIFFERENCE, TIMESTAMP
+
+HISTOGRAM_BINS = 5
+SILENCE_THRESHOLD = 40
+DOMINANCE_THRESHOLD = 2
+VOLUME_CHANGE_THRESHOLD = 5
+RAPID_CHANGE_THRESHOLD = 10
+STEREO_SWITCH_THRESHOLD = 3
+
+# Output order of compute_window_features
+FEATURE_NAMES = (
+    'avg_volume', 'max_volume', 'min_volume', 'volume_std', 'volume_range', 'volume_median',
+    'volume_25th', 'volume_75th', 'avg_stereo_diff', 'max_stereo_diff', 'min_stereo_diff',
+    'stereo_variation', 'stereo_bias', 'high_activity_ratio', 'low_activity_ratio', 'silence_ratio',
+    'peak_count', 'volume_changes', 'stereo_switches', 'rapid_changes', 'left_dominance',
+    'right_dominance', 'center_ratio', 'dynamic_range', 'session_length', 'avg_sample_interval',
+    'activity_variance', 'speaker_alternation', 'engagement_complexity'
+) + tuple(f'energy_bin_{i}' for i in range(HISTOGRAM_BINS)) \
+  + tuple(f'stereo_bin_{i}' for i in range(HISTOGRAM_BINS))
+
+
+def compute_window_features(avg_levels, differences, timestamps) -> Dict[str, float]:
+    """Extract ML features from one window of samples (batch reference implementation)"""
+    avg_levels = np.asarray(avg_levels, dtype=float)
+    differences = np.asarray(differences, dtype=float)
+    timestamps = np.asarray(timestamps, dtype=float)
+
+    # Extract features (matching the training feature extraction)
+    features = {
+        # Volume statistics
+        'avg_volume': float(np.mean(avg_levels)),
+        'max_volume': float(np.max(avg_levels)),
+        'min_volume': float(np.min(avg_levels)),
+        'volume_std': float(np.std(avg_levels)),
+        'volume_range': float(np.ptp(avg_levels)),
+        'volume_median': float(np.median(avg_levels)),
+        'volume_25th': float(np.percentile(avg_levels, 25)),
+        'volume_75th': float(np.percentile(avg_levels, 75)),
+
+        # Stereo positioning features
+        'avg_stereo_diff': float(np.mean(np.abs(differences))),
+        'max_stereo_diff': float(np.max(np.abs(differences))),
+        'min_stereo_diff': float(np.min(np.abs(differences))),
+        'stereo_variation': float(np.std(differences)),
+        'stereo_bias': float(np.mean(differences)),
+
+        # Activity features
+        'high_activity_ratio': float(np.sum(avg_levels > (np.mean(avg_levels) + np.std(avg_levels))) / len(avg_levels)),
+        'low_activity_ratio': float(np.sum(avg_levels < (np.mean(avg_levels) - np.std(avg_levels))) / len(avg_levels)),
+        'silence_ratio': float(np.sum(avg_levels < SILENCE_THRESHOLD) / len(avg_levels)),
+        'peak_count': float(len([i for i in range(1, len(avg_levels)-1)
+                                 if avg_levels[i] > avg_levels[i-1] and avg_levels[i] > avg_levels[i+1]])),
+
+        # Temporal patterns
+        'volume_changes': float(np.sum(np.abs(np.diff(avg_levels)) > VOLUME_CHANGE_THRESHOLD) / len(avg_levels)) if len(avg_levels) > 1 else 0.0,
+        'stereo_switches': float(np.sum(np.abs(np.diff(differences)) > STEREO_SWITCH_THRESHOLD) / len(avg_levels)) if len(differences) > 1 else 0.0,
+        'rapid_changes': float(np.sum(np.abs(np.diff(avg_levels)) > RAPID_CHANGE_THRESHOLD) / len(avg_levels)) if len(avg_levels) > 1 else 0.0,
+
+        # Advanced features
+        'left_dominance': float(np.sum(differences > DOMINANCE_THRESHOLD) / len(differences)),
+        'right_dominance': float(np.sum(differences < -DOMINANCE_THRESHOLD) / len(differences)),
+        'center_ratio': float(np.sum(np.abs(differences) < DOMINANCE_THRESHOLD) / len(differences)),
+        'dynamic_range': float(np.std(avg_levels) / np.mean(avg_levels)) if np.mean(avg_levels) > 0 else 0.0,
+
+        # Session features
+        'session_length': float(len(avg_levels)),
+        'avg_sample_interval': float(np.mean(np.diff(timestamps))) if len(timestamps) > 1 else 1000.0,
+
+        # Enhanced features for engagement
+        'activity_variance': float(np.var(avg_levels > np.mean(avg_levels))),
+        'speaker_alternation': float(len(np.where(np.diff(np.sign(differences)))[0])),
+        'engagement_complexity': float(np.sum(np.abs(np.diff(avg_levels, 2)))) if len(avg_levels) > 2 else 0.0
+    }
+
+    # Energy distribution features (5 bins)
+    energy_bins = np.histogram(avg_levels, bins=HISTOGRAM_BINS)[0]
+    for i, count in enumerate(energy_bins):
+        features[f'energy_bin_{i}'] = float(count / len(avg_levels))
+
+    # Stereo distribution features (5 bins)
+    stereo_bins = np.histogram(differences, bins=HISTOGRAM_BINS)[0]
+    for i, count in enumerate(stereo_bins):
+        features[f'stereo_bin_{i}'] = float(count / len(differences))
+
+    # Ensure no NaN or infinite values
+    for key, value in features.items():
+        if np.isnan(value) or np.isinf(value):
+            features[key] = 0.0
+
+    return features
+
+
+def _sign(value: float) -> float:
+    """Scalar equivalent of np.sign (NaN stays NaN)"""
+    if value > 0:
+        return 1.0
+    if value < 0:
+        return -1.0
+    return value  # 0.0 or NaN
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile of a sorted sequence, as np.percentile computes it"""
+    index = q / 100.0 * (len(sorted_values) - 1)
+    lower = int(index)
+    fraction = index - lower
+    if lower + 1 >= len(sorted_values):
+        return sorted_values[lower]
+    a, b = sorted_values[lower], sorted_values[lower + 1]
+    delta = b - a
+    if fraction >= 0.5:
+        return b - delta * (1.0 - fraction)
+    return a + delta * fraction
+
+
+def _histogram_ratios(sorted_values: Sequence[float], n: int) -> list:
+    """Equal-width 5-bin histogram (np.histogram semantics) read from a sorted sequence"""
+    first_edge, last_edge = sorted_values[0], sorted_values[-1]
+    if first_edge == last_edge:
+        first_edge -= 0.5
+        last_edge += 0.5
+    step = (last_edge - first_edge) / HISTOGRAM_BINS
+    edges = [float(k) * step + first_edge for k in range(HISTOGRAM_BINS)] + [last_edge]
+
+    # Bin k holds edges[k] <= x < edges[k + 1]; the last bin also holds the right edge
+    positions = [bisect_left(sorted_values, edge) for edge in edges[:-1]] + [n]
+    return [(positions[k + 1] - positions[k]) / n for k in range(HISTOGRAM_BINS)]
+
+
+def _window_counts(indicator: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Number of true entries of indicator in each [start, end) range (exact integer prefix sums)"""
+    prefix = np.zeros(len(indicator) + 1, dtype=np.int64)
+    np.cumsum(indicator, out=prefix[1:])
+    return prefix[ends] - prefix[starts]
+
+
+def _window_sums(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Sum of values in each [start, end) range via a cumulative sum"""
+    prefix = np.zeros(len(values) + 1, dtype=np.float64)
+    np.cumsum(values, out=prefix[1:])
+    return prefix[ends] - prefix[starts]
+
+
+def _sorted_percentile(sorted_rows: np.ndarray, q: float) -> np.ndarray:
+    """_percentile applied to every row of a row-sorted matrix"""
+    width = sorted_rows.shape[1]
+    index = q / 100.0 * (width - 1)
+    lower = int(index)
+    fraction = index - lower
+    if lower + 1 >= width:
+        return sorted_rows[:, lower].copy()
+    a, b = sorted_rows[:, lower], sorted_rows[:, lower + 1]
+    delta = b - a
+    if fraction >= 0.5:
+        return b - delta * (1.0 - fraction)
+    return a + delta * fraction
+
+
+def _histogram_rows(rows: np.ndarray, first_edge: np.ndarray, last_edge: np.ndarray) -> np.ndarray:
+    """_histogram_ratios for every row, given each row's minimum and maximum"""
+    width = rows.shape[1]
+    first_edge = first_edge.copy()
+    last_edge = last_edge.copy()
+    flat = first_edge == last_edge
+    first_edge[flat] -= 0.5
+    last_edge[flat] += 0.5
+    step = (last_edge - first_edge) / HISTOGRAM_BINS
+
+    # Samples below each interior edge; bin k holds edges[k] <= x < edges[k + 1]
+    below = np.empty((rows.shape[0], HISTOGRAM_BINS + 1), dtype=np.int64)
+    for k in range(HISTOGRAM_BINS):
+        edge = float(k) * step + first_edge
+        below[:, k] = np.count_nonzero(rows < edge[:, None], axis=1)
+    below[:, HISTOGRAM_BINS] = width
+    return np.diff(below, axis=1) / width
+
+
+def sliding_window_features(average_levels, differences, timestamps, window: int = 150, stride: int = 1,
+                            chunk_size: int = 2048) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Features of every full window of a recording, computed for all positions at once
+
+    Windows start at 0, stride, 2*stride, ... and hold `window` samples. Returns
+    the start index of each window and a dict mapping every feature name to an
+    array with one value per window, equal to compute_window_features on that
+    window. Windows holding NaN/inf levels (which compute_window_features rejects)
+    get NaN for every feature.
+
+    Sums and threshold counts come from prefix sums over the whole recording;
+    standard deviations and order statistics (median, percentiles, histograms,
+    activity ratios) from strided views of the windows, processed chunk_size
+    windows at a time. Deviations are taken from each window's mean: a variance
+    from prefix sums of squares cancels badly for (near-)constant windows.
+    """
+    avg = np.asarray(average_levels, dtype=np.float64)
+    diff = np.asarray(differences, dtype=np.float64)
+    ts = np.asarray(timestamps, dtype=np.float64)
+    n = len(avg)
+    if len(diff) != n or len(ts) != n:
+        raise ValueError("average_levels, differences and timestamps must have the same length")
+    if window < 1 or stride < 1:
+        raise ValueError("window and stride must be at least 1")
+
+    w = window
+    starts = np.arange(0, n - w + 1, stride) if n >= w else np.arange(0)
+    ends = starts + w
+    features = {name: np.zeros(len(starts)) for name in FEATURE_NAMES}
+    if len(starts) == 0:
+        return starts, features
+
+    # Non-finite levels invalidate a window; zero them so they cannot poison the prefix sums
+    finite = np.isfinite(avg) & np.isfinite(diff)
+    invalid = _window_counts(~finite, starts, ends) > 0
+    avg = np.where(finite, avg, 0.0)
+    diff = np.where(finite, diff, 0.0)
+
+    # Shifted sums keep the means accurate on long recordings
+    avg_shift = float(np.mean(avg))
+    diff_shift = float(np.mean(diff))
+    avg_mean = avg_shift + _window_sums(avg - avg_shift, starts, ends) / w
+    diff_mean = diff_shift + _window_sums(diff - diff_shift, starts, ends) / w
+
+    features['avg_volume'] = avg_mean
+    features['stereo_bias'] = diff_mean
+    features['avg_stereo_diff'] = _window_sums(np.abs(diff), starts, ends) / w
+    features['silence_ratio'] = _window_counts(avg < SILENCE_THRESHOLD, starts, ends) / w
+    features['left_dominance'] = _window_counts(diff > DOMINANCE_THRESHOLD, starts, ends) / w
+    features['right_dominance'] = _window_counts(diff < -DOMINANCE_THRESHOLD, starts, ends) / w
+    features['center_ratio'] = _window_counts(np.abs(diff) < DOMINANCE_THRESHOLD, starts, ends) / w
+    features['session_length'][:] = float(w)
+
+    # Neighbour pairs (i, i + 1) of a window start at i in [start, end - 1)
+    if w > 1:
+        volume_steps = np.abs(np.diff(avg))
+        features['volume_changes'] = _window_counts(volume_steps > VOLUME_CHANGE_THRESHOLD, starts, ends - 1) / w
+        features['rapid_changes'] = _window_counts(volume_steps > RAPID_CHANGE_THRESHOLD, starts, ends - 1) / w
+        features['stereo_switches'] = _window_counts(np.abs(np.diff(diff)) > STEREO_SWITCH_THRESHOLD,
+                                                     starts, ends - 1) / w
+        signs = np.sign(np.asarray(differences, dtype=np.float64))
+        features['speaker_alternation'] = _window_counts(np.diff(signs) != 0, starts, ends - 1).astype(np.float64)
+
+    # Triples (i, i + 1, i + 2) start at i in [start, end - 2)
+    if w > 2:
+        peaks = (avg[1:-1] > avg[:-2]) & (avg[1:-1] > avg[2:])
+        features['peak_count'] = _window_counts(peaks, starts, ends - 2).astype(np.float64)
+        features['engagement_complexity'] = _window_sums(np.abs(np.diff(avg, 2)), starts, ends - 2)
+
+    # Mean sample interval telescopes to (last - first) / (w - 1)
+    if w > 1:
+        ts_invalid = _window_counts(~np.isfinite(ts), starts, ends) > 0
+        with np.errstate(invalid='ignore', over='ignore'):
+            interval = (ts[ends - 1] - ts[starts]) / (w - 1)
+        features['avg_sample_interval'] = np.where(ts_invalid, 0.0, interval)
+    else:
+        features['avg_sample_interval'][:] = 1000.0
+
+    # Order statistics over sorted strided views, a chunk of windows at a time
+    avg_windows = sliding_window_view(avg, w)
+    diff_windows = sliding_window_view(diff, w)
+    median_index = w // 2
+    for chunk_start in range(0, len(starts), chunk_size):
+        rows = slice(chunk_start, chunk_start + chunk_size)
+        chunk_starts = starts[rows]
+        levels = avg_windows[chunk_starts]
+        stereo = diff_windows[chunk_starts]
+        sorted_levels = np.sort(levels, axis=1)
+        abs_stereo = np.abs(stereo)
+        mean = avg_mean[rows][:, None]
+        deviation = levels - mean
+        std = np.sqrt(np.mean(deviation * deviation, axis=1))[:, None]
+        deviation = stereo - diff_mean[rows][:, None]
+        features['volume_std'][rows] = std[:, 0]
+        features['stereo_variation'][rows] = np.sqrt(np.mean(deviation * deviation, axis=1))
+
+        features['max_volume'][rows] = sorted_levels[:, -1]
+        features['min_volume'][rows] = sorted_levels[:, 0]
+        features['volume_range'][rows] = sorted_levels[:, -1] - sorted_levels[:, 0]
+        if w % 2:
+            features['volume_median'][rows] = sorted_levels[:, median_index]
+        else:
+            features['volume_median'][rows] = (sorted_levels[:, median_index - 1] + sorted_levels[:, median_index]) / 2.0
+        features['volume_25th'][rows] = _sorted_percentile(sorted_levels, 25)
+        features['volume_75th'][rows] = _sorted_percentile(sorted_levels, 75)
+        features['max_stereo_diff'][rows] = abs_stereo.max(axis=1)
+        features['min_stereo_diff'][rows] = abs_stereo.min(axis=1)
+
+        features['high_activity_ratio'][rows] = np.count_nonzero(levels > mean + std, axis=1) / w
+        features['low_activity_ratio'][rows] = np.count_nonzero(levels < mean - std, axis=1) / w
+        above_mean = np.count_nonzero(levels > mean, axis=1) / w
+        features['activity_variance'][rows] = above_mean * (1.0 - above_mean)
+
+        energy = _histogram_rows(levels, sorted_levels[:, 0], sorted_levels[:, -1])
+        stereo_bins = _histogram_rows(stereo, stereo.min(axis=1), stereo.max(axis=1))
+        for i in range(HISTOGRAM_BINS):
+            features[f'energy_bin_{i}'][rows] = energy[:, i]
+            features[f'stereo_bin_{i}'][rows] = stereo_bins[:, i]
+
+    avg_std = features['volume_std']
+    features['dynamic_range'] = np.divide(avg_std, avg_mean, out=np.zeros_like(avg_std), where=avg_mean > 0)
+
+    # Same clean-up as the batch implementation, then mark rejected windows
+    for name, values in features.items():
+        values[~np.isfinite(values)] = 0.0
+        values[invalid] = np.nan
+
+    return starts, features
+
+
+class RollingFeatureEngine:
+    """Sliding-window feature state updated in O(1)/O(log n) per sample
+
+    Running (shifted) sums, threshold counters, neighbour-pair counters, peak and
+    sign-change counts are adjusted as each sample enters and leaves the window.
+    Order statistics (median, percentiles, histogram bins, threshold ratios) are
+    read from sorted copies of the window with bisect. The samples themselves
+    live in an AudioRingBuffer, which other readers can share.
+    """
+
+    def __init__(self, capacity: int = 150, buffer: Optional[AudioRingBuffer] = None):
+        self.buffer = buffer if buffer is not None else AudioRingBuffer(capacity)
+        self.capacity = self.buffer.capacity
+        self.buffer.clear()
+
+        self._sorted_avg = []
+        self._sorted_diff = []
+
+        self._reset_state()
+
+    def _reset_state(self):
+        """Zero every accumulator and counter"""
+        # Shifted sums keep the variance numerically stable (exact for constant windows)
+        self._avg_shift = 0.0
+        self._diff_shift = 0.0
+        self._avg_sum = 0.0
+        self._avg_sumsq = 0.0
+        self._diff_sum = 0.0
+        self._diff_sumsq = 0.0
+        self._abs_diff_sum = 0.0
+        self._complexity_sum = 0.0
+
+        self._silence_count = 0
+        self._left_count = 0
+        self._right_count = 0
+        self._center_count = 0
+        self._volume_change_count = 0
+        self._rapid_change_count = 0
+        self._stereo_switch_count = 0
+        self._sign_change_count = 0
+        self._peak_count = 0
+
+        self._nonfinite_count = 0
+        self._nonfinite_ts_count = 0
+        self._appends_since_resync = 0
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def clear(self):
+        """Drop every sample from the window"""
+        self.buffer.clear()
+        self._sorted_avg.clear()
+        self._sorted_diff.clear()
+        self._reset_state()
+
+    def append(self, average_level: float, difference: float, timestamp: float,
+               left_level: float = 0.0, right_level: float = 0.0):
+        """Add a sample to the window, evicting the oldest one when full"""
+        x = float(average_level)
+        d = float(difference)
+        t = float(timestamp)
+
+        n = len(self.buffer)
+        needs_resync = False
+        if n >= self.capacity:
+            needs_resync = self._evict_oldest()
+            n -= 1
+
+        if n == 0:
+            self._avg_shift = x if math.isfinite(x) else 0.0
+            self._diff_shift = d if math.isfinite(d) else 0.0
+
+        if n >= 1:
+            # The newest samples are still in the buffer after an eviction
+            tail = self.buffer.window(2)
+            prev_x = float(tail[AVERAGE, -1])
+            prev_d = float(tail[DIFFERENCE, -1])
+            self._add_pair(prev_x, x, prev_d, d, 1)
+            if n >= 2:
+                self._add_triple(float(tail[AVERAGE, 0]), prev_x, x, 1)
+
+        self._add_point(x, d, t, 1)
+        self.buffer.append(left_level, right_level, d, x, t)
+
+        self._appends_since_resync += 1
+        if needs_resync or self._appends_since_resync >= self.capacity:
+            self._resync()
+
+    def extend(self, average_levels, differences, timestamps, left_levels=None, right_levels=None):
+        """Append several samples in order"""
+        count = len(average_levels)
+        left_levels = [0.0] * count if left_levels is None else left_levels
+        right_levels = [0.0] * count if right_levels is None else right_levels
+        for i in range(count):
+            self.append(average_levels[i], differences[i], timestamps[i], left_levels[i], right_levels[i])
+
+    def _evict_oldest(self) -> bool:
+        """Retract the oldest sample's contributions before the buffer overwrites it
+
+        Returns True when the accumulators must be rebuilt once the new sample is in.
+        """
+        n = len(self.buffer)
+        head = self.buffer.window()[:, :3].tolist()
+        x0, d0, t0 = head[AVERAGE][0], head[DIFFERENCE][0], head[TIMESTAMP][0]
+        if n >= 2:
+            self._add_pair(x0, head[AVERAGE][1], d0, head[DIFFERENCE][1], -1)
+            if n >= 3:
+                self._add_triple(x0, head[AVERAGE][1], head[AVERAGE][2], -1)
+
+        had_nonfinite = self._nonfinite_count > 0
+        self._add_point(x0, d0, t0, -1)
+
+        # Sums were poisoned by the evicted value; rebuild them
+        return had_nonfinite and self._nonfinite_count == 0
+
+    def _add_point(self, x: float, d: float, t: float, sign: int):
+        """Apply (sign=1) or retract (sign=-1) one sample's contribution"""
+        xs = x - self._avg_shift
+        ds = d - self._diff_shift
+        self._avg_sum += sign * xs
+        self._avg_sumsq += sign * xs * xs
+        self._diff_sum += sign * ds
+        self._diff_sumsq += sign * ds * ds
+        self._abs_diff_sum += sign * abs(d)
+
+        self._silence_count += sign * (x < SILENCE_THRESHOLD)
+        self._left_count += sign * (d > DOMINANCE_THRESHOLD)
+        self._right_count += sign * (d < -DOMINANCE_THRESHOLD)
+        self._center_count += sign * (abs(d) < DOMINANCE_THRESHOLD)
+
+        if not (math.isfinite(x) and math.isfinite(d)):
+            self._nonfinite_count += sign
+        if not math.isfinite(t):
+            self._nonfinite_ts_count += sign
+
+        if sign > 0:
+            if not math.isnan(x):
+                insort(self._sorted_avg, x)
+            if not math.isnan(d):
+                insort(self._sorted_diff, d)
+        else:
+            if not math.isnan(x):
+                del self._sorted_avg[bisect_left(self._sorted_avg, x)]
+            if not math.isnan(d):
+                del self._sorted_diff[bisect_left(self._sorted_diff, d)]
+
+    def _add_pair(self, x0: float, x1: float, d0: float, d1: float, sign: int):
+        """Apply or retract the counters of two consecutive samples"""
+        volume_step = abs(x1 - x0)
+        self._volume_change_count += sign * (volume_step > VOLUME_CHANGE_THRESHOLD)
+        self._rapid_change_count += sign * (volume_step > RAPID_CHANGE_THRESHOLD)
+        self._stereo_switch_count += sign * (abs(d1 - d0) > STEREO_SWITCH_THRESHOLD)
+        self._sign_change_count += sign * (_sign(d1) != _sign(d0))
+
+    def _add_triple(self, x0: float, x1: float, x2: float, sign: int):
+        """Apply or retract the second difference and peak status of the middle sample"""
+        self._complexity_sum += sign * abs((x2 - x1) - (x1 - x0))
+        self._peak_count += sign * (x1 > x0 and x1 > x2)
+
+    def _resync(self):
+        """Recompute the floating-point accumulators from the window to bound drift"""
+        self._appends_since_resync = 0
+        n = len(self.buffer)
+        if n == 0 or self._nonfinite_count:
+            return
+
+        levels = self.buffer.levels()
+        differences = self.buffer.differences()
+        self._avg_shift = float(levels[0])
+        self._diff_shift = float(differences[0])
+        shifted_levels = levels - self._avg_shift
+        shifted_differences = differences - self._diff_shift
+
+        self._avg_sum = float(shifted_levels.sum())
+        self._avg_sumsq = float(shifted_levels @ shifted_levels)
+        self._diff_sum = float(shifted_differences.sum())
+        self._diff_sumsq = float(shifted_differences @ shifted_differences)
+        self._abs_diff_sum = float(np.abs(differences).sum())
+        self._complexity_sum = float(np.abs(np.diff(levels, 2)).sum()) if n > 2 else 0.0
+
+    def features(self) -> Optional[Dict[str, float]]:
+        """Current window features, identical to compute_window_features on the same window
+
+        Returns None for an empty window or when it holds NaN/inf levels, which the
+        batch implementation rejects as well (its histogram range is not finite).
+        """
+        n = len(self.buffer)
+        if n == 0 or self._nonfinite_count:
+            return None
+
+        sorted_avg = self._sorted_avg
+        sorted_diff = self._sorted_diff
+
+        avg_mean_shifted = self._avg_sum / n
+        avg_mean = self._avg_shift + avg_mean_shifted
+        avg_std = math.sqrt(max(self._avg_sumsq / n - avg_mean_shifted * avg_mean_shifted, 0.0))
+        diff_mean_shifted = self._diff_sum / n
+        diff_mean = self._diff_shift + diff_mean_shifted
+        diff_std = math.sqrt(max(self._diff_sumsq / n - diff_mean_shifted * diff_mean_shifted, 0.0))
+
+        if n % 2:
+            median = sorted_avg[n // 2]
+        else:
+            median = (sorted_avg[n // 2 - 1] + sorted_avg[n // 2]) / 2.0
+
+        zero_index = bisect_left(sorted_diff, 0.0)
+        min_abs_diff = min(abs(sorted_diff[i]) for i in (zero_index - 1, zero_index) if 0 <= i < n)
+
+        above_mean = (n - bisect_right(sorted_avg, avg_mean)) / n
+
+        if n == 1:
+            sample_interval = 1000.0
+        elif self._nonfinite_ts_count:
+            sample_interval = 0.0
+        else:
+            timestamps = self.buffer.timestamps()
+            sample_interval = float(timestamps[-1] - timestamps[0]) / (n - 1)
+
+        features = {
+            # Volume statistics
+            'avg_volume': avg_mean,
+            'max_volume': sorted_avg[-1],
+            'min_volume': sorted_avg[0],
+            'volume_std': avg_std,
+            'volume_range': sorted_avg[-1] - sorted_avg[0],
+            'volume_median': median,
+            'volume_25th': _percentile(sorted_avg, 25),
+            'volume_75th': _percentile(sorted_avg, 75),
+
+            # Stereo positioning features
+            'avg_stereo_diff': self._abs_diff_sum / n,
+            'max_stereo_diff': max(abs(sorted_diff[0]), abs(sorted_diff[-1])),
+            'min_stereo_diff': min_abs_diff,
+            'stereo_variation': diff_std,
+            'stereo_bias': diff_mean,
+
+            # Activity features
+            'high_activity_ratio': (n - bisect_right(sorted_avg, avg_mean + avg_std)) / n,
+            'low_activity_ratio': bisect_left(sorted_avg, avg_mean - avg_std) / n,
+            'silence_ratio': self._silence_count / n,
+            'peak_count': float(self._peak_count),
+
+            # Temporal patterns
+            'volume_changes': self._volume_change_count / n if n > 1 else 0.0,
+            'stereo_switches': self._stereo_switch_count / n if n > 1 else 0.0,
+            'rapid_changes': self._rapid_change_count / n if n > 1 else 0.0,
+
+            # Advanced features
+            'left_dominance': self._left_count / n,
+            'right_dominance': self._right_count / n,
+            'center_ratio': self._center_count / n,
+            'dynamic_range': avg_std / avg_mean if avg_mean > 0 else 0.0,
+
+            # Session features
+            'session_length': float(n),
+            'avg_sample_interval': sample_interval,
+
+            # Enhanced features for engagement
+            'activity_variance': above_mean * (1.0 - above_mean),
+            'speaker_alternation': float(self._sign_change_count),
+            'engagement_complexity': self._complexity_sum if n > 2 else 0.0
+        }
+
+        for i, ratio in enumerate(_histogram_ratios(sorted_avg, n)):
+            features[f'energy_bin_{i}'] = ratio
+        for i, ratio in enumerate(_histogram_ratios(sorted_diff, n)):
+            features[f'stereo_bin_{i}'] = ratio
+
+        # Ensure no NaN or infinite values
+        for key, value in features.items():
+            if math.isnan(value) or math.isinf(value):
+                features[key] = 0.0
+
+        return features
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Forest Engine
+Vectorized NumPy evaluation of scikit-learn random forests and decision trees
+
+compile_forest() flattens every tree's `tree_` arrays into one set of
+contiguous node arrays (node indices are global across trees), already in the
+dtypes and layout the walk uses, so memory-mapped bundle arrays are evaluated
+in place without copies. A prediction
+walks all trees for all rows at once, one tree level per step: a (trees, rows)
+array of current nodes is advanced with a handful of gathers, with no per-tree
+Python or joblib dispatch. Leaves point to themselves, so every tree is walked
+for the forest's max depth without tracking which rows are done.
+
+Results are bit-identical to scikit-learn: inputs are cast to float32 as the
+forest does, per-tree leaf values are normalised the same way and summed in
+tree order before dividing by the number of trees.
+"""
+
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Arrays that describe a flattened forest (also the .npy files of a model bundle):
+# split feature (0 for leaves, which read column 0 and stay put), threshold,
+# children interleaved so node 2*i + go_right is the next node, whether missing
+# values go right, leaf values and each tree's root node
+TREE_ARRAYS = ('feature', 'threshold', 'children', 'missing_right', 'value', 'roots')
+
+
+def is_supported(model) -> bool:
+    """Whether a model is a single-output forest or decision tree the engine can evaluate"""
+    module = type(model).__module__
+    is_tree_model = ((module.startswith('sklearn.ensemble._forest') and hasattr(model, 'estimators_'))
+                     or (module.startswith('sklearn.tree') and hasattr(model, 'tree_')))
+    return is_tree_model and getattr(model, 'n_outputs_', 1) == 1
+
+
+def flatten_trees(model) -> Tuple[Dict[str, np.ndarray], int]:
+    """Concatenated node arrays of every tree in a forest (or a single tree) and the max depth"""
+    estimators = model.estimators_ if hasattr(model, 'estimators_') else [model]
+    is_classifier = hasattr(model, 'classes_')
+    parts = {name: [] for name in TREE_ARRAYS if name != 'roots'}
+    roots = []
+    offset = 0
+    max_depth = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        roots.append(offset)
+        parts['feature'].append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+        parts['threshold'].append(tree.threshold.astype(np.float64))
+        own_index = np.arange(tree.node_count) + offset
+        left = np.where(is_leaf, own_index, tree.children_left + offset)
+        right = np.where(is_leaf, own_index, tree.children_right + offset)
+        parts['children'].append(np.stack([left, right], axis=1).ravel().astype(np.intp))
+        missing_left = getattr(tree, 'missing_go_to_left', None)
+        parts['missing_right'].append(np.ones(tree.node_count, dtype=bool) if missing_left is None
+                                      else ~np.asarray(missing_left, dtype=bool))
+        if is_classifier:
+            # DecisionTreeClassifier.predict_proba: leaf values normalised to sum to 1
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+        else:
+            value = tree.value[:, 0, 0].astype(np.float64)
+        parts['value'].append(value)
+        offset += tree.node_count
+        max_depth = max(max_depth, int(tree.max_depth))
+
+    arrays = {name: np.concatenate(chunks) for name, chunks in parts.items()}
+    arrays['roots'] = np.asarray(roots, dtype=np.intp)
+    return arrays, max_depth
+
+
+class CompiledForest:
+    """Tree ensemble evaluated level by level across all trees from flattened node arrays"""
+
+    predict_from_proba = True
+
+    def __init__(self, task: str, arrays: Dict[str, np.ndarray], max_depth: int,
+                 n_features: int, classes: Optional[np.ndarray] = None):
+        self.task = task
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+        if classes is not None:
+            self.classes_ = classes
+            self.n_outputs_ = 1
+
+        # Used as given (no copy) when already in the flattened dtypes, e.g. memory-mapped
+        self.split_feature = np.asarray(arrays['feature'], dtype=np.intp)
+        self.threshold = np.asarray(arrays['threshold'], dtype=np.float64)
+        self.children = np.asarray(arrays['children'], dtype=np.intp)
+        self.missing_right = np.asarray(arrays['missing_right'], dtype=bool)
+        self.value = np.asarray(arrays['value'], dtype=np.float64)
+        self.roots = np.asarray(arrays['roots'], dtype=np.intp)
+
+    @classmethod
+    def from_model(cls, model) -> 'CompiledForest':
+        """Flatten a fitted scikit-learn forest or decision tree"""
+        arrays, max_depth = flatten_trees(model)
+        classes = np.asarray(model.classes_) if hasattr(model, 'classes_') else None
+        return cls('classification' if classes is not None else 'regression', arrays, max_depth,
+                   int(getattr(model, 'n_features_in_', 0)), classes)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.threshold)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Global index of the leaf every row reaches in every tree, shape (trees, rows)"""
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[np.newaxis, :]
+        node = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        has_nan = bool(np.isnan(flat).any())
+        for _ in range(self.max_depth):
+            values = np.take(flat, row_offsets + np.take(self.split_feature, node))
+            go_right = values > np.take(self.threshold, node)
+            if has_nan:
+                # Missing values follow the side the split learned for them (right if none)
+                go_right |= np.isnan(values) & np.take(self.missing_right, node)
+            node = np.take(self.children, 2 * node + go_right)
+        return node
+
+    def _average(self, X) -> np.ndarray:
+        # scikit-learn validates prediction input to float32 before walking the trees
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or (self.n_features_in_ and X.shape[1] != self.n_features_in_):
+            raise ValueError(f"X has shape {X.shape}, but the forest expects {self.n_features_in_} features")
+        leaf_values = self.value[self.apply(X)]
+        # add.accumulate sums strictly tree by tree, in the forest's order
+        total = np.add.accumulate(leaf_values, axis=0)[-1]
+        total /= self.n_trees
+        return total
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self._average(X)
+
+    def predict(self, X) -> np.ndarray:
+        if self.task == 'regression':
+            return self._average(X)
+        return self.classes_.take(np.argmax(self._average(X), axis=1), axis=0)
+
+    def describe(self) -> Dict[str, Any]:
+        return {'task': self.task, 'trees': self.n_trees, 'nodes': self.n_nodes, 'max_depth': self.max_depth}
+
+
+def compile_forest(model) -> Optional[CompiledForest]:
+    """CompiledForest for a supported model, None for anything else"""
+    if not is_supported(model):
+        return None
+    try:
+        return CompiledForest.from_model(model)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not compile {type(model).__name__}, using its own predict: {e}")
+        return None
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+History Store
+Append-only, memory-mapped columnar history of raw audio samples and predictions
+
+Layout (one directory per room under the store root):
+    <root>/<room>/samples_<seq>.seg       columns: received_at, timestamp, leftMic,
+                                          rightMic, difference, averageLevel
+    <root>/<room>/predictions_<seq>.seg   columns: received_at, payload offset, payload length
+    <root>/<room>/predictions_<seq>.jsonl serialized ml_predictions messages
+
+A segment file is a 32-byte header (magic, row count, capacity, column count)
+followed by float64 columns stored one after another, so a time-range query is a
+binary search on the received_at column and a slice of the memory map. Segments
+rotate when full; the oldest are deleted past the retention age or segment count.
+
+Writes are buffered in memory by record_*() (cheap, event-loop safe) and written
+by flush(), which the server runs in a worker thread. At most max_open_rooms rooms
+keep their segments mapped for writing (least recently written rooms are closed
+first, and the server closes a room when its session is evicted); queries map the
+segments of a room read-only and unmap them when the query ends.
+"""
+
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAGIC = np.frombuffer(b'MLHIST01', dtype=np.uint64)[0]
+HEADER_WORDS = 4  # magic, count, capacity, column count
+HEADER_BYTES = HEADER_WORDS * 8
+
+SAMPLE_COLUMNS = ('received_at', 'timestamp', 'leftMic', 'rightMic', 'difference', 'averageLevel')
+PREDICTION_COLUMNS = ('received_at', 'offset', 'length')
+
+SEGMENT_NAME = re.compile(r'^(samples|predictions)_(\d+)\.seg$')
+SAFE_ROOM_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def room_directory_name(room_id: str) -> str:
+    """File-system safe, stable directory name for a room id"""
+    if SAFE_ROOM_NAME.match(room_id):
+        return room_id
+    digest = hashlib.sha1(room_id.encode('utf-8')).hexdigest()[:12]
+    return re.sub(r'[^A-Za-z0-9_-]', '_', room_id)[:40] + '-' + digest
+
+
+class ColumnSegment:
+    """One fixed-capacity segment file of float64 columns; column 0 is the time key"""
+
+    def __init__(self, path: Path, header: np.memmap, data: np.memmap):
+        self.path = path
+        self._header = header
+        self.data = data
+        self.capacity = data.shape[1]
+        self.closed = False
+
+    @classmethod
+    def create(cls, path: Path, columns: int, capacity: int) -> 'ColumnSegment':
+        header = np.memmap(path, dtype=np.uint64, mode='w+', shape=(HEADER_WORDS,))
+        header[:] = (SEGMENT_MAGIC, 0, capacity, columns)
+        header.flush()
+        data = np.memmap(path, dtype=np.float64, mode='r+', offset=HEADER_BYTES, shape=(columns, capacity))
+        return cls(path, header, data)
+
+    @classmethod
+    def open(cls, path: Path, read_only: bool = False) -> 'ColumnSegment':
+        mode = 'r' if read_only else 'r+'
+        header = np.memmap(path, dtype=np.uint64, mode=mode, shape=(HEADER_WORDS,))
+        if header[0] != SEGMENT_MAGIC:
+            raise ValueError(f"Not a history segment: {path}")
+        capacity, columns = int(header[2]), int(header[3])
+        data = np.memmap(path, dtype=np.float64, mode=mode, offset=HEADER_BYTES, shape=(columns, capacity))
+        return cls(path, header, data)
+
+    @property
+    def count(self) -> int:
+        return int(self._header[1])
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def first_time(self) -> float:
+        return float(self.data[0, 0]) if self.count else float('nan')
+
+    @property
+    def last_time(self) -> float:
+        return float(self.data[0, self.count - 1]) if self.count else float('nan')
+
+    def append(self, block: np.ndarray) -> int:
+        """Write as many rows of a (columns, k) block as fit; returns the number written"""
+        count = self.count
+        written = min(block.shape[1], self.capacity - count)
+        if written > 0:
+            self.data[:, count:count + written] = block[:, :written]
+            # Publish the rows only after their data is in place
+            self._header[1] = count + written
+        return written
+
+    def row_range(self, start: float, end: float) -> Tuple[int, int]:
+        """Rows whose time key lies in [start, end)"""
+        times = self.data[0, :self.count]
+        return int(np.searchsorted(times, start, side='left')), int(np.searchsorted(times, end, side='left'))
+
+    def flush(self):
+        if self.data.flags.writeable:
+            self.data.flush()
+            self._header.flush()
+
+    def close(self):
+        """Flush, mark closed and drop the maps; the file is unmapped once no reader holds a view"""
+        if not self.closed:
+            self.flush()
+            self.closed = True
+            self._header = self.data = None
+
+
+class RoomHistory:
+    """Sample and prediction segments of one room"""
+
+    def __init__(self, directory: Path, segment_samples: int, segment_predictions: int, read_only: bool = False):
+        self.directory = directory
+        self.segment_samples = segment_samples
+        self.segment_predictions = segment_predictions
+        self.read_only = read_only
+        self.segments: Dict[str, List[ColumnSegment]] = {'samples': [], 'predictions': []}
+        self._next_seq = {'samples': 0, 'predictions': 0}
+
+        if not read_only:
+            directory.mkdir(parents=True, exist_ok=True)
+        self._open_existing()
+
+    def _open_existing(self):
+        """Reopen the segments written by earlier runs, in sequence order"""
+        found = []
+        for path in self.directory.iterdir():
+            match = SEGMENT_NAME.match(path.name)
+            if match:
+                found.append((match.group(1), int(match.group(2)), path))
+        for kind, seq, path in sorted(found):
+            try:
+                self.segments[kind].append(ColumnSegment.open(path, self.read_only))
+                self._next_seq[kind] = seq + 1
+            except Exception as e:
+                logger.error(f"Skipping unreadable history segment {path}: {e}")
+
+    def _writable_segment(self, kind: str) -> ColumnSegment:
+        segments = self.segments[kind]
+        if segments and not segments[-1].full:
+            return segments[-1]
+
+        seq = self._next_seq[kind]
+        self._next_seq[kind] = seq + 1
+        columns = SAMPLE_COLUMNS if kind == 'samples' else PREDICTION_COLUMNS
+        capacity = self.segment_samples if kind == 'samples' else self.segment_predictions
+        segment = ColumnSegment.create(self.directory / f"{kind}_{seq:06d}.seg", len(columns), capacity)
+        segments.append(segment)
+        return segment
+
+    def payload_path(self, segment: ColumnSegment) -> Path:
+        return segment.path.with_suffix('.jsonl')
+
+    def write_samples(self, block: np.ndarray):
+        """Append a (len(SAMPLE_COLUMNS), k) block, rotating segments as they fill"""
+        while block.shape[1]:
+            written = self._writable_segment('samples').append(block)
+            block = block[:, written:]
+
+    def write_predictions(self, records: List[Tuple[float, str]]):
+        """Append (received_at, serialized message) records"""
+        index = 0
+        while index < len(records):
+            segment = self._writable_segment('predictions')
+            batch = records[index:index + segment.capacity - segment.count]
+            payloads = [message.encode('utf-8') + b'\n' for _, message in batch]
+
+            with open(self.payload_path(segment), 'ab') as f:
+                offset = f.tell()
+                f.write(b''.join(payloads))
+
+            block = np.empty((len(PREDICTION_COLUMNS), len(batch)), dtype=np.float64)
+            for row, ((received_at, _), payload) in enumerate(zip(batch, payloads)):
+                block[:, row] = (received_at, offset, len(payload))
+                offset += len(payload)
+            segment.append(block)
+            index += len(batch)
+
+    def enforce_retention(self, oldest_allowed: float, max_segments: int, keep_last: bool = True):
+        """Delete whole segments older than oldest_allowed or beyond max_segments
+
+        keep_last keeps the segment being written to; rooms that are not open for
+        writing can lose every segment.
+        """
+        keep = 1 if keep_last else 0
+        for kind, segments in self.segments.items():
+            while len(segments) > keep and (len(segments) > max_segments or segments[0].last_time < oldest_allowed):
+                segment = segments.pop(0)
+                segment.close()
+                segment.path.unlink(missing_ok=True)
+                if kind == 'predictions':
+                    self.payload_path(segment).unlink(missing_ok=True)
+                logger.info(f"🗑️ Removed history segment {segment.path.name}")
+
+    def flush(self):
+        for segments in self.segments.values():
+            if segments:
+                segments[-1].flush()
+
+    @property
+    def empty(self) -> bool:
+        return not any(self.segments.values())
+
+    def close(self):
+        for segments in self.segments.values():
+            for segment in segments:
+                segment.close()
+            segments.clear()
+
+    def matching_rows(self, kind: str, start: float, end: float) -> Iterator[Tuple[ColumnSegment, int, int]]:
+        """(segment, first row, end row) of every segment overlapping [start, end)"""
+        for segment in list(self.segments[kind]):
+            if not segment.count or segment.last_time < start or segment.first_time >= end:
+                continue
+            lo, hi = segment.row_range(start, end)
+            if hi > lo:
+                yield segment, lo, hi
+
+
+class HistoryStore:
+    """Per-room persistent history with buffered writes and chunked time-range queries"""
+
+    def __init__(self, root: str = './history', segment_samples: int = 65536, segment_predictions: int = 4096,
+                 retention_seconds: float = 7 * 24 * 3600, max_segments: int = 64, max_open_rooms: int = 64):
+        self.root = Path(root)
+        self.segment_samples = segment_samples
+        self.segment_predictions = segment_predictions
+        self.retention_seconds = retention_seconds
+        self.max_segments = max_segments
+        self.max_open_rooms = max_open_rooms
+
+        self._rooms: 'OrderedDict[str, RoomHistory]' = OrderedDict()  # Rooms open for writing, LRU first
+        self._pending_samples: Dict[str, List[np.ndarray]] = {}
+        self._pending_predictions: Dict[str, List[Tuple[float, str]]] = {}
+        self._pending_lock = threading.Lock()  # Guards the pending buffers
+        self._io_lock = threading.Lock()  # Serializes segment writes, rotation and reads
+
+        # Statistics
+        self.samples_written = 0
+        self.predictions_written = 0
+        self.flushes = 0
+        self.rooms_closed = 0
+        self.rooms_removed = 0
+
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _room(self, room_id: str) -> RoomHistory:
+        """Room open for writing, closing the least recently written rooms past max_open_rooms"""
+        room = self._rooms.get(room_id)
+        if room is not None:
+            self._rooms.move_to_end(room_id)
+            return room
+
+        room = RoomHistory(self.root / room_directory_name(room_id), self.segment_samples, self.segment_predictions)
+        self._rooms[room_id] = room
+        while len(self._rooms) > self.max_open_rooms:
+            _, oldest = self._rooms.popitem(last=False)
+            oldest.close()
+            self.rooms_closed += 1
+        return room
+
+    def _query_room(self, room_id: str) -> Optional[RoomHistory]:
+        """Read-only view of a room's segments for one query; the caller closes it"""
+        directory = self.root / room_directory_name(room_id)
+        if not directory.is_dir():
+            return None
+        return RoomHistory(directory, self.segment_samples, self.segment_predictions, read_only=True)
+
+    def close_room(self, room_id: str):
+        """Write the room's pending data and unmap its segments (e.g. when its session is evicted)"""
+        self.flush()
+        with self._io_lock:
+            room = self._rooms.pop(room_id, None)
+            if room is not None:
+                room.close()
+                self.rooms_closed += 1
+
+    def record_samples(self, room_id: str, columns: np.ndarray, received_at: Optional[float] = None):
+        """Queue samples given as a (5, k) array in audio_buffer.FIELDS order"""
+        received_at = time.time() * 1000 if received_at is None else received_at
+        block = np.empty((len(SAMPLE_COLUMNS), columns.shape[1]), dtype=np.float64)
+        block[0] = received_at
+        # Store the device timestamp next to the raw levels
+        block[1] = columns[4]
+        block[2:] = columns[:4]
+        with self._pending_lock:
+            self._pending_samples.setdefault(room_id, []).append(block)
+
+    def record_prediction(self, room_id: str, message: str, received_at: Optional[float] = None):
+        """Queue one serialized ml_predictions message"""
+        received_at = time.time() * 1000 if received_at is None else received_at
+        with self._pending_lock:
+            self._pending_predictions.setdefault(room_id, []).append((received_at, message))
+
+    def flush(self):
+        """Write everything queued so far to the segment files (blocking; run off the event loop)"""
+        with self._pending_lock:
+            samples, self._pending_samples = self._pending_samples, {}
+            predictions, self._pending_predictions = self._pending_predictions, {}
+        if not samples and not predictions:
+            return
+
+        with self._io_lock:
+            oldest_allowed = time.time() * 1000 - self.retention_seconds * 1000
+            for room_id in set(samples) | set(predictions):
+                room = self._room(room_id)
+                if room_id in samples:
+                    block = np.concatenate(samples[room_id], axis=1)
+                    room.write_samples(block)
+                    self.samples_written += block.shape[1]
+                if room_id in predictions:
+                    room.write_predictions(predictions[room_id])
+                    self.predictions_written += len(predictions[room_id])
+                room.enforce_retention(oldest_allowed, self.max_segments)
+                room.flush()
+            self.flushes += 1
+
+    def sweep_retention(self):
+        """Apply retention to every room on disk, including rooms that no longer receive data
+
+        Open rooms keep their current segment; closed rooms whose segments have all
+        expired are deleted along with their directory. Blocking; run off the event loop.
+        """
+        oldest_allowed = time.time() * 1000 - self.retention_seconds * 1000
+        for directory in sorted(path for path in self.root.iterdir() if path.is_dir()):
+            with self._io_lock:
+                open_rooms = {room.directory: room for room in self._rooms.values()}
+                room = open_rooms.get(directory)
+                if room is not None:
+                    room.enforce_retention(oldest_allowed, self.max_segments)
+                    continue
+
+                room = RoomHistory(directory, self.segment_samples, self.segment_predictions)
+                try:
+                    room.enforce_retention(oldest_allowed, self.max_segments, keep_last=False)
+                finally:
+                    room.close()
+                if room.empty:
+                    for path in directory.iterdir():
+                        if path.suffix == '.jsonl':
+                            path.unlink(missing_ok=True)  # Payloads of segments removed earlier
+                    try:
+                        directory.rmdir()
+                    except OSError:
+                        continue  # Holds files that are not history segments
+                    self.rooms_removed += 1
+                    logger.info(f"🗑️ Removed expired history of room directory {directory.name}")
+
+    def query_samples(self, room_id: str, start: float, end: float, chunk_size: int = 1000) -> Iterator[Dict[str, List[float]]]:
+        """Samples received in [start, end) epoch ms, as column dicts of at most chunk_size rows"""
+        self.flush()
+        with self._io_lock:
+            room = self._query_room(room_id)
+        if room is None:
+            return
+
+        try:
+            for segment, lo, hi in list(room.matching_rows('samples', start, end)):
+                for chunk_start in range(lo, hi, chunk_size):
+                    chunk = np.array(segment.data[:, chunk_start:min(hi, chunk_start + chunk_size)])
+                    yield dict(zip(SAMPLE_COLUMNS, chunk.tolist()))
+        finally:
+            room.close()
+
+    def query_predictions(self, room_id: str, start: float, end: float, chunk_size: int = 100) -> Iterator[List[Dict[str, Any]]]:
+        """ml_predictions messages produced in [start, end) epoch ms, in lists of at most chunk_size"""
+        self.flush()
+        with self._io_lock:
+            room = self._query_room(room_id)
+        if room is None:
+            return
+
+        try:
+            for segment, lo, hi in list(room.matching_rows('predictions', start, end)):
+                for chunk_start in range(lo, hi, chunk_size):
+                    index = np.array(segment.data[1:, chunk_start:min(hi, chunk_start + chunk_size)])
+                    offset = int(index[0, 0])
+                    length = int(index[0, -1] + index[1, -1]) - offset
+                    try:
+                        with open(room.payload_path(segment), 'rb') as f:
+                            f.seek(offset)
+                            payload = f.read(length)
+                    except FileNotFoundError:
+                        return  # Segment removed by retention while streaming
+                    yield [json.loads(line) for line in payload.splitlines() if line]
+        finally:
+            room.close()
+
+    def close(self):
+        """Flush pending writes and unmap every segment"""
+        self.flush()
+        with self._io_lock:
+            for room in self._rooms.values():
+                room.close()
+            self._rooms.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Write counters for the stats message"""
+        with self._pending_lock:
+            pending = sum(block.shape[1] for blocks in self._pending_samples.values() for block in blocks)
+        return {
+            'root': str(self.root),
+            'rooms_open': len(self._rooms),
+            'rooms_closed': self.rooms_closed,
+            'rooms_removed': self.rooms_removed,
+            'samples_written': self.samples_written,
+            'predictions_written': self.predictions_written,
+            'samples_pending': pending,
+            'flushes': self.flushes
+        }
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Inference Pipeline
+Micro-batching and precompiled prediction plans for the ML Model Server
+
+Rooms that become due for a prediction at about the same time are collected into
+one batch so every scaler and model runs once on a feature matrix instead of once
+per room on a single row. The PredictionPlan compiled at model load time turns
+feature dicts into that matrix and decodes model outputs with plain NumPy;
+scikit-learn forests in it are replaced by their forest_engine compilation.
+
+An optional PredictionCache in front of the model calls answers repeated windows
+(silent rooms, replays, augmented copies of a session) from an LRU keyed on the
+feature vector rounded to a fixed number of decimals.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from forest_engine import compile_forest
+from metrics import MODEL_SECONDS, MODEL_ERRORS, SCALING, CACHE_HITS, CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+REGRESSION_MODELS = {'engagement_score'}
+REGRESSION_MIN = 0
+REGRESSION_MAX = 100
+REGRESSION_CONFIDENCE = 0.85  # Fixed confidence for regression
+# Scalers whose mean_/scale_ are applied directly (model_bundle stores the same parameters)
+STANDARD_SCALERS = {'StandardScaler', 'BundledStandardScaler'}
+
+
+class PredictionBatcher:
+    """Collect prediction requests into batches bounded by size and wait time
+
+    submit() returns the prediction for one feature dict. The first request of a
+    batch waits at most max_wait seconds for others to join; a batch is dispatched
+    early once it reaches max_batch_size.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Dict[str, float]]], Awaitable[List[Dict[str, Any]]]],
+                 max_batch_size: int = 32, max_wait: float = 0.005):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._pending: List[tuple] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        # Statistics
+        self.batches_run = 0
+        self.requests_batched = 0
+        self.largest_batch = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def submit(self, features: Dict[str, float]) -> Dict[str, Any]:
+        """Queue one feature dict and wait for its predictions"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Dispatch everything queued so far as one or more full batches"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: List[tuple]):
+        """Run one batch and scatter the results back to the waiting requests"""
+        self.batches_run += 1
+        self.requests_batched += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        try:
+            results = await self.run_batch([features for features, _ in batch])
+        except Exception as e:
+            logger.error(f"Error running prediction batch: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def cancel(self):
+        """Fail queued requests and stop in-flight batches"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for _, future in self._pending:
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+        for task in list(self._tasks):
+            task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batching counters for the stats message"""
+        return {
+            'batches_run': self.batches_run,
+            'requests_batched': self.requests_batched,
+            'average_batch_size': self.requests_batched / self.batches_run if self.batches_run else 0.0,
+            'largest_batch': self.largest_batch,
+            'queued': len(self._pending)
+        }
+
+
+class PredictionCache:
+    """LRU of per-row predictions keyed on the quantized feature vector
+
+    Rows are rounded to `decimals` before both lookup and prediction, so a cached
+    answer is exactly what the models return for the rounded vector.
+    """
+
+    def __init__(self, max_entries: int = 4096, decimals: int = 4):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.decimals = decimals
+        self._entries: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def quantize(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """Round a feature matrix in place (and turn -0.0 into 0.0 so equal rows have equal keys)"""
+        np.round(feature_matrix, self.decimals, out=feature_matrix)
+        feature_matrix += 0.0
+        return feature_matrix
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if result is None:
+            CACHE_MISSES.inc()
+            return None
+        CACHE_HITS.inc()
+        return dict(result)
+
+    def put(self, key: bytes, result: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache counters for the stats message"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'decimals': self.decimals,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+class ModelPlan:
+    """Precomputed scaling and decoding steps for one model"""
+
+    def __init__(self, name: str, model, scaler=None, encoder=None, compile_forests: bool = True):
+        self.name = name
+        self.model = model
+        self.is_regression = name in REGRESSION_MODELS
+
+        # scikit-learn forests are evaluated by the vectorized forest engine instead
+        engine = compile_forest(model) if compile_forests else None
+        self.predictor = engine if engine is not None else model
+        self.compiled = engine is not None
+
+        # StandardScaler parameters are applied directly; other scalers fall back
+        # to their own transform
+        self.scaler = scaler
+        self.scale_mean = None
+        self.scale_scale = None
+        self.scaler_fallback = False
+        if scaler is not None:
+            if type(scaler).__name__ in STANDARD_SCALERS:
+                self.scale_mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else None
+                self.scale_scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else None
+            else:
+                self.scaler_fallback = True
+
+        # Decoded class labels, cached from the label encoder
+        self.has_encoder = encoder is not None
+        self.model_classes = None
+        self.value_labels = None
+        self.proba_labels = None
+        self.decode_error = None
+        self.predict_from_proba = False
+        self.inference_timer = MODEL_SECONDS.labels(name)
+        self.error_counter = MODEL_ERRORS.labels(name)
+        if not self.is_regression:
+            self._compile_classes(encoder)
+
+    def _compile_classes(self, encoder):
+        """Cache the label of every model output column"""
+        model_classes = getattr(self.model, 'classes_', None)
+        if model_classes is None:
+            return
+        self.model_classes = list(model_classes)
+
+        # Forests predict the class with the highest averaged probability, so the
+        # separate predict() pass over every tree can be skipped
+        self.predict_from_proba = getattr(self.predictor, 'predict_from_proba', False) or (
+            type(self.model).__module__.startswith('sklearn.ensemble._forest')
+            and getattr(self.model, 'n_outputs_', 1) == 1
+        )
+
+        try:
+            if encoder is not None:
+                encoder_labels = [str(label) for label in encoder.classes_]
+                self.value_labels = {cls: str(encoder.inverse_transform([cls])[0]) for cls in self.model_classes}
+                self.proba_labels = encoder_labels[:len(self.model_classes)]
+                if len(self.proba_labels) < len(self.model_classes):
+                    raise ValueError("y contains previously unseen labels")
+            else:
+                self.value_labels = {cls: str(cls) for cls in self.model_classes}
+        except Exception as e:
+            self.decode_error = str(e)
+
+    def scale(self, feature_matrix: np.ndarray, feature_columns: List[str]) -> np.ndarray:
+        """Apply the model's scaler to a feature matrix"""
+        if self.scaler is None:
+            return feature_matrix
+        if self.scaler_fallback:
+            if hasattr(self.scaler, 'feature_names_in_'):
+                import pandas as pd
+                return self.scaler.transform(pd.DataFrame(feature_matrix, columns=feature_columns))
+            return self.scaler.transform(feature_matrix)
+
+        scaled = feature_matrix.copy() if self.scale_mean is None else feature_matrix - self.scale_mean
+        if self.scale_scale is not None:
+            scaled /= self.scale_scale
+        return scaled
+
+    def predict(self, feature_matrix: np.ndarray, feature_columns: List[str]) -> List[Dict[str, Any]]:
+        """Predictions for every row of the (unscaled) feature matrix"""
+        start = time.perf_counter()
+        scaled_features = self.scale(feature_matrix, feature_columns)
+        scaled = time.perf_counter()
+        SCALING.observe(scaled - start)
+
+        if self.is_regression:
+            values = self.predictor.predict(scaled_features)
+            self.inference_timer.observe(time.perf_counter() - scaled)
+            return [{
+                'value': float(max(REGRESSION_MIN, min(REGRESSION_MAX, value))),
+                'confidence': REGRESSION_CONFIDENCE,
+                'type': 'regression'
+            } for value in values]
+
+        if self.decode_error is not None:
+            raise ValueError(self.decode_error)
+
+        probabilities = self.predictor.predict_proba(scaled_features)
+        if self.predict_from_proba:
+            classes = [self.model_classes[index] for index in probabilities.argmax(axis=1)]
+        else:
+            classes = self.predictor.predict(scaled_features)
+        self.inference_timer.observe(time.perf_counter() - scaled)
+        confidences = probabilities.max(axis=1)
+
+        results = []
+        for row, cls in enumerate(classes):
+            results.append({
+                'value': self.value_labels[cls],
+                'confidence': float(confidences[row]),
+                'probabilities': dict(zip(self.proba_labels, probabilities[row].tolist())) if self.has_encoder else {},
+                'type': 'classification'
+            })
+        return results
+
+
+class PredictionPlan:
+    """Pandas-free prediction path compiled once from the loaded artifacts"""
+
+    def __init__(self, models: Dict[str, Any], scalers: Dict[str, Any],
+                 encoders: Dict[str, Any], feature_columns: List[str], compile_forests: bool = True):
+        self.feature_columns = list(feature_columns)
+        self.feature_index = {col: i for i, col in enumerate(self.feature_columns)}
+        self.model_plans = [
+            ModelPlan(name, model, scaler=scalers.get(name), encoder=encoders.get(name),
+                      compile_forests=compile_forests)
+            for name, model in models.items()
+        ]
+        self._scratch = threading.local()
+        self.cache: Optional[PredictionCache] = None
+
+    def enable_cache(self, max_entries: int = 4096, decimals: int = 4):
+        """Put an LRU of quantized feature vectors in front of the models (0 entries disables)"""
+        self.cache = PredictionCache(max_entries, decimals) if max_entries > 0 else None
+
+    def _matrix(self, rows: int) -> np.ndarray:
+        """Per-thread preallocated float64 feature matrix with at least `rows` rows"""
+        matrix = getattr(self._scratch, 'matrix', None)
+        if matrix is None or matrix.shape[0] < rows:
+            matrix = np.zeros((max(rows, 1), len(self.feature_columns)), dtype=np.float64)
+            self._scratch.matrix = matrix
+        return matrix[:rows]
+
+    def vectorize(self, features_list: List[Dict[str, float]]) -> np.ndarray:
+        """Feature dicts as rows in training column order (missing features are 0.0)"""
+        matrix = self._matrix(len(features_list))
+        matrix.fill(0.0)
+        feature_index = self.feature_index
+        for row, features in enumerate(features_list):
+            values = matrix[row]
+            for name, value in features.items():
+                index = feature_index.get(name)
+                if index is not None:
+                    values[index] = value
+        return matrix
+
+    def predict(self, features_list: List[Dict[str, float]]) -> List[Dict[str, Any]]:
+        """Predictions of every model for every feature dict"""
+        feature_matrix = self.vectorize(features_list)
+        cache = self.cache
+        if cache is None:
+            return self.predict_matrix(feature_matrix)
+
+        keys = [row.tobytes() for row in cache.quantize(feature_matrix)]
+        predictions: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+        missing: Dict[bytes, List[int]] = {}
+        for row, key in enumerate(keys):
+            if key in missing:
+                missing[key].append(row)
+                continue
+            cached = cache.get(key)
+            if cached is None:
+                missing[key] = [row]
+            else:
+                predictions[row] = cached
+
+        if missing:
+            first_rows = [rows[0] for rows in missing.values()]
+            computed = self.predict_matrix(feature_matrix[first_rows])
+            for (key, rows), result in zip(missing.items(), computed):
+                if not any('error' in model_result for model_result in result.values()):
+                    cache.put(key, result)
+                for row in rows:
+                    predictions[row] = dict(result)
+        return predictions
+
+    def predict_matrix(self, feature_matrix: np.ndarray) -> List[Dict[str, Any]]:
+        """Predictions of every model for every row of a feature matrix"""
+        batch_size = len(feature_matrix)
+        predictions = [{} for _ in range(batch_size)]
+
+        for plan in self.model_plans:
+            try:
+                for row, result in enumerate(plan.predict(feature_matrix, self.feature_columns)):
+                    predictions[row][plan.name] = result
+            except Exception as e:
+                plan.error_counter.inc()
+                logger.error(f"Error predicting {plan.name}: {e}")
+                for row_predictions in predictions:
+                    row_predictions[plan.name] = {'error': str(e)}
+
+        return predictions
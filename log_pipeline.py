@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Log Pipeline
+Queue-based logging so the event loop never waits on disk or terminal I/O
+
+The root logger gets a single QueueHandler: logging calls on the event loop only
+resolve the message and put the record on a bounded queue. A QueueListener
+thread formats the records and writes them to stdout and a size-rotated log
+file (plain text or one JSON object per line). If the queue fills up because
+the disk stalls, records are dropped instead of blocking the caller.
+
+Events that happen many times a second (e.g. prediction broadcasts) are counted
+by a RateLimitedSummary and logged as one summary line per interval.
+"""
+
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional['NonBlockingQueueHandler'] = None
+
+
+def _json_default(value) -> str:
+    # `extra` objects may be gone by the time the listener formats the record (e.g. weak proxies)
+    try:
+        return str(value)
+    except Exception:
+        return f'<{type(value).__name__}>'
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per record, including fields passed through `extra`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=_json_default, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue, cross_process: bool = False):
+        super().__init__(log_queue)
+        self.cross_process = cross_process
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if self.cross_process:
+            # The record is pickled: fold the traceback into the message, stringify extras
+            record = super().prepare(record)
+            for key, value in list(record.__dict__.items()):
+                if key not in _RECORD_ATTRIBUTES and not isinstance(value, (str, int, float, bool, type(None))):
+                    record.__dict__[key] = _json_default(value)
+            return record
+        # Same-process queue: hand the record over as is, only resolve its message now
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitedSummary:
+    """Count a frequent event and log one summary line per interval instead of one per event"""
+
+    def __init__(self, logger: logging.Logger, event: str, interval: float = 10.0,
+                 level: int = logging.INFO):
+        self.logger = logger
+        self.event = event
+        self.interval = interval
+        self.level = level
+        self._reset(time.monotonic())
+
+    def _reset(self, now: float):
+        self.window_start = now
+        self.count = 0
+        self.keys: Dict[str, int] = {}
+        self.totals: Dict[str, float] = {}
+
+    def add(self, key: Optional[str] = None, **values: float):
+        """Record one occurrence, optionally for a key (e.g. a room) with values to sum"""
+        self.count += 1
+        if key is not None:
+            self.keys[key] = self.keys.get(key, 0) + 1
+        for name, value in values.items():
+            self.totals[name] = self.totals.get(name, 0) + value
+
+        now = time.monotonic()
+        if now - self.window_start >= self.interval:
+            self.flush(now)
+
+    def flush(self, now: Optional[float] = None):
+        """Log the summary of the current interval (if anything happened) and start a new one"""
+        now = time.monotonic() if now is None else now
+        if self.count and self.logger.isEnabledFor(self.level):
+            elapsed = now - self.window_start
+            details = ', '.join(f"{name}={value:g}" for name, value in self.totals.items())
+            self.logger.log(
+                self.level,
+                f"📊 {self.event}: {self.count} in the last {elapsed:.0f}s"
+                + (f" across {len(self.keys)} keys" if self.keys else "")
+                + (f" ({details})" if details else ""),
+                extra={'event': self.event, 'count': self.count, 'interval_s': round(elapsed, 3),
+                       'keys': dict(self.keys), **self.totals}
+            )
+        self._reset(now)
+
+
+def configure_logging(log_path: Optional[str] = 'ml_server.log', level: int = logging.INFO,
+                      json_lines: bool = False, max_bytes: int = 10 * 1024 * 1024,
+                      backup_count: int = 5, queue_size: int = DEFAULT_QUEUE_SIZE, log_queue=None):
+    """Route all logging through a queue to stdout and an optional rotating log file
+
+    Pass a multiprocessing queue as log_queue when forked processes log through this
+    process's writer thread (see forked_worker).
+    """
+    global _listener, _queue_handler
+    stop_logging()
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers = [console]
+    if log_path:
+        log_file = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes,
+                                                        backupCount=backup_count, encoding='utf-8')
+        log_file.setFormatter(JsonLineFormatter() if json_lines else logging.Formatter(TEXT_FORMAT))
+        handlers.append(log_file)
+
+    cross_process = log_queue is not None
+    if log_queue is None:
+        log_queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = NonBlockingQueueHandler(log_queue, cross_process=cross_process)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Write out everything still queued and stop the listener thread"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        if _queue_handler is not None and _queue_handler.dropped:
+            handler.handle(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"⚠️ Dropped {_queue_handler.dropped} log records while the log queue was full"
+            }))
+        handler.close()
+    _listener = None
+
+
+def forked_worker():
+    """Keep logging through the inherited multiprocessing queue; the writer thread stays the parent's"""
+    global _listener
+    _listener = None
+
+
+def detach_in_worker():
+    """Log directly to stdout in a forked worker, whose copy of the queue has no listener"""
+    global _listener, _queue_handler
+    _listener = _queue_handler = None
+    root = logging.getLogger()
+    if not any(isinstance(handler, logging.handlers.QueueHandler) for handler in root.handlers):
+        return
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    root.addHandler(console)
+
+
+def dropped_records() -> int:
+    """Records discarded because the queue was full"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Server Metrics
+Low-overhead counters, gauges and histograms with a Prometheus text endpoint
+
+Hot-path modules observe into the module-level collectors below (one bisect and
+a few additions per observation). The server serves them over a small local
+HTTP listener:
+
+    GET /metrics                 text exposition format (version 0.0.4)
+    GET /profile?seconds=10      cProfile snapshot of the event loop thread
+                                 (only when started with profiling enabled)
+
+No client library is needed; the format is written by hand.
+"""
+
+import io
+import time
+import asyncio
+import logging
+import pstats
+import cProfile
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple, Callable
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans sub-millisecond appends up to slow model calls and sends
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+MAX_PROFILE_SECONDS = 60.0
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _HistogramChild:
+    """Bucket counts of one label combination"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of the enclosed block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Metric:
+    """Base of the metric types: name, help text and per-label children"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> Any:
+        """Child for one combination of label values (cache it on hot paths)"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": _format_value(bound)})} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, child in sorted(self._children.items()):
+            lines.append(f'{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(child.value)}')
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Gauge or counter whose samples are read from a function at scrape time
+
+    The function returns a number, or a dict mapping label-value tuples to numbers.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), kind: str = 'gauge'):
+        self.kind = kind
+        self.function: Optional[Callable[[], Any]] = None
+        super().__init__(name, documentation, labelnames)
+
+    def set_function(self, function: Callable[[], Any]):
+        self.function = function
+
+    def render(self) -> List[str]:
+        if self.function is None:
+            return []
+        try:
+            samples = self.function()
+        except Exception as e:
+            logger.debug(f"Metric callback {self.name} failed: {e}")
+            return []
+        if not isinstance(samples, dict):
+            samples = {(): samples}
+        lines = self.header()
+        for key, value in sorted(samples.items()):
+            labels = dict(zip(self.labelnames, key if isinstance(key, tuple) else (key,)))
+            lines.append(f'{self.name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Registry:
+    """Every metric of the process, in registration order"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Hot-path timings
+STAGE_SECONDS = Histogram('mlserver_stage_seconds', 'Time spent in each hot-path stage', ('stage',))
+MODEL_SECONDS = Histogram('mlserver_model_inference_seconds', 'Model call time per prediction batch', ('model',))
+MODEL_ERRORS = Counter('mlserver_model_errors_total', 'Failed model calls', ('model',))
+PREDICTION_CACHE = Counter('mlserver_prediction_cache_total', 'Prediction cache lookups', ('result',))
+EVENT_LOOP_LAG = Histogram('mlserver_event_loop_lag_seconds', 'How late the event loop ran a scheduled wake-up')
+CLIENT_SEND_LAG = Histogram('mlserver_client_send_lag_seconds',
+                            'Time from queueing a broadcast to finishing its send to one client')
+
+# Cached children for the hottest stages
+JSON_DECODE = STAGE_SECONDS.labels('json_decode')
+BUFFER_APPEND = STAGE_SECONDS.labels('buffer_append')
+FEATURE_EXTRACTION = STAGE_SECONDS.labels('feature_extraction')
+SCALING = STAGE_SECONDS.labels('scaling')
+BROADCAST = STAGE_SECONDS.labels('broadcast')
+CACHE_HITS = PREDICTION_CACHE.labels('hit')
+CACHE_MISSES = PREDICTION_CACHE.labels('miss')
+
+# Read from the server when scraped
+SERVER_COUNTERS = CallbackMetric('mlserver_events_total', 'Server event counters from the stats message',
+                                 ('event',), kind='counter')
+SERVER_GAUGES = CallbackMetric('mlserver_state', 'Current server state (clients, sessions, executor queue)',
+                               ('quantity',))
+CLIENT_QUEUE = CallbackMetric('mlserver_client_queued_messages', 'Broadcast messages waiting per client', ('client',))
+CLIENT_LAST_LAG = CallbackMetric('mlserver_client_last_send_lag_seconds', 'Send lag of the latest broadcast per client',
+                                 ('client',))
+
+
+async def monitor_event_loop(interval: float = 0.25):
+    """Record event-loop lag: how late a sleeping task is woken up"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+
+class MetricsServer:
+    """Minimal HTTP listener for /metrics and on-demand /profile snapshots"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9108, profiling: bool = False):
+        self.host = host
+        self.port = port
+        self.profiling = profiling
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._profile_lock = asyncio.Lock()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"📈 Metrics on http://{self.host}:{self.port}/metrics"
+                    + (" (profiling enabled)" if self.profiling else ""))
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+            # Drain the headers; requests have no body
+            while (await asyncio.wait_for(reader.readline(), timeout=5.0)) not in (b'\r\n', b'\n', b''):
+                pass
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] != 'GET':
+                await self._respond(writer, 405, 'Method Not Allowed\n')
+                return
+            url = urlsplit(parts[1])
+            if url.path == '/metrics':
+                await self._respond(writer, 200, REGISTRY.render(), 'text/plain; version=0.0.4; charset=utf-8')
+            elif url.path == '/profile' and self.profiling:
+                seconds = float(parse_qs(url.query).get('seconds', ['10'])[0])
+                await self._respond(writer, *await self._profile(seconds))
+            else:
+                await self._respond(writer, 404, 'Not Found\n')
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+        except Exception as e:
+            logger.error(f"Error serving metrics request: {e}")
+        finally:
+            writer.close()
+
+    async def _profile(self, seconds: float) -> Tuple[int, str]:
+        """cProfile the event loop thread for a while and return the top functions"""
+        if self._profile_lock.locked():
+            return 409, 'A profile is already running\n'
+        seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+        async with self._profile_lock:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(50)
+        return 200, f"# {seconds:.1f}s profile of the event loop thread\n" + output.getvalue()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, body: str,
+                       content_type: str = 'text/plain; charset=utf-8'):
+        reasons = {200: 'OK', 404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict'}
+        payload = body.encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+                     f"Content-Type: {content_type}\r\n"
+                     f"Content-Length: {len(payload)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + payload)
+        await writer.drain()
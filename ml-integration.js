@@ -12,6 +12,7 @@ class MLIntegration {
         this.isMLConnected = false;
         this.predictions = {};
         this.spatialAnalysis = {};
+        this.spatialHorizons = {};
         this.predictionHistory = [];
         
         // ML visualization elements
@@ -22,6 +23,7 @@ class MLIntegration {
         this.config = {
             defaultHost: 'localhost',
             defaultPort: 8765,
+            room: 'default',
             reconnectInterval: 5000,
             maxReconnectAttempts: 10,
             predictionUpdateInterval: 1000
@@ -412,6 +414,7 @@ class MLIntegration {
             // Forward audio data to ML server
             const mlMessage = {
                 type: 'audio_data',
+                room: this.config.room,
                 leftMic: data.leftMic || 0,
                 rightMic: data.rightMic || 0,
                 difference: data.difference || 0,
@@ -434,6 +437,8 @@ class MLIntegration {
             
             if (data.type === 'ml_predictions') {
                 this.handleMLPredictions(data);
+            } else if (data.type === 'spatial_update') {
+                this.handleSpatialUpdate(data);
             } else if (data.type === 'error') {
                 console.error('ML Server Error:', data.message);
             }
@@ -442,6 +447,19 @@ class MLIntegration {
         }
     }
     
+    /**
+     * Handle spatial updates (every horizon, sent between predictions)
+     */
+    handleSpatialUpdate(data) {
+        this.spatialHorizons = data.horizons || {};
+        this.spatialAnalysis = this.spatialHorizons[data.primary] || this.spatialAnalysis;
+        
+        this.updateSpatialUI();
+        this.updateSpatialIndicators();
+        
+        this.dispatchMLEvent('spatial_update', data);
+    }
+    
     /**
      * Handle ML predictions
      */
@@ -789,7 +807,7 @@ class MLIntegration {
      */
     requestPrediction() {
         if (this.isMLConnected && this.mlSocket.readyState === WebSocket.OPEN) {
-            const message = { type: 'request_prediction' };
+            const message = { type: 'request_prediction', room: this.config.room };
             this.mlSocket.send(JSON.stringify(message));
             console.log('🧠 Requested immediate prediction');
         } else {
@@ -6,6 +6,7 @@ Compatible with trained meeting room ML models
 
 Usage:
     python ml_model_server.py --models-dir ./trained_models --host localhost --port 8765
+    python ml_model_server.py --score recordings/ --score-output scores.csv
 
 Requirements:
     pip install asyncio websockets numpy pandas scikit-learn
@@ -15,7 +16,6 @@ import asyncio
 import websockets
 import json
 import numpy as np
-import pandas as pd
 import pickle
 from pathlib import Path
 from datetime import datetime, timedelta
@@ -27,48 +27,157 @@ import logging
 import argparse
 import sys
 import os
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('ml_server.log')
-    ]
-)
+from sessions import SessionManager, RoomSession, DEFAULT_ROOM, normalize_room_id, parse_audio_sample
+from inference import PredictionBatcher, PredictionPlan
+from model_registry import ModelSet, load_model_set, newest_complete_set
+import binary_protocol
+from fanout import ClientOutbox, SLOW_CLIENT_CLOSE_REASON
+from history_store import HistoryStore
+from audio_buffer import FIELDS, TIMESTAMP
+import metrics
+import log_pipeline
+from prediction_scheduler import AdaptiveScheduler, feature_vector, RUN, WAIT
+from cluster import ClusterWorker, routing_room, message_rooms
+from subscriptions import Subscription, SubscriptionRouter
+from esp32_ingest import DeviceConnection, DEFAULT_STALE_TIMEOUT, parse_device_spec
+from spatial_tracker import DEFAULT_HORIZONS, DEFAULT_UPDATE_INTERVAL, parse_horizons, spatial_update_message
+
+# Logging is configured in main() (see log_pipeline)
 logger = logging.getLogger(__name__)
 
+# Model server owned by a process-pool inference worker
+_worker_server = None
+
+
+def _init_inference_worker(models_dir, version, cache_size, cache_decimals, use_bundles, forest_engine):
+    """Load the models once in each inference worker process"""
+    global _worker_server
+    log_pipeline.detach_in_worker()
+    _worker_server = MLModelServer(models_dir=models_dir, prediction_cache_size=cache_size,
+                                   prediction_cache_decimals=cache_decimals, use_bundles=use_bundles,
+                                   forest_engine=forest_engine)
+    if not _worker_server.load_models(version=version):
+        raise RuntimeError(f"Inference worker could not load models {version} from {models_dir}")
+
+
+def _worker_make_predictions_batch(features_list):
+    """Run make_predictions_batch inside an inference worker process"""
+    return _worker_server.model_version, _worker_server.make_predictions_batch(features_list)
+
+
 class MLModelServer:
-    def __init__(self, models_dir="./trained_models", host="localhost", port=8765):
+    def __init__(self, models_dir="./trained_models", host="localhost", port=8765,
+                 max_sessions=1000, session_idle_timeout=600.0,
+                 executor_type="thread", executor_workers=2,
+                 max_batch_size=32, max_batch_wait=0.005, buffer_size=150,
+                 client_queue_size=8, slow_client_timeout=30.0,
+                 history_dir=None, history_retention_hours=168.0, history_open_rooms=64,
+                 metrics_port=None, metrics_host="127.0.0.1", profiling=False,
+                 log_summary_interval=10.0, prediction_cache_size=4096, prediction_cache_decimals=4,
+                 use_bundles=True, forest_engine=True, devices=None, device_stale_timeout=DEFAULT_STALE_TIMEOUT,
+                 spatial_horizons=DEFAULT_HORIZONS, spatial_update_interval=DEFAULT_UPDATE_INTERVAL):
         self.models_dir = Path(models_dir)
         self.host = host
         self.port = port
         
-        # Data storage
-        self.audio_buffer = deque(maxlen=150)  # Store last 150 samples (about 2.5 minutes at 1Hz)
-        self.prediction_history = deque(maxlen=100)
+        # Inference runs in a pool so the event loop keeps reading frames
+        self.executor_type = executor_type
+        self.executor_workers = executor_workers
+        self.executor = None
+        self.inference_slots = None
+        
+        # Rooms due at about the same time share one model call
+        self.batcher = PredictionBatcher(
+            self.run_inference_batch,
+            max_batch_size=max_batch_size,
+            max_wait=max_batch_wait
+        )
+        
+        # Data storage: one ring buffer per room (150 samples is about 2.5 minutes at 1Hz)
+        self.sessions = SessionManager(
+            max_sessions=max_sessions,
+            idle_timeout=session_idle_timeout,
+            buffer_size=buffer_size,
+            history_size=100,
+            spatial_horizons=spatial_horizons
+        )
+        self.session_sweep_interval = 30.0
+        self.spatial_update_interval = spatial_update_interval  # Seconds between spatial_update pushes (0 disables)
+        
+        # Persistent raw sample and prediction history (disabled without a directory)
+        self.history = HistoryStore(history_dir, retention_seconds=history_retention_hours * 3600,
+                                    max_open_rooms=history_open_rooms) if history_dir else None
+        self.history_flush_interval = 1.0
+        self.history_sweep_interval = 300.0  # Seconds between retention sweeps over every stored room
+        self.history_chunk_size = 1000
+        
+        # One log line per interval instead of one per broadcast
+        self.broadcast_log = log_pipeline.RateLimitedSummary(logger, 'Broadcasted predictions',
+                                                             interval=log_summary_interval)
+        
+        # ESP32 boards read directly, one room each: (room_id, url) pairs (see esp32_ingest)
+        self.devices = [
+            DeviceConnection(url, room_id, self.ingest_device_sample, stale_timeout=device_stale_timeout)
+            for room_id, url in (devices or [])
+        ]
         
-        # ML components
-        self.models = {}
-        self.encoders = {}
-        self.scalers = {}
-        self.feature_columns = []
+        # Set in forked workers of a --workers cluster (see cluster.py)
+        self.cluster: Optional[ClusterWorker] = None
+        
+        # Local /metrics endpoint (disabled without a port)
+        self.metrics_server = metrics.MetricsServer(metrics_host, metrics_port, profiling=profiling) \
+            if metrics_port else None
+        
+        # ML components, swapped as a whole on hot reload
+        self.model_set = ModelSet()
+        self.reload_lock = asyncio.Lock()
+        self.model_poll_interval = 10.0  # Seconds between models_dir scans (0 disables)
+        self.prediction_cache_size = prediction_cache_size  # Entries per model set (0 disables)
+        self.prediction_cache_decimals = prediction_cache_decimals
+        self.use_bundles = use_bundles  # Prefer precompiled bundle_<version>/ directories (see model_bundle)
+        self.forest_engine = forest_engine  # Run forests through forest_engine instead of scikit-learn
         
         # Real-time tracking
-        self.last_prediction_time = 0
-        self.prediction_interval = 5.0  # Predict every 5 seconds
+        self.scheduler = AdaptiveScheduler(interval=5.0)  # Predict every 5 seconds, sooner on activity
         self.min_samples_for_prediction = 10  # Minimum samples needed
         
-        # Connected clients
+        # Connected clients and the rooms each one receives predictions for
         self.clients = set()
+        self.client_rooms = {}
+        self.room_subscribers = {}
+        self.client_binary_rooms = {}  # Room index table of clients using binary frames
+        self.subscriptions = SubscriptionRouter()  # Model/field filters and delta mode per client
+        
+        # Outgoing broadcast queues, one sender task per client
+        self.outboxes = {}
+        self.client_queue_size = client_queue_size
+        self.slow_client_timeout = slow_client_timeout
         
         # Server statistics
         self.stats = {
             'start_time': time.time(),
             'predictions_made': 0,
             'samples_processed': 0,
+            'binary_frames': 0,
             'clients_connected': 0,
+            'predictions_coalesced': 0,
+            'predictions_skipped': 0,
+            'predictions_accelerated': 0,
+            'predictions_forced': 0,
+            'inference_in_flight': 0,
+            'inference_waiting': 0,
+            'inference_max_queue_depth': 0,
+            'model_reloads': 0,
+            'model_reload_failures': 0,
+            'broadcast_drops': 0,
+            'slow_clients_disconnected': 0,
+            'connections_relayed': 0,
+            'foreign_room_rejections': 0,
+            'device_samples': 0,
+            'spatial_updates': 0,
             'errors': 0
         }
         
@@ -76,196 +185,132 @@ class MLModelServer:
         logger.info(f"Models directory: {self.models_dir}")
         logger.info(f"Server address: {self.host}:{self.port}")
         
-    def load_models(self):
-        """Load the latest trained models"""
-        try:
-            if not self.models_dir.exists():
-                logger.error(f"Models directory does not exist: {self.models_dir}")
-                return False
+    @property
+    def prediction_interval(self) -> float:
+        return self.scheduler.interval
+    
+    @prediction_interval.setter
+    def prediction_interval(self, value: float):
+        self.scheduler.interval = value
+    
+    @property
+    def models(self) -> Dict[str, Any]:
+        return self.model_set.models
+    
+    @property
+    def encoders(self) -> Dict[str, Any]:
+        return self.model_set.encoders
+    
+    @property
+    def scalers(self) -> Dict[str, Any]:
+        return self.model_set.scalers
+    
+    @property
+    def feature_columns(self) -> List[str]:
+        return self.model_set.feature_columns
+    
+    @property
+    def prediction_plan(self) -> Optional[PredictionPlan]:
+        return self.model_set.prediction_plan
+    
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.model_set.version
+    
+    def load_models(self, version: Optional[str] = None):
+        """Load the latest trained models (or a specific timestamp set)"""
+        model_set = load_model_set(self.models_dir, version=version, use_bundles=self.use_bundles,
+                                   compile_forests=self.forest_engine)
+        if model_set is None:
+            return False
+        self.enable_prediction_cache(model_set)
+        self.model_set = model_set
+        return True
+    
+    def enable_prediction_cache(self, model_set: ModelSet):
+        """Give a model set its own (empty) prediction cache, so a reload invalidates it"""
+        if model_set.prediction_plan is not None:
+            model_set.prediction_plan.enable_cache(self.prediction_cache_size, self.prediction_cache_decimals)
+    
+    def prediction_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Counters of the active model set's prediction cache (None when disabled)"""
+        plan = self.prediction_plan
+        return plan.cache.get_stats() if plan is not None and plan.cache is not None else None
+    
+    async def reload_models(self, version: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        """Load, warm and validate a model set in the background, then swap it in"""
+        async with self.reload_lock:
+            if version is None:
+                version, _ = await asyncio.to_thread(newest_complete_set, self.models_dir, self.use_bundles)
+                if version is None:
+                    return {'success': False, 'message': 'No complete model set found'}
+            if version == self.model_version and not force:
+                return {'success': True, 'message': f'Model version {version} is already active'}
             
-            # Find the latest model files by timestamp
-            model_files = list(self.models_dir.glob("*_model_*.pkl"))
-            encoder_files = list(self.models_dir.glob("label_encoders_*.pkl"))
-            scaler_files = list(self.models_dir.glob("feature_scalers_*.pkl"))
-            feature_files = list(self.models_dir.glob("feature_columns_*.pkl"))
+            logger.info(f"🔄 Reloading models: {self.model_version} -> {version}")
             
-            if not model_files:
-                logger.error("No trained models found!")
-                logger.info("Please ensure you have trained models in the following format:")
-                logger.info("  - speaker_count_model_YYYYMMDD_HHMMSS.pkl")
-                logger.info("  - meeting_type_model_YYYYMMDD_HHMMSS.pkl")
-                logger.info("  - energy_level_model_YYYYMMDD_HHMMSS.pkl")
-                logger.info("  - engagement_score_model_YYYYMMDD_HHMMSS.pkl")
-                return False
+            # Loading and the dry run happen off the event loop; ingestion continues
+            model_set = await asyncio.to_thread(load_model_set, self.models_dir, version, True,
+                                                self.use_bundles, self.forest_engine)
+            if model_set is None:
+                self.stats['model_reload_failures'] += 1
+                return {'success': False, 'message': f'Could not load model set {version}'}
+            try:
+                await asyncio.to_thread(model_set.validate)
+            except Exception as e:
+                logger.error(f"❌ Model set {version} failed validation: {e}")
+                self.stats['model_reload_failures'] += 1
+                return {'success': False, 'message': str(e)}
+            self.enable_prediction_cache(model_set)
             
-            # Extract timestamps and find the latest
-            timestamps = []
-            for model_file in model_files:
-                try:
-                    # Extract timestamp from filename (last part before .pkl)
-                    timestamp = model_file.stem.split('_')[-2] + '_' + model_file.stem.split('_')[-1]
-                    timestamps.append(timestamp)
-                except IndexError:
-                    continue
+            # Process workers hold their own copy of the models
+            if self.executor_type == 'process' and self.executor is not None:
+                await self.replace_process_pool(version)
             
-            if not timestamps:
-                logger.error("Could not extract timestamps from model files!")
-                return False
+            previous_version = self.model_version
+            self.model_set = model_set  # Atomic swap
+            self.stats['model_reloads'] += 1
+            logger.info(f"✅ Model version {version} is active (was {previous_version})")
+            return {'success': True, 'message': f'Model version {version} is active'}
+    
+    async def watch_models(self):
+        """Poll models_dir and hot-reload when a newer complete set has finished copying"""
+        pending_signature = None
+        failed_signature = None
+        while True:
+            await asyncio.sleep(self.model_poll_interval)
+            try:
+                version, signature = await asyncio.to_thread(newest_complete_set, self.models_dir, self.use_bundles)
+                if version is None or self.model_version is None or version <= self.model_version:
+                    pending_signature = None
+                    continue
+                if signature == failed_signature:
+                    continue
+                if signature != pending_signature:
+                    # Files are new or still changing; wait for one more unchanged poll
+                    pending_signature = signature
+                    continue
                 
-            latest_timestamp = max(timestamps)
-            logger.info(f"Loading models with timestamp: {latest_timestamp}")
-            
-            # Load models
-            models_loaded = 0
-            for model_file in model_files:
-                if latest_timestamp in model_file.stem:
-                    try:
-                        # Extract model name (everything before _model_)
-                        model_name = '_'.join(model_file.stem.split('_')[:-2])
-                        
-                        with open(model_file, 'rb') as f:
-                            self.models[model_name] = pickle.load(f)
-                        logger.info(f"✓ Loaded {model_name} model")
-                        models_loaded += 1
-                    except Exception as e:
-                        logger.error(f"Failed to load model {model_file}: {e}")
-            
-            # Load encoders
-            encoder_file = None
-            for ef in encoder_files:
-                if latest_timestamp in ef.stem:
-                    encoder_file = ef
-                    break
-            
-            if encoder_file and encoder_file.exists():
-                try:
-                    with open(encoder_file, 'rb') as f:
-                        self.encoders = pickle.load(f)
-                    logger.info(f"✓ Loaded label encoders ({len(self.encoders)} encoders)")
-                except Exception as e:
-                    logger.error(f"Failed to load encoders: {e}")
-            
-            # Load scalers
-            scaler_file = None
-            for sf in scaler_files:
-                if latest_timestamp in sf.stem:
-                    scaler_file = sf
-                    break
-                    
-            if scaler_file and scaler_file.exists():
-                try:
-                    with open(scaler_file, 'rb') as f:
-                        self.scalers = pickle.load(f)
-                    logger.info(f"✓ Loaded feature scalers ({len(self.scalers)} scalers)")
-                except Exception as e:
-                    logger.error(f"Failed to load scalers: {e}")
-            
-            # Load feature columns
-            feature_file = None
-            for ff in feature_files:
-                if latest_timestamp in ff.stem:
-                    feature_file = ff
-                    break
-                    
-            if feature_file and feature_file.exists():
-                try:
-                    with open(feature_file, 'rb') as f:
-                        self.feature_columns = pickle.load(f)
-                    logger.info(f"✓ Loaded feature columns ({len(self.feature_columns)} features)")
-                except Exception as e:
-                    logger.error(f"Failed to load feature columns: {e}")
-            
-            if models_loaded == 0:
-                logger.error("No models were successfully loaded!")
-                return False
-            
-            logger.info(f"✅ Successfully loaded {models_loaded} models")
-            logger.info(f"📊 Available models: {list(self.models.keys())}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error loading models: {e}")
-            return False
+                pending_signature = None
+                logger.info(f"📦 New model set detected: {version}")
+                result = await self.reload_models(version)
+                if not result['success']:
+                    failed_signature = signature
+            except Exception as e:
+                logger.error(f"Error watching models directory: {e}")
     
-    def extract_features_from_buffer(self) -> Optional[Dict[str, float]]:
-        """Extract ML features from current audio buffer"""
-        if len(self.audio_buffer) < self.min_samples_for_prediction:
+    def extract_features_from_buffer(self, session: RoomSession) -> Optional[Dict[str, float]]:
+        """Extract ML features from a room's audio buffer"""
+        if len(session.feature_engine) < self.min_samples_for_prediction:
             return None
         
         try:
-            # Convert buffer to lists for processing
-            audio_samples = list(self.audio_buffer)
-            left_levels = np.array([s.get('leftMic', 0) for s in audio_samples])
-            right_levels = np.array([s.get('rightMic', 0) for s in audio_samples])
-            differences = np.array([s.get('difference', 0) for s in audio_samples])
-            avg_levels = np.array([s.get('averageLevel', 0) for s in audio_samples])
-            
-            # Handle edge cases
-            if len(left_levels) == 0:
-                return None
-            
-            # Extract features (matching your training feature extraction)
-            features = {
-                # Volume statistics
-                'avg_volume': float(np.mean(avg_levels)),
-                'max_volume': float(np.max(avg_levels)),
-                'min_volume': float(np.min(avg_levels)),
-                'volume_std': float(np.std(avg_levels)),
-                'volume_range': float(np.ptp(avg_levels)),
-                'volume_median': float(np.median(avg_levels)),
-                'volume_25th': float(np.percentile(avg_levels, 25)),
-                'volume_75th': float(np.percentile(avg_levels, 75)),
-                
-                # Stereo positioning features
-                'avg_stereo_diff': float(np.mean(np.abs(differences))),
-                'max_stereo_diff': float(np.max(np.abs(differences))),
-                'min_stereo_diff': float(np.min(np.abs(differences))),
-                'stereo_variation': float(np.std(differences)),
-                'stereo_bias': float(np.mean(differences)),
-                
-                # Activity features
-                'high_activity_ratio': float(np.sum(avg_levels > (np.mean(avg_levels) + np.std(avg_levels))) / len(avg_levels)),
-                'low_activity_ratio': float(np.sum(avg_levels < (np.mean(avg_levels) - np.std(avg_levels))) / len(avg_levels)),
-                'silence_ratio': float(np.sum(avg_levels < 40) / len(avg_levels)),
-                'peak_count': float(len([i for i in range(1, len(avg_levels)-1) 
-                                      if avg_levels[i] > avg_levels[i-1] and avg_levels[i] > avg_levels[i+1]])),
-                
-                # Temporal patterns
-                'volume_changes': float(np.sum(np.abs(np.diff(avg_levels)) > 5) / len(avg_levels)) if len(avg_levels) > 1 else 0.0,
-                'stereo_switches': float(np.sum(np.abs(np.diff(differences)) > 3) / len(avg_levels)) if len(differences) > 1 else 0.0,
-                'rapid_changes': float(np.sum(np.abs(np.diff(avg_levels)) > 10) / len(avg_levels)) if len(avg_levels) > 1 else 0.0,
-                
-                # Advanced features
-                'left_dominance': float(np.sum(differences > 2) / len(differences)),
-                'right_dominance': float(np.sum(differences < -2) / len(differences)),
-                'center_ratio': float(np.sum(np.abs(differences) < 2) / len(differences)),
-                'dynamic_range': float(np.std(avg_levels) / np.mean(avg_levels)) if np.mean(avg_levels) > 0 else 0.0,
-                
-                # Session features
-                'session_length': float(len(audio_samples)),
-                'avg_sample_interval': float(np.mean(np.diff([s.get('timestamp', i*1000) for i, s in enumerate(audio_samples)]))) if len(audio_samples) > 1 else 1000.0,
-                
-                # Enhanced features for engagement
-                'activity_variance': float(np.var(avg_levels > np.mean(avg_levels))),
-                'speaker_alternation': float(len(np.where(np.diff(np.sign(differences)))[0])),
-                'engagement_complexity': float(np.sum(np.abs(np.diff(avg_levels, 2)))) if len(avg_levels) > 2 else 0.0
-            }
-            
-            # Energy distribution features (5 bins)
-            energy_bins = np.histogram(avg_levels, bins=5)[0]
-            for i, count in enumerate(energy_bins):
-                features[f'energy_bin_{i}'] = float(count / len(avg_levels))
-            
-            # Stereo distribution features (5 bins)  
-            stereo_bins = np.histogram(differences, bins=5)[0]
-            for i, count in enumerate(stereo_bins):
-                features[f'stereo_bin_{i}'] = float(count / len(differences))
-            
-            # Ensure no NaN or infinite values
-            for key, value in features.items():
-                if np.isnan(value) or np.isinf(value):
-                    features[key] = 0.0
-            
+            # Features are maintained incrementally as samples arrive
+            start = time.perf_counter()
+            features = session.feature_engine.features()
+            metrics.FEATURE_EXTRACTION.observe(time.perf_counter() - start)
+            if features is None:
+                logger.debug("Buffer contains non-finite levels, skipping feature extraction")
             return features
             
         except Exception as e:
@@ -274,157 +319,218 @@ class MLModelServer:
     
     def make_predictions(self, features: Dict[str, float]) -> Dict[str, Any]:
         """Make predictions using trained models"""
-        predictions = {}
+        return self.make_predictions_batch([features])[0]
+    
+    def make_predictions_batch(self, features_list: List[Dict[str, float]],
+                               model_set: Optional[ModelSet] = None) -> List[Dict[str, Any]]:
+        """Make predictions for several feature sets with one call per scaler and model"""
+        model_set = model_set or self.model_set
+        if model_set.prediction_plan is None:
+            return self.make_predictions_batch_dataframe(features_list, model_set)
         
         try:
-            # Convert features to DataFrame
-            feature_df = pd.DataFrame([features])
-            
-            # Ensure all required columns are present
-            for col in self.feature_columns:
-                if col not in feature_df.columns:
-                    feature_df[col] = 0.0
-            
-            # Reorder columns to match training
-            feature_df = feature_df[self.feature_columns]
+            return model_set.prediction_plan.predict(features_list)
+        except Exception as e:
+            logger.error(f"Error making predictions: {e}")
+            return [{'error': str(e)} for _ in features_list]
+    
+    def make_predictions_batch_dataframe(self, features_list: List[Dict[str, float]],
+                                         model_set: Optional[ModelSet] = None) -> List[Dict[str, Any]]:
+        """Reference prediction path through pandas and the sklearn transformers"""
+        model_set = model_set or self.model_set
+        batch_size = len(features_list)
+        predictions = [{} for _ in range(batch_size)]
+        
+        try:
+            # Stack features into one matrix, columns ordered as in training
+            # (missing features default to 0.0)
+            feature_matrix = np.array(
+                [[features.get(col, 0.0) for col in model_set.feature_columns] for features in features_list],
+                dtype=float
+            ).reshape(batch_size, len(model_set.feature_columns))
+            import pandas as pd  # Reference path only; keeps pandas out of server startup
+            feature_df = pd.DataFrame(feature_matrix, columns=model_set.feature_columns)
             
             # Make predictions for each model
-            for model_name, model in self.models.items():
+            for model_name, model in model_set.models.items():
                 try:
                     # Scale features if scaler exists
-                    if model_name in self.scalers:
-                        scaled_features = self.scalers[model_name].transform(feature_df)
+                    if model_name in model_set.scalers:
+                        scaled_features = model_set.scalers[model_name].transform(feature_df)
                     else:
-                        scaled_features = feature_df.values
+                        scaled_features = feature_matrix
                     
                     # Make prediction
                     if model_name == 'engagement_score':
                         # Regression model
-                        prediction = model.predict(scaled_features)[0]
+                        values = model.predict(scaled_features)
                         
-                        # Ensure engagement score is within reasonable bounds
-                        prediction = max(0, min(100, prediction))
-                        
-                        predictions[model_name] = {
-                            'value': float(prediction),
-                            'confidence': 0.85,  # Fixed confidence for regression
-                            'type': 'regression'
-                        }
+                        for row, prediction in enumerate(values):
+                            # Ensure engagement score is within reasonable bounds
+                            prediction = max(0, min(100, prediction))
+                            
+                            predictions[row][model_name] = {
+                                'value': float(prediction),
+                                'confidence': 0.85,  # Fixed confidence for regression
+                                'type': 'regression'
+                            }
                     else:
                         # Classification model
-                        prediction = model.predict(scaled_features)[0]
-                        probabilities = model.predict_proba(scaled_features)[0]
+                        classes = model.predict(scaled_features)
+                        probabilities = model.predict_proba(scaled_features)
                         
-                        # Decode prediction
-                        if model_name in self.encoders:
-                            predicted_class = self.encoders[model_name].inverse_transform([prediction])[0]
-                            all_classes = self.encoders[model_name].classes_
+                        # Decode predictions
+                        encoder = model_set.encoders.get(model_name)
+                        if encoder is not None:
+                            predicted_classes = encoder.inverse_transform(classes)
+                            class_labels = encoder.inverse_transform(np.arange(probabilities.shape[1]))
                         else:
-                            predicted_class = str(prediction)
-                            all_classes = [str(prediction)]
+                            predicted_classes = [str(prediction) for prediction in classes]
                         
-                        predictions[model_name] = {
-                            'value': predicted_class,
-                            'confidence': float(np.max(probabilities)),
-                            'probabilities': {
-                                self.encoders[model_name].inverse_transform([i])[0]: float(prob) 
-                                for i, prob in enumerate(probabilities)
-                            } if model_name in self.encoders else {},
-                            'type': 'classification'
-                        }
+                        for row in range(batch_size):
+                            predictions[row][model_name] = {
+                                'value': predicted_classes[row],
+                                'confidence': float(np.max(probabilities[row])),
+                                'probabilities': {
+                                    label: float(prob) for label, prob in zip(class_labels, probabilities[row])
+                                } if encoder is not None else {},
+                                'type': 'classification'
+                            }
                         
                 except Exception as e:
+                    metrics.MODEL_ERRORS.labels(model_name).inc()
                     logger.error(f"Error predicting {model_name}: {e}")
-                    predictions[model_name] = {'error': str(e)}
+                    for row_predictions in predictions:
+                        row_predictions[model_name] = {'error': str(e)}
             
             return predictions
             
         except Exception as e:
             logger.error(f"Error making predictions: {e}")
-            return {'error': str(e)}
-    
-    def get_spatial_analysis(self) -> Dict[str, Any]:
-        """Analyze spatial audio patterns for sphere visualization"""
-        if len(self.audio_buffer) < 5:
-            return {
-                'dominant_side': 'center',
-                'left_dominance_pct': 0.0,
-                'right_dominance_pct': 0.0,
-                'center_pct': 100.0,
-                'average_bias': 0.0,
-                'spatial_activity': 0.0,
-                'speaker_switches': 0
-            }
+            return [{'error': str(e)} for _ in range(batch_size)]
+    
+    def get_spatial_analysis(self, session: RoomSession) -> Dict[str, Any]:
+        """Spatial audio patterns of a room for sphere visualization (primary horizon)"""
+        return session.spatial.snapshot()
+    
+    def subscribe_client(self, websocket, room_id: str):
+        """Route predictions for a room to a client"""
+        self.client_rooms.setdefault(websocket, set()).add(room_id)
+        self.room_subscribers.setdefault(room_id, set()).add(websocket)
+    
+    def unsubscribe_client(self, websocket, room_id: Optional[str] = None):
+        """Stop routing a room (or every room when room_id is None) to a client"""
+        rooms = self.client_rooms.get(websocket, set())
+        for room in ([room_id] if room_id is not None else list(rooms)):
+            rooms.discard(room)
+            self.subscriptions.forget(websocket, room)
+            subscribers = self.room_subscribers.get(room)
+            if subscribers is not None:
+                subscribers.discard(websocket)
+                if not subscribers:
+                    del self.room_subscribers[room]
+        if room_id is None:
+            self.client_rooms.pop(websocket, None)
+    
+    def remove_client(self, websocket):
+        """Forget a client and all of its room subscriptions"""
+        self.clients.discard(websocket)
+        self.unsubscribe_client(websocket)
+        self.subscriptions.remove(websocket)
+        self.client_binary_rooms.pop(websocket, None)
+        outbox = self.outboxes.pop(websocket, None)
+        if outbox is not None:
+            outbox.stop()
+    
+    def _outbox_closed(self, websocket, reason: str):
+        """Drop a client whose sender task stopped (connection lost or too slow)"""
+        if reason == SLOW_CLIENT_CLOSE_REASON:
+            self.stats['slow_clients_disconnected'] += 1
+        self.remove_client(websocket)
+    
+    def broadcast(self, room_id: str, message: str, droppable: bool = True) -> int:
+        """Queue a serialized message for every subscriber of a room; returns how many took it"""
+        delivered = 0
+        for client in list(self.room_subscribers.get(room_id, ())):
+            outbox = self.outboxes.get(client)
+            if outbox is None:
+                continue
+            dropped_before = outbox.messages_dropped
+            if outbox.enqueue(message, droppable=droppable):
+                delivered += 1
+            self.stats['broadcast_drops'] += outbox.messages_dropped - dropped_before
+        return delivered
+    
+    def broadcast_predictions(self, room_id: str, response: Dict[str, Any], message: str) -> int:
+        """Queue an ml_predictions update for a room's subscribers, filtered per subscription"""
+        recipients = {}
+        for client in self.room_subscribers.get(room_id, ()):
+            outbox = self.outboxes.get(client)
+            if outbox is not None:
+                recipients[client] = outbox.messages_dropped
         
+        delivered = 0
+        for client, client_message in self.subscriptions.render(room_id, response, message, recipients):
+            outbox = self.outboxes[client]
+            dropped_before = outbox.messages_dropped
+            if outbox.enqueue(client_message):
+                delivered += 1
+            self.stats['broadcast_drops'] += outbox.messages_dropped - dropped_before
+        return delivered
+    
+    def broadcast_spatial_update(self, session: RoomSession, now: float) -> int:
+        """Queue a spatial_update of every horizon for the room's subscribers that want them"""
+        session.last_spatial_update = now
+        message = json.dumps(spatial_update_message(session.room_id, session.spatial, now))
+        self.stats['spatial_updates'] += 1
+        delivered = 0
+        for client in list(self.room_subscribers.get(session.room_id, ())):
+            outbox = self.outboxes.get(client)
+            if outbox is None or not self.subscriptions.wants_spatial_updates(client):
+                continue
+            dropped_before = outbox.messages_dropped
+            if outbox.enqueue(message):
+                delivered += 1
+            self.stats['broadcast_drops'] += outbox.messages_dropped - dropped_before
+        return delivered
+    
+    async def relay_client(self, websocket, room_id: str, client_id: str, first_message=None,
+                           welcomed: bool = False):
+        """Hand a connection to the cluster worker that owns its room"""
+        self.stats['connections_relayed'] += 1
         try:
-            # Use recent samples for spatial analysis
-            recent_samples = list(self.audio_buffer)[-30:]  # Last 30 samples
-            differences = [s.get('difference', 0) for s in recent_samples]
-            
-            if not differences:
-                return {
-                    'dominant_side': 'center',
-                    'left_dominance_pct': 0.0,
-                    'right_dominance_pct': 0.0,
-                    'center_pct': 100.0,
-                    'average_bias': 0.0,
-                    'spatial_activity': 0.0,
-                    'speaker_switches': 0
-                }
-            
-            # Analyze directional tendencies
-            left_dominant_count = sum(1 for d in differences if d > 2)
-            right_dominant_count = sum(1 for d in differences if d < -2)
-            center_count = sum(1 for d in differences if abs(d) <= 2)
-            
-            total_samples = len(differences)
-            
-            # Calculate percentages
-            left_pct = (left_dominant_count / total_samples) * 100
-            right_pct = (right_dominant_count / total_samples) * 100
-            center_pct = (center_count / total_samples) * 100
-            
-            # Determine dominant side
-            if left_dominant_count > right_dominant_count and left_dominant_count > center_count:
-                dominant_side = 'left'
-            elif right_dominant_count > left_dominant_count and right_dominant_count > center_count:
-                dominant_side = 'right'
-            else:
-                dominant_side = 'center'
-            
-            # Calculate speaker switches (sign changes in differences)
-            speaker_switches = 0
-            for i in range(1, len(differences)):
-                if np.sign(differences[i]) != np.sign(differences[i-1]) and abs(differences[i]) > 1:
-                    speaker_switches += 1
-            
-            return {
-                'dominant_side': dominant_side,
-                'left_dominance_pct': float(left_pct),
-                'right_dominance_pct': float(right_pct),
-                'center_pct': float(center_pct),
-                'average_bias': float(np.mean(differences)),
-                'spatial_activity': float(np.std(differences)),
-                'speaker_switches': int(speaker_switches)
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in spatial analysis: {e}")
-            return {
-                'dominant_side': 'center',
-                'left_dominance_pct': 0.0,
-                'right_dominance_pct': 0.0,
-                'center_pct': 100.0,
-                'average_bias': 0.0,
-                'spatial_activity': 0.0,
-                'speaker_switches': 0,
-                'error': str(e)
-            }
+            await self.cluster.relay(websocket, room_id, client_id, first_message, welcomed)
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            logger.error(f"Error relaying {client_id} to the owner of room {room_id}: {e}")
+            self.stats['errors'] += 1
     
-    async def handle_client(self, websocket, path):
+    async def handle_client(self, websocket, path=None):
         """Handle WebSocket client connections"""
         client_id = f"{websocket.remote_address[0]}:{websocket.remote_address[1]}"
+        
+        # In a cluster, rooms live on one worker: relay connections that landed elsewhere
+        options = {}
+        routed = True
+        if self.cluster is not None:
+            options = ClusterWorker.connection_options(websocket, path)
+            client_id = options.get('relayed', client_id)
+            if 'relayed' not in options and 'room' in options:
+                room_id = normalize_room_id(options['room'])
+                if not self.cluster.owns(room_id):
+                    await self.relay_client(websocket, room_id, client_id)
+                    return
+            routed = 'relayed' in options or 'room' in options
+        
         self.clients.add(websocket)
+        self.subscribe_client(websocket, DEFAULT_ROOM)
+        outbox = ClientOutbox(
+            websocket, client_id,
+            max_queue=self.client_queue_size,
+            slow_timeout=self.slow_client_timeout,
+            on_close=self._outbox_closed
+        )
+        self.outboxes[websocket] = outbox
+        outbox.start()
         self.stats['clients_connected'] += 1
         logger.info(f"✅ Client connected: {client_id} (Total: {len(self.clients)})")
         
@@ -435,17 +541,50 @@ class MLModelServer:
                 'server_info': {
                     'models_loaded': list(self.models.keys()),
                     'features_count': len(self.feature_columns),
+                    'model_version': self.model_version,
                     'prediction_interval': self.prediction_interval,
+                    'scheduling': self.scheduler.describe(),
+                    'rooms': sorted(self.client_rooms.get(websocket, ())),
+                    'protocols': {
+                        'supported': ['json', 'binary'],
+                        'binary': binary_protocol.describe()
+                    },
                     'server_stats': self.stats
                 }
             }
-            await websocket.send(json.dumps(welcome_msg))
+            if options.get('welcome') != '0':
+                await websocket.send(json.dumps(welcome_msg))
             
             async for message in websocket:
+                if not routed and isinstance(message, str):
+                    # Route by the room of the first message
+                    routed = True
+                    try:
+                        room_id = routing_room(json.loads(message))
+                    except (ValueError, AttributeError):
+                        room_id = None
+                    if room_id is not None and not self.cluster.owns(room_id):
+                        self.remove_client(websocket)
+                        await self.relay_client(websocket, room_id, client_id, message, welcomed=True)
+                        return
+                
                 try:
+                    if isinstance(message, bytes):
+                        await self.handle_binary_message(websocket, message)
+                        continue
+                    
+                    start = time.perf_counter()
                     data = json.loads(message)
+                    metrics.JSON_DECODE.observe(time.perf_counter() - start)
                     await self.handle_message(websocket, data)
                     
+                except binary_protocol.BinaryProtocolError as e:
+                    logger.error(f"Invalid binary frame from {client_id}: {e}")
+                    self.stats['errors'] += 1
+                    await websocket.send(json.dumps({
+                        'type': 'error',
+                        'message': f'Invalid binary frame: {e}'
+                    }))
                 except json.JSONDecodeError:
                     logger.error(f"Invalid JSON from {client_id}")
                     await websocket.send(json.dumps({
@@ -461,74 +600,436 @@ class MLModelServer:
         except Exception as e:
             logger.error(f"Error handling client {client_id}: {e}")
         finally:
-            self.clients.remove(websocket)
+            self.remove_client(websocket)
             logger.info(f"Client removed: {client_id} (Remaining: {len(self.clients)})")
     
+    def ingest(self, websocket, room_id: str, session: RoomSession, sample_count: int):
+        """Bookkeeping after samples were added to a room: subscription, spatial updates and prediction timer"""
+        self.stats['samples_processed'] += sample_count
+        
+        # The sending client receives that room's predictions
+        if websocket is not None and room_id not in self.client_rooms.get(websocket, ()):
+            self.subscribe_client(websocket, room_id)
+        
+        # Spatial state moves with every sample; push it between predictions, rate-limited per room
+        current_time = time.time()
+        if (self.spatial_update_interval > 0 and self.room_subscribers.get(room_id)
+                and current_time - session.last_spatial_update >= self.spatial_update_interval):
+            self.broadcast_spatial_update(session, current_time)
+        
+        # Check if it's time to look at the room's features again
+        if current_time - session.last_check_time >= self.scheduler.check_interval:
+            session.last_check_time = current_time
+            self.schedule_prediction(session)
+    
+    def ingest_device_sample(self, room_id: str, sample: Dict[str, float]):
+        """Store a sample read from an ESP32 board in its room"""
+        try:
+            start = time.perf_counter()
+            session = self.sessions.get_or_create(room_id)
+            session.add_sample(sample)
+            if self.history is not None:
+                self.history.record_samples(room_id, np.array([[sample[field]] for field in FIELDS]))
+            metrics.BUFFER_APPEND.observe(time.perf_counter() - start)
+            self.stats['device_samples'] += 1
+            self.ingest(None, room_id, session, 1)
+        except Exception as e:
+            logger.error(f"Error ingesting ESP32 sample for room {room_id}: {e}")
+            self.stats['errors'] += 1
+    
+    async def handle_binary_message(self, websocket, frame: bytes):
+        """Decode a binary audio frame straight into the room's buffers"""
+        rooms = self.client_binary_rooms.get(websocket)
+        if rooms is None:
+            raise binary_protocol.BinaryProtocolError("Binary frames require select_protocol first")
+        
+        room_index, records = binary_protocol.decode_frame(frame)
+        if room_index >= len(rooms):
+            raise binary_protocol.BinaryProtocolError(f"Unknown room index: {room_index}")
+        if len(records) == 0:
+            return
+        
+        room_id = rooms[room_index]
+        start = time.perf_counter()
+        session = self.sessions.get_or_create(room_id)
+        session.add_records(records)
+        if self.history is not None:
+            self.history.record_samples(room_id, np.array([records[field] for field in FIELDS], dtype=np.float64))
+        metrics.BUFFER_APPEND.observe(time.perf_counter() - start)
+        self.stats['binary_frames'] += 1
+        self.ingest(websocket, room_id, session, len(records))
+    
     async def handle_message(self, websocket, data):
         """Handle different types of messages from clients"""
         message_type = data.get('type')
         
+        if self.cluster is not None:
+            # A connection lives on one worker: refuse rooms it cannot serve instead of dropping them
+            foreign = self.cluster.foreign_rooms(message_rooms(data))
+            if foreign:
+                self.stats['foreign_room_rejections'] += 1
+                await websocket.send(json.dumps({
+                    'type': 'error',
+                    'message': f"Room {foreign[0]} is served by another worker; "
+                               f"use a separate connection with ?room={foreign[0]}",
+                    'rooms': foreign
+                }))
+                return
+        
         if message_type == 'audio_data':
-            # Store audio data
-            audio_sample = {
-                'leftMic': float(data.get('leftMic', 0)),
-                'rightMic': float(data.get('rightMic', 0)),
-                'difference': float(data.get('difference', 0)),
-                'averageLevel': float(data.get('averageLevel', 0)),
-                'timestamp': data.get('timestamp', time.time() * 1000)
-            }
-            self.audio_buffer.append(audio_sample)
-            self.stats['samples_processed'] += 1
-            
-            # Check if it's time for new predictions
-            current_time = time.time()
-            if current_time - self.last_prediction_time >= self.prediction_interval:
-                await self.process_and_broadcast_predictions()
-                self.last_prediction_time = current_time
+            # Store audio data in the buffer of the room it came from
+            start = time.perf_counter()
+            room_id = normalize_room_id(data.get('room'))
+            audio_sample = parse_audio_sample(data)
+            session = self.sessions.get_or_create(room_id)
+            session.add_sample(audio_sample)
+            if self.history is not None:
+                self.history.record_samples(room_id, np.array([[audio_sample[field]] for field in FIELDS]))
+            metrics.BUFFER_APPEND.observe(time.perf_counter() - start)
+            self.ingest(websocket, room_id, session, 1)
+        
+        elif message_type == 'select_protocol':
+            # Choose JSON or binary audio frames for this connection
+            protocol = data.get('protocol', 'json')
+            if protocol == 'binary':
+                rooms = [normalize_room_id(room) for room in (data.get('rooms') or [DEFAULT_ROOM])]
+                if len(rooms) > binary_protocol.MAX_ROOMS_PER_CONNECTION:
+                    raise ValueError(f"At most {binary_protocol.MAX_ROOMS_PER_CONNECTION} rooms per connection")
+                self.client_binary_rooms[websocket] = rooms
+                room_table = {room: index for index, room in enumerate(rooms)}
+            elif protocol == 'json':
+                self.client_binary_rooms.pop(websocket, None)
+                room_table = {}
+            else:
+                await websocket.send(json.dumps({
+                    'type': 'error',
+                    'message': f'Unsupported protocol: {protocol}'
+                }))
+                return
+            await websocket.send(json.dumps({
+                'type': 'protocol_selected',
+                'protocol': protocol,
+                'rooms': room_table
+            }))
         
         elif message_type == 'request_prediction':
-            # Force immediate prediction
-            await self.process_and_broadcast_predictions()
+            # Force immediate prediction: an explicit request always gets an answer
+            room_id = normalize_room_id(data.get('room'))
+            session = self.sessions.get(room_id)
+            if session is None or len(session.audio_buffer) < self.min_samples_for_prediction:
+                await websocket.send(json.dumps({
+                    'type': 'error',
+                    'message': f'Not enough samples in room {room_id} for a prediction yet'
+                }))
+            else:
+                self.schedule_prediction(session, force=True)
+        
+        elif message_type == 'join_room':
+            # Receive predictions of another room
+            self.subscribe_client(websocket, normalize_room_id(data.get('room')))
+            await websocket.send(json.dumps({
+                'type': 'rooms',
+                'rooms': sorted(self.client_rooms.get(websocket, ()))
+            }))
+        
+        elif message_type == 'subscribe':
+            # Choose rooms, models and fields of the prediction updates, optionally as deltas
+            try:
+                subscription = Subscription.from_message(data)
+            except (TypeError, ValueError) as e:
+                await websocket.send(json.dumps({
+                    'type': 'error',
+                    'message': f'Invalid subscription: {e}'
+                }))
+                return
+            if data.get('rooms') is not None:
+                self.unsubscribe_client(websocket)
+                for room in data['rooms']:
+                    self.subscribe_client(websocket, normalize_room_id(room))
+            self.subscriptions.set(websocket, subscription)
+            await websocket.send(json.dumps({
+                'type': 'subscribed',
+                'rooms': sorted(self.client_rooms.get(websocket, ())),
+                **subscription.describe()
+            }))
+        
+        elif message_type == 'leave_room':
+            self.unsubscribe_client(websocket, normalize_room_id(data.get('room')))
+            await websocket.send(json.dumps({
+                'type': 'rooms',
+                'rooms': sorted(self.client_rooms.get(websocket, ()))
+            }))
         
         elif message_type == 'get_stats':
             # Send server statistics
+            session = self.sessions.get(normalize_room_id(data.get('room')))
             stats_msg = {
                 'type': 'server_stats',
                 'stats': self.stats,
-                'buffer_size': len(self.audio_buffer),
-                'clients_connected': len(self.clients)
+                'buffer_size': len(session.audio_buffer) if session else 0,
+                'clients_connected': len(self.clients),
+                'model_version': self.model_version,
+                'batching': self.batcher.get_stats(),
+                'scheduling': self.scheduler.describe(),
+                'prediction_cache': self.prediction_cache_stats(),
+                'subscriptions': self.subscriptions.get_stats(),
+                'devices': [device.get_stats() for device in self.devices],
+                'cluster': self.cluster.cluster_stats if self.cluster is not None else None,
+                'clients': [outbox.get_stats() for outbox in self.outboxes.values()],
+                'history': self.history.get_stats() if self.history is not None else None,
+                'sessions': {
+                    'active': len(self.sessions),
+                    'created': self.sessions.sessions_created,
+                    'evicted': self.sessions.sessions_evicted,
+                    'rooms': self.sessions.summary()
+                }
             }
             await websocket.send(json.dumps(stats_msg))
         
+        elif message_type == 'reload_models':
+            # Admin: load the newest (or a given) model set and swap it in
+            result = await self.reload_models(version=data.get('version'), force=bool(data.get('force', False)))
+            await websocket.send(json.dumps({
+                'type': 'models_reloaded',
+                'model_version': self.model_version,
+                'models_loaded': list(self.models.keys()),
+                **result
+            }))
+        
+        elif message_type in ('get_history', 'get_predictions'):
+            # Stream a time-range query of the persistent history back in chunks
+            if self.history is None:
+                await websocket.send(json.dumps({
+                    'type': 'error',
+                    'message': 'History is not enabled on this server'
+                }))
+                return
+            room_id = normalize_room_id(data.get('room'))
+            start = float(data.get('start', 0))
+            end = float(data.get('end', float('inf')))
+            chunk_size = max(1, min(int(data.get('chunk_size', self.history_chunk_size)), 10000))
+            if message_type == 'get_history':
+                chunks = self.history.query_samples(room_id, start, end, chunk_size)
+            else:
+                chunks = self.history.query_predictions(room_id, start, end, chunk_size)
+            await self.stream_history(websocket, message_type, room_id, chunks, data.get('request_id'))
+        
         elif message_type == 'ping':
             # Respond to ping
             await websocket.send(json.dumps({'type': 'pong'}))
     
-    async def process_and_broadcast_predictions(self):
-        """Process current audio buffer and broadcast ML predictions"""
+    async def stream_history(self, websocket, message_type: str, room_id: str, chunks, request_id=None):
+        """Send history query results chunk by chunk, reading each chunk off the event loop"""
+        reply_type = 'history' if message_type == 'get_history' else 'predictions_history'
+        key = 'samples' if message_type == 'get_history' else 'predictions'
+        chunk_count = 0
+        row_count = 0
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            rows = len(chunk['received_at']) if key == 'samples' else len(chunk)
+            await websocket.send(json.dumps({
+                'type': reply_type,
+                'room': room_id,
+                'request_id': request_id,
+                'chunk': chunk_count,
+                key: chunk,
+                'done': False
+            }))
+            chunk_count += 1
+            row_count += rows
+        await websocket.send(json.dumps({
+            'type': reply_type,
+            'room': room_id,
+            'request_id': request_id,
+            'chunks': chunk_count,
+            'rows': row_count,
+            'done': True
+        }))
+    
+    async def flush_history(self):
+        """Periodically write buffered history to disk in a worker thread
+
+        Retention is also swept over every stored room (first right after startup),
+        so rooms that stopped receiving data are pruned too.
+        """
+        last_sweep = None
+        while True:
+            await asyncio.sleep(self.history_flush_interval)
+            try:
+                await asyncio.to_thread(self.history.flush)
+                if last_sweep is None or time.monotonic() - last_sweep >= self.history_sweep_interval:
+                    last_sweep = time.monotonic()
+                    await asyncio.to_thread(self.history.sweep_retention)
+            except Exception as e:
+                logger.error(f"Error writing history: {e}")
+                self.stats['errors'] += 1
+    
+    def create_process_pool(self, version: Optional[str]) -> ProcessPoolExecutor:
+        """Process pool whose workers load the given model version"""
+        return ProcessPoolExecutor(
+            max_workers=self.executor_workers,
+            initializer=_init_inference_worker,
+            initargs=(str(self.models_dir), version, self.prediction_cache_size, self.prediction_cache_decimals,
+                      self.use_bundles, self.forest_engine)
+        )
+    
+    async def replace_process_pool(self, version: str):
+        """Start and warm a process pool on a new model version, then retire the old one"""
+        new_executor = self.create_process_pool(version)
+        loop = asyncio.get_running_loop()
+        warmup = [{col: 0.0 for col in self.feature_columns}]
+        await asyncio.gather(*[
+            loop.run_in_executor(new_executor, _worker_make_predictions_batch, warmup)
+            for _ in range(self.executor_workers)
+        ])
+        old_executor, self.executor = self.executor, new_executor
+        # Batches already submitted to the old pool still complete
+        old_executor.shutdown(wait=False)
+    
+    def start_executor(self):
+        """Create the inference pool and its backpressure limit"""
+        if self.executor_type == 'process':
+            self.executor = self.create_process_pool(self.model_version)
+        else:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.executor_workers,
+                thread_name_prefix='inference'
+            )
+        # Never queue more work than the pool can start right away
+        self.inference_slots = asyncio.Semaphore(self.executor_workers)
+        logger.info(f"🧵 Inference executor: {self.executor_type} pool with {self.executor_workers} workers")
+    
+    def stop_executor(self):
+        """Shut the inference pool down"""
+        self.batcher.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+    
+    async def run_inference(self, features: Dict[str, float]):
+        """Predict for one feature set through the micro-batcher
+        
+        Returns the predictions and the model version that produced them.
+        """
+        return await self.batcher.submit(features)
+    
+    def _predict_batch_with_version(self, features_list: List[Dict[str, float]]):
+        """make_predictions_batch tagged with the model version it ran on"""
+        model_set = self.model_set
+        return model_set.version, self.make_predictions_batch(features_list, model_set)
+    
+    async def run_inference_batch(self, features_list: List[Dict[str, float]]) -> List[tuple]:
+        """Run make_predictions_batch in the executor, waiting for a free slot"""
+        if self.executor is None:
+            version, predictions = self._predict_batch_with_version(features_list)
+            return [(row, version) for row in predictions]
+        
+        self.stats['inference_waiting'] += 1
+        try:
+            await self.inference_slots.acquire()
+        finally:
+            self.stats['inference_waiting'] -= 1
+        
+        self.stats['inference_in_flight'] += 1
+        depth = self.stats['inference_in_flight'] + self.stats['inference_waiting']
+        self.stats['inference_max_queue_depth'] = max(self.stats['inference_max_queue_depth'], depth)
+        try:
+            loop = asyncio.get_running_loop()
+            if self.executor_type == 'process':
+                version, predictions = await loop.run_in_executor(
+                    self.executor, _worker_make_predictions_batch, features_list)
+            else:
+                version, predictions = await loop.run_in_executor(
+                    self.executor, self._predict_batch_with_version, features_list)
+            return [(row, version) for row in predictions]
+        finally:
+            self.stats['inference_in_flight'] -= 1
+            self.inference_slots.release()
+    
+    def schedule_prediction(self, session: RoomSession, force: bool = False):
+        """Start a prediction for a room, coalescing with one already in flight
+
+        force bypasses the adaptive scheduler (explicit request_prediction).
+        """
+        session.prediction_forced = session.prediction_forced or force
+        if session.prediction_task is not None and not session.prediction_task.done():
+            # Latest wins: one follow-up run picks up the newest buffer state
+            session.prediction_pending = True
+            self.stats['predictions_coalesced'] += 1
+            return
+        session.prediction_task = asyncio.create_task(self._prediction_loop(session))
+    
+    async def _prediction_loop(self, session: RoomSession):
+        """Predict for a room until no coalesced request is left"""
+        while True:
+            session.prediction_pending = False
+            force, session.prediction_forced = session.prediction_forced, False
+            await self.process_and_broadcast_predictions(session, force=force)
+            if not session.prediction_pending:
+                break
+    
+    async def process_and_broadcast_predictions(self, session: RoomSession, force: bool = False):
+        """Process a room's audio buffer and broadcast ML predictions to its subscribers
+
+        Unless forced, the adaptive scheduler may skip the run or reuse the last result.
+        """
         try:
             # Extract features
-            features = self.extract_features_from_buffer()
+            features = self.extract_features_from_buffer(session)
             if not features:
-                logger.debug("Insufficient data for prediction")
+                logger.debug(f"Insufficient data for prediction in room {session.room_id}")
                 return
+            latest_sample_timestamp = session.audio_buffer.value(TIMESTAMP, -1)
             
-            # Make predictions
-            predictions = self.make_predictions(features)
+            # Run the models only when the features moved enough since their last run
+            now = time.time()
+            vector = feature_vector(features)
+            last_vector = session.last_feature_vector if session.last_model_version == self.model_version else None
+            scheduled, distance = self.scheduler.decide(vector, now, last_vector,
+                                                        session.last_inference_time, session.last_prediction_time)
+            decision = RUN if force else scheduled
+            if decision == WAIT:
+                return
             
-            # Get spatial analysis
-            spatial_analysis = self.get_spatial_analysis()
+            if decision == RUN:
+                # Make predictions off the event loop
+                predictions, model_version = await self.run_inference(features)
+                if force:
+                    self.stats['predictions_forced'] += 1
+                if scheduled == RUN and now - session.last_prediction_time < self.prediction_interval:
+                    # The scheduler itself ran the models ahead of the fixed interval
+                    self.stats['predictions_accelerated'] += 1
+                session.last_inference_time = now
+                session.last_feature_vector = vector
+                session.last_predictions = predictions
+                session.last_model_version = model_version
+                
+                # Update statistics
+                self.stats['predictions_made'] += 1
+                session.predictions_made += 1
+            else:
+                predictions, model_version = session.last_predictions, session.last_model_version
+                self.stats['predictions_skipped'] += 1
+            session.last_prediction_time = now
             
-            # Update statistics
-            self.stats['predictions_made'] += 1
+            # Get spatial analysis
+            spatial_analysis = self.get_spatial_analysis(session)
             
             # Create response
             response = {
                 'type': 'ml_predictions',
+                'room': session.room_id,
+                'model_version': model_version,
                 'timestamp': datetime.now().isoformat(),
                 'predictions': predictions,
+                'reused': decision != RUN,
+                'prediction_age': time.time() - session.last_inference_time,
+                'feature_change': distance if distance != float('inf') else None,
                 'spatial_analysis': spatial_analysis,
-                'buffer_size': len(self.audio_buffer),
+                'buffer_size': len(session.audio_buffer),
+                'latest_sample_timestamp': latest_sample_timestamp,
                 'features_used': len(features),
                 'server_stats': {
                     'predictions_made': self.stats['predictions_made'],
@@ -538,57 +1039,151 @@ class MLModelServer:
             }
             
             # Store in history
-            self.prediction_history.append(response)
+            start = time.perf_counter()
+            session.prediction_history.append(response)
+            message = json.dumps(response)
+            if self.history is not None:
+                self.history.record_prediction(session.room_id, message)
             
-            # Broadcast to all clients
-            if self.clients:
-                message = json.dumps(response)
-                disconnected_clients = []
-                
-                for client in self.clients:
-                    try:
-                        await client.send(message)
-                    except websockets.exceptions.ConnectionClosed:
-                        disconnected_clients.append(client)
-                    except Exception as e:
-                        logger.error(f"Error sending to client: {e}")
-                        disconnected_clients.append(client)
-                
-                # Remove disconnected clients
-                for client in disconnected_clients:
-                    self.clients.discard(client)
-                
-                logger.info(f"📊 Broadcasted predictions to {len(self.clients)} clients")
+            # Fan out to the room's subscribers; each client's sender task delivers it
+            if self.room_subscribers.get(session.room_id):
+                delivered = self.broadcast_predictions(session.room_id, response, message)
+                self.broadcast_log.add(session.room_id, deliveries=delivered)
+            metrics.BROADCAST.observe(time.perf_counter() - start)
             
         except Exception as e:
             logger.error(f"Error processing predictions: {e}")
             self.stats['errors'] += 1
     
+    async def evict_idle_sessions(self):
+        """Periodically drop rooms that stopped sending audio"""
+        while True:
+            await asyncio.sleep(self.session_sweep_interval)
+            try:
+                evicted = self.sessions.evict_idle()
+                if self.history is not None:
+                    # Release the evicted rooms' segment maps and file handles
+                    for room_id in evicted:
+                        await asyncio.to_thread(self.history.close_room, room_id)
+            except Exception as e:
+                logger.error(f"Error evicting idle sessions: {e}")
+    
+    def register_metrics(self):
+        """Point the scrape-time metrics at this server's state"""
+        gauge_keys = ('inference_in_flight', 'inference_waiting', 'inference_max_queue_depth')
+        metrics.SERVER_COUNTERS.set_function(lambda: {
+            ('log_records_dropped',): log_pipeline.dropped_records(),
+            **{(key,): value for key, value in self.stats.items() if key != 'start_time' and key not in gauge_keys}
+        })
+        metrics.SERVER_GAUGES.set_function(lambda: {
+            ('clients',): len(self.clients),
+            ('sessions',): len(self.sessions),
+            ('batch_queue',): len(self.batcher),
+            ('prediction_cache_entries',): len(self.prediction_plan.cache)
+            if self.prediction_plan is not None and self.prediction_plan.cache is not None else 0,
+            ('uptime_seconds',): time.time() - self.stats['start_time'],
+            ('devices_connected',): sum(1 for device in self.devices if device.connected),
+            **{(key,): self.stats[key] for key in gauge_keys}
+        })
+        metrics.CLIENT_QUEUE.set_function(lambda: {
+            (outbox.client_id,): len(outbox) for outbox in self.outboxes.values()
+        })
+        metrics.CLIENT_LAST_LAG.set_function(lambda: {
+            (outbox.client_id,): outbox.last_lag for outbox in self.outboxes.values()
+        })
+    
+    def cluster_snapshot(self) -> Dict[str, Any]:
+        """This worker's numbers for the cluster coordinator"""
+        return {
+            'worker': self.cluster.index,
+            'pid': os.getpid(),
+            'stats': dict(self.stats),
+            'clients': len(self.clients),
+            'sessions': len(self.sessions),
+            'model_version': self.model_version
+        }
+    
     async def start_server(self):
         """Start the WebSocket server"""
-        logger.info(f"🚀 Starting ML Model Server on {self.host}:{self.port}")
+        worker = f" (worker {self.cluster.index}/{self.cluster.workers})" if self.cluster is not None else ""
+        logger.info(f"🚀 Starting ML Model Server on {self.host}:{self.port}{worker}")
         
-        # Load models first
-        if not self.load_models():
+        # Load models first (cluster workers inherit them from the parent)
+        if not self.models and not self.load_models():
             logger.error("❌ Failed to load models! Cannot start server.")
             return False
         
-        logger.info(f"📊 Loaded models: {list(self.models.keys())}")
+        logger.info(f"📊 Loaded models: {list(self.models.keys())} (version {self.model_version})")
+        compiled = [plan.name for plan in self.prediction_plan.model_plans
+                    if plan.compiled or type(plan.model).__name__ == 'CompiledForest']
+        logger.info(f"⚡ Forest engine: {compiled or 'not used'}")
         logger.info(f"🔧 Prediction interval: {self.prediction_interval}s")
         logger.info(f"📈 Feature count: {len(self.feature_columns)}")
+        logger.info(f"🏠 Session limit: {self.sessions.max_sessions} rooms, "
+                    f"idle timeout: {self.sessions.idle_timeout}s")
+        
+        self.start_executor()
         
+        # Background maintenance tasks
+        background_tasks = [
+            asyncio.create_task(self.evict_idle_sessions()),
+            asyncio.create_task(metrics.monitor_event_loop())
+        ]
+        relay_server = None
         try:
-            async with websockets.serve(self.handle_client, self.host, self.port):
+            if self.model_poll_interval > 0:
+                background_tasks.append(asyncio.create_task(self.watch_models()))
+            if self.history is not None:
+                background_tasks.append(asyncio.create_task(self.flush_history()))
+                logger.info(f"🗄️ Recording history to {self.history.root}")
+            
+            self.register_metrics()
+            if self.metrics_server is not None:
+                try:
+                    await self.metrics_server.start()
+                except OSError as e:
+                    # Metrics are optional: keep serving WebSocket clients without them
+                    logger.warning(f"⚠️ Metrics endpoint unavailable on "
+                                   f"{self.metrics_server.host}:{self.metrics_server.port}: {e}")
+                    self.metrics_server = None
+            
+            stopped = asyncio.get_running_loop().create_future()
+            listen = {'host': self.host, 'port': self.port}
+            if self.cluster is not None:
+                # Every worker binds the public port; the kernel balances new connections
+                listen = {'sock': self.cluster.listen_socket()}
+                relay_server = await websockets.serve(self.handle_client, '127.0.0.1', self.cluster.internal_port)
+                self.cluster.stopped = stopped
+                background_tasks.append(asyncio.create_task(self.cluster.report_stats(self.cluster_snapshot)))
+            
+            # Upstream ESP32 connections; in a cluster only the worker owning the room reads its board
+            for device in self.devices:
+                if self.cluster is None or self.cluster.owns(device.room_id):
+                    background_tasks.append(device.start())
+                    logger.info(f"📡 Reading ESP32 {device.url} into room {device.room_id}")
+            
+            async with websockets.serve(self.handle_client, **listen):
                 logger.info("✅ ML Model Server is running...")
                 logger.info(f"🌐 Connect your web interface to: ws://{self.host}:{self.port}")
                 logger.info("Press Ctrl+C to stop the server")
                 
                 # Keep server running
-                await asyncio.Future()  # Run forever
+                await stopped
                 
         except Exception as e:
             logger.error(f"❌ Server error: {e}")
             return False
+        finally:
+            for task in background_tasks:
+                task.cancel()
+            if relay_server is not None:
+                relay_server.close()
+            self.stop_executor()
+            if self.history is not None:
+                self.history.close()
+            if self.metrics_server is not None:
+                await self.metrics_server.stop()
+            self.broadcast_log.flush()
 
 def main():
     """Main function to start the ML model server"""
@@ -601,16 +1196,156 @@ def main():
                        help='Server port (default: 8765)')
     parser.add_argument('--prediction-interval', type=float, default=5.0,
                        help='Prediction interval in seconds (default: 5.0)')
+    parser.add_argument('--min-prediction-interval', type=float, default=1.0,
+                       help='Seconds between feature checks; activity jumps are predicted this soon (default: 1.0)')
+    parser.add_argument('--max-staleness', type=float, default=30.0,
+                       help='Seconds after which predictions are recomputed even if nothing changed (default: 30)')
+    parser.add_argument('--change-threshold', type=float, default=0.03,
+                       help='Mean relative feature change that triggers inference at the prediction interval (default: 0.03)')
+    parser.add_argument('--activity-threshold', type=float, default=0.08,
+                       help='Mean relative feature change that triggers inference immediately (default: 0.08)')
+    parser.add_argument('--fixed-schedule', action='store_true',
+                       help='Run inference every prediction interval regardless of feature change')
     parser.add_argument('--min-samples', type=int, default=10,
                        help='Minimum samples needed for prediction (default: 10)')
+    parser.add_argument('--buffer-size', type=int, default=150,
+                       help='Audio samples kept per room for feature extraction (default: 150)')
+    parser.add_argument('--max-sessions', type=int, default=1000,
+                       help='Maximum number of concurrently tracked rooms (default: 1000)')
+    parser.add_argument('--session-idle-timeout', type=float, default=600.0,
+                       help='Seconds without audio before a room is dropped (default: 600)')
+    parser.add_argument('--client-queue-size', type=int, default=8,
+                       help='Broadcast messages queued per client before the oldest is dropped (default: 8)')
+    parser.add_argument('--slow-client-timeout', type=float, default=30.0,
+                       help='Seconds a client may stay at its queue limit before it is disconnected (default: 30)')
+    parser.add_argument('--history-dir', default='./history',
+                       help="Directory for persistent sample/prediction history, '' disables (default: ./history)")
+    parser.add_argument('--history-retention-hours', type=float, default=168.0,
+                       help='Hours of history kept per room (default: 168)')
+    parser.add_argument('--history-open-rooms', type=int, default=64,
+                       help='Rooms whose history segments stay mapped for writing; least recently written are closed (default: 64)')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                       help='Pool type used for model inference (default: thread)')
+    parser.add_argument('--executor-workers', type=int, default=2,
+                       help='Number of inference workers (default: 2)')
+    parser.add_argument('--max-batch-size', type=int, default=32,
+                       help='Maximum rooms predicted in one model call (default: 32)')
+    parser.add_argument('--max-batch-wait', type=float, default=5.0,
+                       help='Milliseconds a prediction waits for others to batch with (default: 5)')
+    parser.add_argument('--prediction-cache-size', type=int, default=4096,
+                       help='Cached predictions per model set, 0 disables the cache (default: 4096)')
+    parser.add_argument('--prediction-cache-decimals', type=int, default=4,
+                       help='Decimals feature values are rounded to for cache keys and predictions (default: 4)')
+    parser.add_argument('--model-poll-interval', type=float, default=10.0,
+                       help='Seconds between checks for new model sets, 0 disables hot reload (default: 10)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                       help='Serve a local /metrics HTTP endpoint on this port, e.g. 9108 (default: disabled)')
+    parser.add_argument('--metrics-host', default='127.0.0.1',
+                       help='Address the metrics endpoint listens on (default: 127.0.0.1)')
+    parser.add_argument('--profile', action='store_true',
+                       help='Enable on-demand cProfile snapshots at /profile?seconds=N on the metrics endpoint '
+                            '(requires --metrics-port)')
+    parser.add_argument('--log-path', default='ml_server.log',
+                       help="Log file, rotated by size; '' logs to stdout only (default: ml_server.log)")
+    parser.add_argument('--log-format', choices=['text', 'json'], default='text',
+                       help='Log file format: text lines or one JSON object per line (default: text)')
+    parser.add_argument('--log-max-mb', type=float, default=10.0,
+                       help='Size in MB at which the log file is rotated (default: 10)')
+    parser.add_argument('--log-backups', type=int, default=5,
+                       help='Rotated log files kept (default: 5)')
+    parser.add_argument('--log-summary-interval', type=float, default=10.0,
+                       help='Seconds between summary lines for frequent events like broadcasts (default: 10)')
+    parser.add_argument('--score', nargs='+', metavar='RECORDING',
+                       help='Score recordings (files, directories of *_audio.json or globs) offline and exit')
+    parser.add_argument('--score-output', default='scores.csv',
+                       help='Offline scoring output, .csv or .parquet (default: scores.csv)')
+    parser.add_argument('--stride', type=int, default=5,
+                       help='Samples between scored windows in offline scoring (default: 5)')
+    parser.add_argument('--jobs', type=int, default=None,
+                       help='Offline scoring worker processes (default: CPU count)')
+    parser.add_argument('--build-bundle', nargs='?', const='latest', metavar='VERSION',
+                       help='Precompile a model set (default: the newest) into a fast-loading bundle and exit')
+    parser.add_argument('--no-bundles', action='store_true',
+                       help='Load the pickled artifacts even where a precompiled bundle exists')
+    parser.add_argument('--esp32', action='append', default=[], metavar='[ROOM=]HOST[:PORT]',
+                       help='ESP32 board to read audio from directly, one room per board (repeatable; port 81 by default)')
+    parser.add_argument('--esp32-stale-timeout', type=float, default=DEFAULT_STALE_TIMEOUT,
+                       help=f'Seconds without data before an ESP32 connection is reopened (default: {DEFAULT_STALE_TIMEOUT:g})')
+    parser.add_argument('--spatial-horizons', default=','.join(f'{h:g}' for h in DEFAULT_HORIZONS),
+                       help='Comma-separated spatial analysis horizons, e.g. 10s,30s,5m; the middle one feeds '
+                            'ml_predictions (default: %(default)s seconds)')
+    parser.add_argument('--spatial-update-interval', type=float, default=DEFAULT_UPDATE_INTERVAL,
+                       help=f'Minimum seconds between spatial_update messages per room, 0 disables '
+                            f'(default: {DEFAULT_UPDATE_INTERVAL:g})')
+    parser.add_argument('--sklearn-inference', action='store_true',
+                       help='Run pickled forests through scikit-learn instead of the vectorized forest engine')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Server processes sharing the port, rooms pinned to one worker each (default: 1). '
+                            'A connection is served by the worker of its first room; messages about rooms of '
+                            'other workers are rejected, so use one connection per room')
     parser.add_argument('--verbose', '-v', action='store_true',
                        help='Enable verbose logging')
     
     args = parser.parse_args()
     
-    # Set logging level
-    if args.verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
+    # Log through a background thread so the event loop never blocks on I/O;
+    # cluster workers send their records to the parent's writer thread
+    log_pipeline.configure_logging(
+        args.log_path or None,
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        json_lines=args.log_format == 'json',
+        max_bytes=int(args.log_max_mb * 1024 * 1024),
+        backup_count=args.log_backups,
+        log_queue=multiprocessing.get_context('fork').Queue(log_pipeline.DEFAULT_QUEUE_SIZE)
+        if args.workers > 1 else None
+    )
+    
+    # Batch mode: replay recordings through the prediction pipeline instead of serving
+    if args.score:
+        from offline_scoring import score_recordings
+        try:
+            score_recordings(
+                args.score, args.score_output,
+                models_dir=args.models_dir,
+                stride=args.stride,
+                jobs=args.jobs,
+                buffer_size=args.buffer_size,
+                min_samples=args.min_samples,
+                use_bundles=not args.no_bundles,
+                forest_engine=not args.sklearn_inference,
+                prediction_cache_size=args.prediction_cache_size,
+                prediction_cache_decimals=args.prediction_cache_decimals
+            )
+        except Exception as e:
+            logger.error(f"❌ Offline scoring failed: {e}")
+            sys.exit(1)
+        return
+    
+    # Bundle mode: precompile a pickled model set for fast startup instead of serving
+    if args.build_bundle:
+        from model_bundle import build_bundle
+        version = None if args.build_bundle == 'latest' else args.build_bundle
+        # A bundle replaces the pickles of its version, so every artifact must have loaded
+        model_set = load_model_set(Path(args.models_dir), version=version, strict=True, use_bundles=False)
+        if model_set is None:
+            logger.error(f"❌ No complete model set to bundle in {args.models_dir}")
+            sys.exit(1)
+        try:
+            bundle_path = build_bundle(model_set, Path(args.models_dir))
+        except Exception as e:
+            logger.error(f"❌ Building the bundle failed: {e}")
+            sys.exit(1)
+        logger.info(f"📦 Wrote bundle {bundle_path}")
+        return
+    
+    try:
+        devices = [parse_device_spec(spec) for spec in args.esp32]
+    except ValueError as e:
+        parser.error(f"--esp32: {e}")
+    try:
+        spatial_horizons = parse_horizons(args.spatial_horizons)
+    except ValueError as e:
+        parser.error(f"--spatial-horizons: {e}")
     
     # Print startup banner
     print("""
@@ -624,15 +1359,51 @@ def main():
     server = MLModelServer(
         models_dir=args.models_dir,
         host=args.host,
-        port=args.port
+        port=args.port,
+        max_sessions=args.max_sessions,
+        session_idle_timeout=args.session_idle_timeout,
+        executor_type=args.executor,
+        executor_workers=args.executor_workers,
+        max_batch_size=args.max_batch_size,
+        max_batch_wait=args.max_batch_wait / 1000.0,
+        buffer_size=args.buffer_size,
+        client_queue_size=args.client_queue_size,
+        slow_client_timeout=args.slow_client_timeout,
+        history_dir=args.history_dir or None,
+        history_retention_hours=args.history_retention_hours,
+        history_open_rooms=args.history_open_rooms,
+        metrics_port=args.metrics_port or None,
+        metrics_host=args.metrics_host,
+        profiling=args.profile,
+        log_summary_interval=args.log_summary_interval,
+        prediction_cache_size=args.prediction_cache_size,
+        prediction_cache_decimals=args.prediction_cache_decimals,
+        use_bundles=not args.no_bundles,
+        forest_engine=not args.sklearn_inference,
+        devices=devices,
+        device_stale_timeout=args.esp32_stale_timeout,
+        spatial_horizons=spatial_horizons,
+        spatial_update_interval=args.spatial_update_interval
     )
     
-    server.prediction_interval = args.prediction_interval
+    server.scheduler = AdaptiveScheduler(
+        interval=args.prediction_interval,
+        min_interval=args.min_prediction_interval,
+        max_staleness=args.max_staleness,
+        change_threshold=args.change_threshold,
+        activity_threshold=args.activity_threshold,
+        enabled=not args.fixed_schedule
+    )
     server.min_samples_for_prediction = args.min_samples
+    server.model_poll_interval = args.model_poll_interval
     
     try:
         # Start the server
-        asyncio.run(server.start_server())
+        if args.workers > 1:
+            from cluster import serve_cluster
+            serve_cluster(server, args.workers)
+        elif asyncio.run(server.start_server()) is False:
+            sys.exit(1)
     except KeyboardInterrupt:
         logger.info("🛑 Server stopped by user")
         print("\n✅ ML Model Server stopped gracefully")
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Model Bundles
+Precompiled, memory-mapped form of one trained_models/ timestamp set
+
+A bundle is a directory next to the pickles it was built from:
+    trained_models/bundle_<timestamp>/
+        manifest.json                 format, version, feature columns, models,
+                                      scalers and label encoders
+        <model>/<array>.npy           flattened tree nodes or linear coefficients
+        <model>.pkl                   models that cannot be flattened (fallback)
+        scaler_<name>/{mean,scale}.npy
+
+Loading a bundle memory-maps the arrays and rebuilds small NumPy predictors, so
+the server starts without unpickling estimators or importing scikit-learn or
+pandas. Forests and trees are evaluated by forest_engine, whose outputs are
+identical to the pickled models.
+
+Build one with:
+    python ml_model_server.py --build-bundle            (newest set)
+    python ml_model_server.py --build-bundle 20250812_185426
+"""
+
+import json
+import time
+import shutil
+import pickle
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+
+from forest_engine import CompiledForest, TREE_ARRAYS, flatten_trees, is_supported
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 2  # 2: forest arrays stored in their evaluation layout
+BUNDLE_PREFIX = 'bundle_'
+MANIFEST_NAME = 'manifest.json'
+
+
+class LinearModel:
+    """Linear regressor: X @ coef.T + intercept"""
+
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray, n_features: int):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.n_features_in_ = n_features
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.coef_.T + self.intercept_
+
+
+class BundledStandardScaler:
+    """StandardScaler parameters without scikit-learn"""
+
+    def __init__(self, mean: Optional[np.ndarray], scale: Optional[np.ndarray]):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.with_mean = mean is not None
+        self.with_std = scale is not None
+
+    def transform(self, X) -> np.ndarray:
+        X = np.array(X, dtype=np.float64)
+        if self.mean_ is not None:
+            X -= self.mean_
+        if self.scale_ is not None:
+            X /= self.scale_
+        return X
+
+
+class BundledLabelEncoder:
+    """LabelEncoder classes without scikit-learn"""
+
+    def __init__(self, classes: List[Any]):
+        self.classes_ = np.asarray(classes)
+
+    def inverse_transform(self, y) -> np.ndarray:
+        return self.classes_[np.asarray(y, dtype=np.int64)]
+
+    def __len__(self) -> int:
+        return len(self.classes_)
+
+
+def _export_model(name: str, model, directory: Path) -> Dict[str, Any]:
+    """Write one model into the bundle directory; returns its manifest entry"""
+    n_features = int(getattr(model, 'n_features_in_', 0))
+    if is_supported(model):
+        arrays, max_depth = flatten_trees(model)
+        (directory / name).mkdir()
+        for array_name, array in arrays.items():
+            np.save(directory / name / f'{array_name}.npy', array)
+        entry = {'kind': 'forest', 'max_depth': max_depth, 'trees': len(arrays['roots']),
+                 'nodes': len(arrays['feature']), 'n_features': n_features}
+        if hasattr(model, 'classes_'):
+            entry['task'] = 'classification'
+            entry['classes'] = np.asarray(model.classes_).tolist()
+        else:
+            entry['task'] = 'regression'
+        return entry
+
+    if type(model).__name__ in ('LinearRegression', 'Ridge', 'Lasso', 'ElasticNet'):
+        (directory / name).mkdir()
+        np.save(directory / name / 'coef.npy', np.asarray(model.coef_, dtype=np.float64))
+        np.save(directory / name / 'intercept.npy', np.asarray(model.intercept_, dtype=np.float64))
+        return {'kind': 'linear', 'task': 'regression', 'n_features': n_features}
+
+    with open(directory / f'{name}.pkl', 'wb') as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return {'kind': 'pickle', 'type': f'{type(model).__module__}.{type(model).__name__}'}
+
+
+def _export_scaler(name: str, scaler, directory: Path) -> Dict[str, Any]:
+    if type(scaler).__name__ == 'StandardScaler':
+        (directory / f'scaler_{name}').mkdir()
+        entry = {'kind': 'standard'}
+        for attribute, enabled, file_name in (('mean_', scaler.with_mean, 'mean'), ('scale_', scaler.with_std, 'scale')):
+            if enabled and getattr(scaler, attribute, None) is not None:
+                np.save(directory / f'scaler_{name}' / f'{file_name}.npy', np.asarray(getattr(scaler, attribute), dtype=np.float64))
+                entry[file_name] = True
+        return entry
+    with open(directory / f'scaler_{name}.pkl', 'wb') as f:
+        pickle.dump(scaler, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return {'kind': 'pickle'}
+
+
+def bundle_name(version: str) -> str:
+    return f'{BUNDLE_PREFIX}{version}'
+
+
+def build_bundle(model_set, output_dir: Path) -> Path:
+    """Write a loaded ModelSet as bundle_<version>/ under output_dir
+
+    The bundle is assembled in a temporary directory and renamed into place with
+    the manifest already written, so a reader never sees a partial bundle.
+    """
+    output_dir = Path(output_dir)
+    final = output_dir / bundle_name(model_set.version)
+    staging = output_dir / f'.{bundle_name(model_set.version)}.tmp'
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': model_set.version,
+        'created_at': time.time(),
+        'feature_columns': list(model_set.feature_columns),
+        'models': {name: _export_model(name, model, staging) for name, model in model_set.models.items()},
+        'scalers': {name: _export_scaler(name, scaler, staging) for name, scaler in model_set.scalers.items()},
+        'encoders': {name: np.asarray(encoder.classes_).tolist() for name, encoder in model_set.encoders.items()}
+    }
+    with open(staging / MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if final.exists():
+        shutil.rmtree(final)
+    staging.rename(final)
+    return final
+
+
+def scan_bundles(models_dir: Path) -> Dict[str, Path]:
+    """Finished bundle directories in models_dir by version"""
+    bundles = {}
+    for path in models_dir.glob(f'{BUNDLE_PREFIX}*'):
+        if path.is_dir() and (path / MANIFEST_NAME).exists():
+            bundles[path.name[len(BUNDLE_PREFIX):]] = path
+    return bundles
+
+
+def _load_array(path: Path, mmap: bool) -> np.ndarray:
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+
+def load_bundle(path: Path, mmap: bool = True) -> Dict[str, Any]:
+    """Models, scalers, encoders and feature columns of a bundle directory"""
+    path = Path(path)
+    with open(path / MANIFEST_NAME) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format {manifest.get('format')} in {path}, "
+                         f"rebuild it with --build-bundle")
+
+    models = {}
+    for name, entry in manifest['models'].items():
+        if entry['kind'] == 'forest':
+            arrays = {array_name: _load_array(path / name / f'{array_name}.npy', mmap) for array_name in TREE_ARRAYS}
+            classes = np.asarray(entry['classes']) if entry['task'] == 'classification' else None
+            models[name] = CompiledForest(entry['task'], arrays, entry['max_depth'], entry['n_features'], classes)
+        elif entry['kind'] == 'linear':
+            models[name] = LinearModel(_load_array(path / name / 'coef.npy', mmap),
+                                       _load_array(path / name / 'intercept.npy', mmap), entry['n_features'])
+        else:
+            with open(path / f'{name}.pkl', 'rb') as f:
+                models[name] = pickle.load(f)
+
+    scalers = {}
+    for name, entry in manifest['scalers'].items():
+        if entry['kind'] == 'standard':
+            directory = path / f'scaler_{name}'
+            scalers[name] = BundledStandardScaler(
+                _load_array(directory / 'mean.npy', mmap) if entry.get('mean') else None,
+                _load_array(directory / 'scale.npy', mmap) if entry.get('scale') else None
+            )
+        else:
+            with open(path / f'scaler_{name}.pkl', 'rb') as f:
+                scalers[name] = pickle.load(f)
+
+    return {
+        'version': manifest['version'],
+        'models': models,
+        'scalers': scalers,
+        'encoders': {name: BundledLabelEncoder(classes) for name, classes in manifest['encoders'].items()},
+        'feature_columns': manifest['feature_columns']
+    }
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Model Registry
+Discovery and loading of timestamped model artifact sets from trained_models/
+
+A model set is every artifact sharing one YYYYMMDD_HHMMSS timestamp:
+    <name>_model_<timestamp>.pkl        (one per model)
+    label_encoders_<timestamp>.pkl
+    feature_scalers_<timestamp>.pkl
+    feature_columns_<timestamp>.pkl
+
+A set may also have a precompiled bundle_<timestamp>/ directory (see
+model_bundle), which loads without unpickling and is preferred when present.
+
+ModelSet bundles the loaded artifacts with their compiled prediction plan so the
+server can swap a whole version in with a single attribute assignment.
+"""
+
+import re
+import time
+import pickle
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+import model_bundle
+from inference import PredictionPlan
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_PATTERN = re.compile(r'^\d{8}_\d{6}$')
+SUPPORT_ARTIFACTS = ('label_encoders', 'feature_scalers', 'feature_columns')
+
+
+def parse_timestamp(path: Path) -> Optional[str]:
+    """Timestamp (last two underscore-separated parts) of an artifact file name"""
+    parts = path.stem.split('_')
+    if len(parts) < 3:
+        return None
+    timestamp = parts[-2] + '_' + parts[-1]
+    return timestamp if TIMESTAMP_PATTERN.match(timestamp) else None
+
+
+def scan_artifacts(models_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Artifact files found in models_dir, grouped by timestamp"""
+    sets: Dict[str, Dict[str, Any]] = {}
+
+    for model_file in models_dir.glob("*_model_*.pkl"):
+        timestamp = parse_timestamp(model_file)
+        if timestamp is None:
+            continue
+        # Model name is everything before the timestamp
+        model_name = '_'.join(model_file.stem.split('_')[:-2])
+        sets.setdefault(timestamp, {'models': {}})['models'][model_name] = model_file
+
+    for kind in SUPPORT_ARTIFACTS:
+        for artifact_file in models_dir.glob(f"{kind}_*.pkl"):
+            timestamp = parse_timestamp(artifact_file)
+            if timestamp is not None:
+                sets.setdefault(timestamp, {'models': {}})[kind] = artifact_file
+
+    return sets
+
+
+def is_complete(artifacts: Dict[str, Any]) -> bool:
+    """Whether a timestamp group has models plus every supporting artifact"""
+    return bool(artifacts.get('models')) and all(kind in artifacts for kind in SUPPORT_ARTIFACTS)
+
+
+def artifact_signature(artifacts: Dict[str, Any]) -> Tuple:
+    """Sizes and modification times of a set's files, to tell when copying has finished"""
+    paths = sorted(artifacts['models'].values()) + [artifacts[kind] for kind in SUPPORT_ARTIFACTS if kind in artifacts]
+    signature = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            signature.append((str(path), stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append((str(path), None, None))
+    return tuple(signature)
+
+
+def bundle_signature(bundle_path: Path) -> Tuple:
+    """Signature of a bundle; its manifest is written last, when the bundle is complete"""
+    return artifact_signature({'models': {'manifest': bundle_path / model_bundle.MANIFEST_NAME}})
+
+
+def newest_complete_set(models_dir: Path, use_bundles: bool = True) -> Tuple[Optional[str], Tuple]:
+    """Timestamp and file signature of the newest complete artifact set or bundle"""
+    if not models_dir.exists():
+        return None, ()
+    sets = scan_artifacts(models_dir)
+    bundles = model_bundle.scan_bundles(models_dir) if use_bundles else {}
+    complete = [timestamp for timestamp, artifacts in sets.items() if is_complete(artifacts)] + list(bundles)
+    if not complete:
+        return None, ()
+    latest = max(complete)
+    if latest in bundles:
+        return latest, bundle_signature(bundles[latest])
+    return latest, artifact_signature(sets[latest])
+
+
+class ModelSet:
+    """One loaded version of the models with its encoders, scalers and feature columns"""
+
+    def __init__(self, version: Optional[str] = None, models: Optional[Dict[str, Any]] = None,
+                 encoders: Optional[Dict[str, Any]] = None, scalers: Optional[Dict[str, Any]] = None,
+                 feature_columns: Optional[List[str]] = None, compile_forests: bool = True):
+        self.version = version
+        self.models = models or {}
+        self.encoders = encoders or {}
+        self.scalers = scalers or {}
+        self.feature_columns = feature_columns or []
+        self.loaded_at = time.time()
+
+        # Precompute the pandas-free prediction path
+        self.prediction_plan = PredictionPlan(self.models, self.scalers, self.encoders, self.feature_columns,
+                                              compile_forests=compile_forests) if self.models else None
+
+    def validate(self):
+        """Dry-run prediction on a neutral feature vector; raises if any model fails"""
+        if self.prediction_plan is None:
+            raise ValueError("Model set has no models")
+        features = {col: 0.0 for col in self.feature_columns}
+        predictions = self.prediction_plan.predict([features])[0]
+        failed = {name: result['error'] for name, result in predictions.items() if 'error' in result}
+        if failed:
+            raise ValueError(f"Dry-run prediction failed: {failed}")
+        return predictions
+
+
+def _load_pickle(path: Path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def load_bundle_set(bundle_path: Path) -> Optional[ModelSet]:
+    """Load a precompiled bundle directory; None if it cannot be read"""
+    try:
+        start = time.perf_counter()
+        parts = model_bundle.load_bundle(bundle_path)
+        model_set = ModelSet(**parts)
+        logger.info(f"📦 Loaded bundle {bundle_path.name} in {(time.perf_counter() - start) * 1000:.1f}ms "
+                    f"({len(model_set.models)} models: {list(model_set.models.keys())})")
+        return model_set
+    except Exception as e:
+        logger.error(f"Failed to load bundle {bundle_path}: {e}")
+        return None
+
+
+def load_model_set(models_dir: Path, version: Optional[str] = None, strict: bool = False,
+                   use_bundles: bool = True, compile_forests: bool = True) -> Optional[ModelSet]:
+    """Load the artifact set with the given timestamp (default: the latest)
+
+    With strict=False missing or unreadable supporting artifacts and individual
+    models are logged and skipped. With strict=True (hot reloads) the set must be
+    complete and load without errors, otherwise None is returned.
+
+    If the version has a bundle (and use_bundles is set) the bundle is loaded
+    instead of the pickles; an unreadable bundle falls back to the pickles.
+    With compile_forests=False pickled forests run through scikit-learn itself.
+    """
+    try:
+        if not models_dir.exists():
+            logger.error(f"Models directory does not exist: {models_dir}")
+            return None
+
+        sets = scan_artifacts(models_dir)
+        bundles = model_bundle.scan_bundles(models_dir) if use_bundles else {}
+        target = version if version is not None else max(
+            [timestamp for timestamp, artifacts in sets.items() if artifacts['models']] + list(bundles), default=None)
+        if target in bundles:
+            model_set = load_bundle_set(bundles[target])
+            if model_set is not None or target not in sets:
+                return model_set
+            logger.warning(f"⚠️ Falling back to the pickled artifacts of {target}")
+
+        timestamps = [timestamp for timestamp, artifacts in sets.items() if artifacts['models']]
+
+        if not timestamps:
+            logger.error("No trained models found!")
+            logger.info("Please ensure you have trained models in the following format:")
+            logger.info("  - speaker_count_model_YYYYMMDD_HHMMSS.pkl")
+            logger.info("  - meeting_type_model_YYYYMMDD_HHMMSS.pkl")
+            logger.info("  - energy_level_model_YYYYMMDD_HHMMSS.pkl")
+            logger.info("  - engagement_score_model_YYYYMMDD_HHMMSS.pkl")
+            return None
+
+        if version is None:
+            version = max(timestamps)
+        elif version not in sets:
+            logger.error(f"No models found with timestamp: {version}")
+            return None
+
+        artifacts = sets[version]
+        if strict and not is_complete(artifacts):
+            logger.error(f"Model set {version} is incomplete")
+            return None
+
+        logger.info(f"Loading models with timestamp: {version}")
+        failures = 0
+
+        # Load models
+        models = {}
+        for model_name, model_file in sorted(artifacts['models'].items()):
+            try:
+                models[model_name] = _load_pickle(model_file)
+                logger.info(f"✓ Loaded {model_name} model")
+            except Exception as e:
+                failures += 1
+                logger.error(f"Failed to load model {model_file}: {e}")
+
+        # Load encoders, scalers and feature columns
+        loaded = {}
+        descriptions = {
+            'label_encoders': ('label encoders', 'encoders'),
+            'feature_scalers': ('feature scalers', 'scalers'),
+            'feature_columns': ('feature columns', 'features')
+        }
+        for kind, (description, unit) in descriptions.items():
+            if kind not in artifacts:
+                continue
+            try:
+                loaded[kind] = _load_pickle(artifacts[kind])
+                logger.info(f"✓ Loaded {description} ({len(loaded[kind])} {unit})")
+            except Exception as e:
+                failures += 1
+                logger.error(f"Failed to load {description}: {e}")
+
+        if not models:
+            logger.error("No models were successfully loaded!")
+            return None
+        if strict and failures:
+            logger.error(f"Model set {version} had {failures} artifacts that failed to load")
+            return None
+
+        model_set = ModelSet(
+            version=version,
+            models=models,
+            encoders=loaded.get('label_encoders', {}),
+            scalers=loaded.get('feature_scalers', {}),
+            feature_columns=loaded.get('feature_columns', []),
+            compile_forests=compile_forests
+        )
+
+        logger.info(f"✅ Successfully loaded {len(models)} models")
+        logger.info(f"📊 Available models: {list(models.keys())}")
+        return model_set
+
+    except Exception as e:
+        logger.error(f"Error loading models: {e}")
+        return None
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Offline Scoring
+Replay recorded sessions through the live server's feature and model pipeline
+
+Each recordings/<session_id>_audio.json file (a JSON list of audio samples, as
+written by the data collector and augmenter notebooks) is parsed incrementally
+and streamed sample by sample into a RoomSession. Every `stride` samples, once
+min_samples are buffered, the window is scored with the same feature
+extraction, make_predictions_batch and spatial analysis the WebSocket server
+uses, batch_windows windows at a time, so a worker's memory does not grow with
+the length of a recording. Sessions are spread across a process pool whose
+workers load the models once.
+
+Rows are only identical to the live server's predictions for the same buffer
+when it runs with --fixed-schedule and --prediction-cache-size 0. By default
+its adaptive scheduler may skip a run or reuse the last result, and its
+prediction cache predicts from features rounded to --prediction-cache-decimals.
+
+Usage:
+    python ml_model_server.py --score recordings/ --score-output scores.csv
+    python ml_model_server.py --score 'augmented_data/*_audio.json' --score-output scores.parquet --jobs 8
+"""
+
+import os
+import csv
+import json
+import glob
+import time
+import logging
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Iterable, Iterator
+
+import log_pipeline
+from audio_buffer import TIMESTAMP
+from ml_model_server import MLModelServer
+from model_registry import newest_complete_set
+from sessions import RoomSession, parse_audio_sample
+
+logger = logging.getLogger(__name__)
+
+RECORDING_SUFFIX = '_audio'
+DEFAULT_BATCH_WINDOWS = 256  # Windows whose features are held before they are scored
+READ_CHUNK_SIZE = 1 << 16
+
+# Model server owned by a scoring worker process
+_scoring_server = None
+
+
+def recording_paths(inputs: Iterable[str]) -> List[Path]:
+    """Recording files named by paths, directories (their *_audio.json) or glob patterns"""
+    paths = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.extend(sorted(path.glob(f"*{RECORDING_SUFFIX}.json")))
+        elif path.exists():
+            paths.append(path)
+        else:
+            paths.extend(Path(match) for match in sorted(glob.glob(item)))
+    return paths
+
+
+def session_id_from_path(path: Path) -> str:
+    """Session id of a recording file (file name without the _audio.json suffix)"""
+    stem = path.stem
+    return stem[:-len(RECORDING_SUFFIX)] if stem.endswith(RECORDING_SUFFIX) else stem
+
+
+def iter_json_array(path: Path, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """Items of a file holding one JSON array, parsed a chunk at a time"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buffer = ''
+        while not buffer:
+            chunk = f.read(chunk_size)
+            buffer = chunk.lstrip()
+            if not chunk:
+                break
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} does not hold a JSON array")
+        position = 1
+        eof = False
+        expect_item = True
+        items = 0
+        while True:
+            # Skip whitespace and separators, refilling the buffer as it runs out
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    if buffer[position] == ',':
+                        if expect_item:
+                            raise ValueError(f"Unexpected ',' in {path}")
+                        expect_item = True
+                    position += 1
+                if position < len(buffer) or eof:
+                    break
+                buffer, position = f.read(chunk_size), 0
+                eof = not buffer
+            if position >= len(buffer):
+                raise ValueError(f"{path} ends inside the JSON array")
+            if buffer[position] == ']':
+                if expect_item and items:
+                    raise ValueError(f"Trailing ',' in {path}")
+                return
+            if not expect_item:
+                raise ValueError(f"Missing ',' between items of {path}")
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                # A number cut by the end of the buffer may continue in the next chunk
+                complete = eof or (end < len(buffer) and buffer[end] in ' \t\r\n,]')
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                more = f.read(chunk_size)
+                eof = not more
+                buffer, position = buffer[position:] + more, 0
+                continue
+            yield item
+            items += 1
+            position = end
+            expect_item = False
+
+
+def flatten_prediction(predictions: Dict[str, Any], spatial_analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """One output row worth of columns for a window's predictions and spatial analysis"""
+    row = {}
+    for model_name, result in predictions.items():
+        if 'error' in result:
+            row[f'{model_name}_error'] = result['error']
+            continue
+        row[f'{model_name}_value'] = result['value']
+        row[f'{model_name}_confidence'] = result['confidence']
+        for label, probability in result.get('probabilities', {}).items():
+            row[f'{model_name}_p_{label}'] = probability
+    for key, value in spatial_analysis.items():
+        row[f'spatial_{key}'] = value
+    return row
+
+
+def score_windows(server: MLModelServer, windows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Output rows of a batch of windows, predicted together"""
+    predictions = server.make_predictions_batch([window.pop('features') for window in windows])
+    rows = []
+    for window, window_predictions in zip(windows, predictions):
+        spatial_analysis = window.pop('spatial_analysis')
+        rows.append({**window, **flatten_prediction(window_predictions, spatial_analysis)})
+    return rows
+
+
+def iter_recording_rows(server: MLModelServer, path: Path, stride: int,
+                        batch_windows: int = DEFAULT_BATCH_WINDOWS) -> Iterator[List[Dict[str, Any]]]:
+    """Per-window prediction rows of one recording, in batches of at most batch_windows"""
+    session_id = session_id_from_path(path)
+    session = RoomSession(session_id, buffer_size=server.sessions.buffer_size)
+
+    windows = []
+    window_count = 0
+    for index, data in enumerate(iter_json_array(path)):
+        sample = parse_audio_sample(data)
+        session.add_sample(sample, now=sample['timestamp'] / 1000)  # Spatial horizons in recorded time
+        if (index + 1) % stride:
+            continue
+        features = server.extract_features_from_buffer(session)
+        if not features:
+            continue
+        windows.append({
+            'session_id': session_id,
+            'window': window_count,
+            'sample_index': index,
+            'timestamp': session.audio_buffer.value(TIMESTAMP, -1),
+            'buffer_size': len(session.audio_buffer),
+            'model_version': server.model_version,
+            'features': features,
+            'spatial_analysis': server.get_spatial_analysis(session)
+        })
+        window_count += 1
+        if len(windows) >= batch_windows:
+            yield score_windows(server, windows)
+            windows = []
+
+    if windows:
+        yield score_windows(server, windows)
+
+
+def score_recording(server: MLModelServer, path: Path, stride: int,
+                    batch_windows: int = DEFAULT_BATCH_WINDOWS) -> List[Dict[str, Any]]:
+    """Per-window prediction rows of one recording"""
+    return [row for rows in iter_recording_rows(server, path, stride, batch_windows) for row in rows]
+
+
+def _init_scoring_worker(models_dir: str, version: str, buffer_size: int, min_samples: int,
+                         use_bundles: bool, forest_engine: bool, cache_size: int, cache_decimals: int):
+    """Load the models once in each scoring worker process"""
+    global _scoring_server
+    log_pipeline.detach_in_worker()
+    logging.getLogger().setLevel(logging.WARNING)
+    _scoring_server = MLModelServer(models_dir=models_dir, buffer_size=buffer_size, use_bundles=use_bundles,
+                                    forest_engine=forest_engine, prediction_cache_size=cache_size,
+                                    prediction_cache_decimals=cache_decimals)
+    _scoring_server.min_samples_for_prediction = min_samples
+    if not _scoring_server.load_models(version=version):
+        raise RuntimeError(f"Scoring worker could not load models {version} from {models_dir}")
+
+
+def _worker_score_recording(path: Path, stride: int, spool: Path) -> Path:
+    """Score one recording inside a scoring worker, spooling its rows to a JSON-lines file
+
+    Rows leave the worker a batch at a time instead of as one list per recording.
+    Errors replace the recording's rows with a single error row.
+    """
+    with open(spool, 'w') as f:
+        try:
+            for rows in iter_recording_rows(_scoring_server, path, stride):
+                f.writelines(json.dumps(row) + '\n' for row in rows)
+        except Exception as e:
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps({'session_id': session_id_from_path(path), 'error': f"{type(e).__name__}: {e}"}) + '\n')
+    return spool
+
+
+def read_spool(spool: Path) -> Iterator[Dict[str, Any]]:
+    """Rows of a worker's spool file, deleting it once read"""
+    try:
+        with open(spool) as f:
+            for line in f:
+                yield json.loads(line)
+    finally:
+        spool.unlink(missing_ok=True)
+
+
+def write_rows(rows_by_session: Iterable[Iterable[Dict[str, Any]]], output: Path) -> int:
+    """Write rows as CSV (streamed) or Parquet (by file suffix); returns the row count"""
+    if output.suffix.lower() == '.parquet':
+        import pandas as pd
+        rows = [row for session_rows in rows_by_session for row in session_rows]
+        pd.DataFrame(rows).to_parquet(output, index=False)
+        return len(rows)
+
+    count = 0
+    writer = None
+    held_errors = []
+    with open(output, 'w', newline='') as f:
+        for session_rows in rows_by_session:
+            for row in session_rows:
+                if writer is None:
+                    if 'error' in row:
+                        # Hold failed recordings until a scored window defines the columns
+                        held_errors.append(row)
+                        continue
+                    # Every window of one model set has the same columns
+                    writer = csv.DictWriter(f, fieldnames=list(row.keys()) + ['error'],
+                                            restval='', extrasaction='ignore')
+                    writer.writeheader()
+                    writer.writerows(held_errors)
+                writer.writerow(row)
+                count += 1
+
+        if writer is None and held_errors:
+            writer = csv.DictWriter(f, fieldnames=['session_id', 'error'])
+            writer.writeheader()
+            writer.writerows(held_errors)
+    return count + len(held_errors)
+
+
+def score_recordings(inputs: List[str], output: str, models_dir: str = './trained_models',
+                     stride: int = 5, jobs: Optional[int] = None, buffer_size: int = 150,
+                     min_samples: int = 10, version: Optional[str] = None, use_bundles: bool = True,
+                     forest_engine: bool = True, prediction_cache_size: int = 4096,
+                     prediction_cache_decimals: int = 4) -> Dict[str, Any]:
+    """Score every recording across a process pool and write per-window predictions
+
+    use_bundles, forest_engine and the prediction cache settings are passed to
+    each worker's MLModelServer, as with the server's --no-bundles,
+    --sklearn-inference and --prediction-cache-* options.
+    """
+    if stride < 1:
+        raise ValueError("stride must be at least 1")
+    paths = recording_paths(inputs)
+    if not paths:
+        raise FileNotFoundError(f"No recordings found in {inputs}")
+
+    # Pin every worker to the same model set
+    if version is None:
+        version, _ = newest_complete_set(Path(models_dir), use_bundles)
+    jobs = jobs or os.cpu_count() or 1
+    jobs = min(jobs, len(paths))
+
+    logger.info(f"🎞️ Scoring {len(paths)} recordings with models {version} on {jobs} processes "
+                f"(stride {stride} samples, buffer {buffer_size})")
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='scoring_') as spool_dir, \
+            ProcessPoolExecutor(max_workers=jobs, initializer=_init_scoring_worker,
+                                initargs=(models_dir, version, buffer_size, min_samples, use_bundles, forest_engine,
+                                          prediction_cache_size, prediction_cache_decimals)) as executor:
+        spools = [Path(spool_dir) / f'{index:06d}.jsonl' for index in range(len(paths))]
+        results = executor.map(_worker_score_recording, paths, [stride] * len(paths), spools)
+        row_count = write_rows((read_spool(spool) for spool in results), Path(output))
+    elapsed = time.perf_counter() - start
+
+    logger.info(f"✅ Wrote {row_count} windows from {len(paths)} recordings to {output} in {elapsed:.1f}s")
+    return {
+        'recordings': len(paths),
+        'windows': row_count,
+        'model_version': version,
+        'seconds': elapsed,
+        'output': str(output)
+    }
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Adaptive Prediction Scheduling
+Run model inference when a room's features change, not on a fixed timer
+
+Rooms are checked every min_interval seconds while audio arrives. Each check
+compares the current rolling features with the ones of the last model run:
+
+- a large jump (activity_threshold) runs inference straight away
+- at the regular prediction interval, a change of at least change_threshold
+  runs inference; a smaller change reuses the previous predictions
+- after max_staleness seconds inference runs regardless
+
+The distance is the mean relative change across features, where values with a
+magnitude below 1 are compared in absolute terms, so silence does not amplify
+noise into large relative changes.
+"""
+
+from typing import Dict, Any, Tuple, Optional
+
+import numpy as np
+
+RUN = 'run'
+REUSE = 'reuse'
+WAIT = 'wait'
+
+
+def feature_vector(features: Dict[str, float]) -> np.ndarray:
+    """Feature values in their dict order (the feature engine's fixed order)"""
+    return np.fromiter(features.values(), dtype=np.float64, count=len(features))
+
+
+def feature_distance(current: np.ndarray, previous: np.ndarray) -> float:
+    """Mean relative change between two feature vectors"""
+    if current.shape != previous.shape:
+        return float('inf')
+    scale = np.maximum(np.abs(previous), 1.0)
+    return float(np.mean(np.abs(current - previous) / scale))
+
+
+class AdaptiveScheduler:
+    """Decides per room whether a check runs inference, reuses the last result or waits"""
+
+    def __init__(self, interval: float = 5.0, min_interval: float = 1.0, max_staleness: float = 30.0,
+                 change_threshold: float = 0.03, activity_threshold: float = 0.08, enabled: bool = True):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_staleness = max_staleness
+        self.change_threshold = change_threshold
+        self.activity_threshold = activity_threshold
+        self.enabled = enabled
+
+    @property
+    def check_interval(self) -> float:
+        """Seconds between checks of a room that keeps sending audio"""
+        return min(self.min_interval, self.interval) if self.enabled else self.interval
+
+    def decide(self, vector: np.ndarray, now: float, last_vector: Optional[np.ndarray],
+               last_run: float, last_emit: float) -> Tuple[str, float]:
+        """Decision for one room check and the feature distance it was based on"""
+        if not self.enabled or last_vector is None:
+            return RUN, float('inf')
+
+        distance = feature_distance(vector, last_vector)
+        since_run = now - last_run
+        if distance >= self.activity_threshold and since_run >= self.min_interval:
+            return RUN, distance
+        if since_run >= self.max_staleness:
+            return RUN, distance
+        if now - last_emit < self.interval:
+            return WAIT, distance
+        if distance >= self.change_threshold:
+            return RUN, distance
+        return REUSE, distance
+
+    def describe(self) -> Dict[str, Any]:
+        """Settings for welcome and stats messages"""
+        return {
+            'adaptive': self.enabled,
+            'interval': self.interval,
+            'min_interval': self.min_interval,
+            'max_staleness': self.max_staleness,
+            'change_threshold': self.change_threshold,
+            'activity_threshold': self.activity_threshold
+        }
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Session Recorder
+Streams a data collector recording to disk as it arrives, with bounded memory
+
+While a session records, samples are appended to an append-only journal,
+recordings/<session_id>_audio.jsonl, one JSON object per line:
+    - add_sample() only puts the sample on a bounded queue, so the WebSocket
+      thread never waits on the disk
+    - a writer thread appends whatever is queued in batches and fsyncs the
+      journal every few seconds, so a crash loses at most that much audio
+    - labels live in labels/<session_id>_recording.json, rewritten atomically
+      whenever a label is added
+
+stop() finalizes the session into the layout the analysis notebook, the
+augmenter and offline scoring already read: recordings/<session_id>_audio.json
+(streamed from the journal, never held in memory), labels/<session_id>_labels.json
+and a row in labels/sessions_master.csv. After a crash, unfinished_sessions()
+lists the journals left behind and SessionRecorder.resume() continues one of
+them (a torn last line is cut off first).
+
+Usage:
+    python session_recorder.py --list              # unfinished sessions
+    python session_recorder.py --finalize ID       # save one as it is
+"""
+
+import os
+import csv
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = '_audio.jsonl'
+STATE_SUFFIX = '_recording.json'
+MASTER_CSV_NAME = 'sessions_master.csv'
+MASTER_CSV_FIELDS = ('session_id', 'start_time', 'duration_seconds', 'sample_count', 'speaker_count',
+                     'meeting_type', 'energy_level', 'background_noise', 'notes')
+
+DEFAULT_QUEUE_SIZE = 10000  # Samples waiting for the writer (about 80 minutes of ESP32 output)
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL = 0.5  # Seconds a sample may wait to be written
+DEFAULT_FSYNC_INTERVAL = 5.0  # Seconds between fsyncs of the journal
+
+_STOP = object()
+
+
+def _fsync_directory(path: Path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on every platform
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_json_atomic(path: Path, data: Any, indent: Optional[int] = 2):
+    """Replace a JSON file so readers (and a crash) see either the old or the new contents"""
+    temporary = path.with_name(f'.{path.name}.tmp')
+    with open(temporary, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    _fsync_directory(path.parent)
+
+
+def repair_journal(path: Path) -> int:
+    """Cut a torn or corrupt last line off a journal; returns the number of complete samples"""
+    count = 0
+    good_end = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                json.loads(line)
+            except ValueError:
+                break
+            count += 1
+            good_end += len(line)
+    if good_end != path.stat().st_size:
+        logger.warning(f"⚠️ Dropping {path.stat().st_size - good_end} bytes of an interrupted write from {path.name}")
+        with open(path, 'r+b') as f:
+            f.truncate(good_end)
+            os.fsync(f.fileno())
+    return count
+
+
+def write_recording_json(journal: Path, output: Path):
+    """Stream a journal into the collector's <session_id>_audio.json (same formatting as json.dump(indent=2))"""
+    temporary = output.with_name(f'.{output.name}.tmp')
+    with open(journal, 'r') as source, open(temporary, 'w') as f:
+        f.write('[')
+        first = True
+        for line in source:
+            sample = json.dumps(json.loads(line), indent=2).replace('\n', '\n  ')
+            f.write(('\n  ' if first else ',\n  ') + sample)
+            first = False
+        f.write('\n]' if not first else ']')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, output)
+    _fsync_directory(output.parent)
+
+
+def append_master_csv(path: Path, labels: Dict[str, Any]):
+    """Add a session's summary row to sessions_master.csv, keeping the file's existing columns"""
+    summary = {
+        'session_id': labels['session_id'],
+        'start_time': labels.get('start_time', ''),
+        'duration_seconds': labels.get('duration_seconds', 0),
+        'sample_count': labels.get('sample_count', 0),
+        'speaker_count': labels.get('speaker_count', 'unknown'),
+        'meeting_type': labels.get('meeting_type', 'unknown'),
+        'energy_level': labels.get('energy_level', 'unknown'),
+        'background_noise': labels.get('background_noise', 'unknown'),
+        'notes': labels.get('notes', '')
+    }
+    fieldnames = list(MASTER_CSV_FIELDS)
+    exists = path.exists() and path.stat().st_size > 0
+    if exists:
+        with open(path, newline='') as f:
+            fieldnames = next(csv.reader(f), fieldnames)
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval='', extrasaction='ignore')
+        if not exists:
+            writer.writeheader()
+        writer.writerow(summary)
+
+
+def unfinished_sessions(data_dir: str = './') -> List[str]:
+    """Session ids whose journal was never finalized (the collector stopped or crashed mid-session)"""
+    recordings_dir = Path(data_dir) / 'recordings'
+    return sorted(path.name[:-len(JOURNAL_SUFFIX)] for path in recordings_dir.glob(f'*{JOURNAL_SUFFIX}'))
+
+
+class SessionRecorder:
+    """Journal of one recording session, written by a background thread"""
+
+    def __init__(self, session_id: str, labels: Dict[str, Any], start_timestamp: float,
+                 data_dir: str = './', sample_count: int = 0, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 fsync_interval: float = DEFAULT_FSYNC_INTERVAL):
+        self.session_id = session_id
+        self.labels = labels
+        self.start_timestamp = start_timestamp
+        self.recordings_dir = Path(data_dir) / 'recordings'
+        self.labels_dir = Path(data_dir) / 'labels'
+        self.journal_path = self.recordings_dir / f'{session_id}{JOURNAL_SUFFIX}'
+        self.state_path = self.labels_dir / f'{session_id}{STATE_SUFFIX}'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.journal = open(self.journal_path, 'a')
+        self._thread = threading.Thread(target=self._run, name=f'recorder-{session_id}', daemon=True)
+        self._stopped = False
+
+        # Statistics
+        self.samples_written = sample_count
+        self.samples_dropped = 0
+        self.batches_written = 0
+        self.fsyncs = 0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+
+        self._thread.start()
+
+    @classmethod
+    def start(cls, data_dir: str = './', session_id: Optional[str] = None,
+              labels: Optional[Dict[str, Any]] = None, **options) -> 'SessionRecorder':
+        """Begin a new session (meeting_<date>_<time> unless given an id)"""
+        (Path(data_dir) / 'recordings').mkdir(parents=True, exist_ok=True)
+        (Path(data_dir) / 'labels').mkdir(parents=True, exist_ok=True)
+        session_id = session_id or f"meeting_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        start_timestamp = time.time()
+        session_labels = {'session_id': session_id, 'start_time': datetime.now().isoformat(), **(labels or {})}
+        write_json_atomic(Path(data_dir) / 'labels' / f'{session_id}{STATE_SUFFIX}',
+                          {'labels': session_labels, 'start_timestamp': start_timestamp})
+        recorder = cls(session_id, session_labels, start_timestamp, data_dir=data_dir, **options)
+        logger.info(f"🔴 Recording {session_id} to {recorder.journal_path}")
+        return recorder
+
+    @classmethod
+    def resume(cls, session_id: str, data_dir: str = './', **options) -> 'SessionRecorder':
+        """Continue an unfinished session after a crash or restart"""
+        journal_path = Path(data_dir) / 'recordings' / f'{session_id}{JOURNAL_SUFFIX}'
+        if not journal_path.exists():
+            raise FileNotFoundError(f"No unfinished session {session_id} in {data_dir}")
+        state_path = Path(data_dir) / 'labels' / f'{session_id}{STATE_SUFFIX}'
+        if state_path.exists():
+            with open(state_path) as f:
+                state = json.load(f)
+        else:
+            state = {'labels': {'session_id': session_id}, 'start_timestamp': journal_path.stat().st_ctime}
+        sample_count = repair_journal(journal_path)
+        recorder = cls(session_id, state['labels'], state['start_timestamp'], data_dir=data_dir,
+                       sample_count=sample_count, **options)
+        recorder.labels['resumed_count'] = recorder.labels.get('resumed_count', 0) + 1
+        recorder._save_state()
+        logger.info(f"🔁 Resumed {session_id} with {sample_count} samples already recorded")
+        return recorder
+
+    @property
+    def sample_count(self) -> int:
+        """Samples recorded so far, including those still queued"""
+        return self.samples_written + self.queue.qsize()
+
+    @property
+    def duration(self) -> float:
+        return time.time() - self.start_timestamp
+
+    def add_sample(self, data: Dict[str, Any]) -> bool:
+        """Queue a sample for the journal without blocking; False if it had to be dropped"""
+        if self._stopped:
+            return False
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except queue.Full:
+            self.samples_dropped += 1
+            if self.samples_dropped == 1 or self.samples_dropped % 1000 == 0:
+                logger.warning(f"⚠️ Recorder queue full, dropped {self.samples_dropped} samples of {self.session_id}")
+            return False
+
+    def add_label(self, key: str, value: Any):
+        self.labels[key] = value
+        self._save_state()
+
+    def _save_state(self):
+        write_json_atomic(self.state_path, {'labels': self.labels, 'start_timestamp': self.start_timestamp})
+
+    def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        try:
+            self.journal.write(''.join(json.dumps(sample) + '\n' for sample in batch))
+            self.journal.flush()
+        except (OSError, TypeError, ValueError) as e:
+            self.write_errors += 1
+            self.last_error = str(e)
+            logger.error(f"Error writing {self.journal_path.name}: {e}")
+            return False
+        self.samples_written += len(batch)
+        self.batches_written += 1
+        return True
+
+    def _sync(self):
+        try:
+            os.fsync(self.journal.fileno())
+            self.fsyncs += 1
+        except OSError as e:
+            self.write_errors += 1
+            self.last_error = str(e)
+            logger.error(f"Error syncing {self.journal_path.name}: {e}")
+
+    def _run(self):
+        """Writer thread: batch queued samples into the journal, fsync periodically"""
+        batch: List[Dict[str, Any]] = []
+        write_due: Optional[float] = None
+        unsynced = False
+        last_sync = time.monotonic()
+        stopping = False
+        while True:
+            now = time.monotonic()
+            if batch and (stopping or len(batch) >= self.batch_size or now >= write_due):
+                if self._write(batch):
+                    batch = []
+                    write_due = None
+                    unsynced = True
+                elif not stopping:
+                    time.sleep(self.flush_interval)  # Keep the batch (and stop reading) until the disk recovers
+                    continue
+            if unsynced and (stopping or now - last_sync >= self.fsync_interval):
+                self._sync()
+                unsynced = False
+                last_sync = now
+            if stopping:
+                return
+
+            # Wait for the next sample, but no longer than the next write or fsync is due
+            deadlines = [due for due in (write_due, last_sync + self.fsync_interval if unsynced else None)
+                         if due is not None]
+            timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                stopping = True
+                continue
+            batch.append(item)
+            if write_due is None:
+                write_due = time.monotonic() + self.flush_interval
+            # Take whatever else is already queued without waiting
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+    def close(self):
+        """Write everything queued, fsync and stop the writer; the journal stays unfinished"""
+        if self._stopped:
+            return
+        self._stopped = True
+        self.queue.put(_STOP)
+        self._thread.join()
+        self.journal.close()
+
+    def stop(self) -> Optional[Dict[str, str]]:
+        """Finalize the session into the collector's file layout; None (and nothing kept) if empty"""
+        self.close()
+        if self.samples_written == 0:
+            self.journal_path.unlink(missing_ok=True)
+            self.state_path.unlink(missing_ok=True)
+            logger.info(f"🗑️ {self.session_id} recorded no samples, nothing saved")
+            return None
+        return finalize_session(self.session_id, self.labels_dir.parent, self.labels, self.start_timestamp,
+                                self.samples_written)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'samples_written': self.samples_written,
+            'samples_queued': self.queue.qsize(),
+            'samples_dropped': self.samples_dropped,
+            'batches_written': self.batches_written,
+            'fsyncs': self.fsyncs,
+            'write_errors': self.write_errors,
+            'last_error': self.last_error
+        }
+
+
+def finalize_session(session_id: str, data_dir: Path, labels: Optional[Dict[str, Any]] = None,
+                     start_timestamp: Optional[float] = None, sample_count: Optional[int] = None) -> Dict[str, str]:
+    """Turn a journal into <id>_audio.json, <id>_labels.json and a sessions_master.csv row"""
+    data_dir = Path(data_dir)
+    journal_path = data_dir / 'recordings' / f'{session_id}{JOURNAL_SUFFIX}'
+    state_path = data_dir / 'labels' / f'{session_id}{STATE_SUFFIX}'
+    if labels is None:
+        state = {}
+        if state_path.exists():
+            with open(state_path) as f:
+                state = json.load(f)
+        labels = state.get('labels', {'session_id': session_id})
+        start_timestamp = state.get('start_timestamp', journal_path.stat().st_ctime)
+    if sample_count is None:
+        sample_count = repair_journal(journal_path)
+
+    audio_path = data_dir / 'recordings' / f'{session_id}_audio.json'
+    labels_path = data_dir / 'labels' / f'{session_id}_labels.json'
+    write_recording_json(journal_path, audio_path)
+
+    labels = dict(labels)
+    labels['end_time'] = datetime.now().isoformat()
+    labels['duration_seconds'] = time.time() - start_timestamp
+    labels['sample_count'] = sample_count
+    write_json_atomic(labels_path, labels)
+    append_master_csv(data_dir / 'labels' / MASTER_CSV_NAME, labels)
+
+    # The journal goes last: until then a crash leaves the session resumable
+    journal_path.unlink()
+    state_path.unlink(missing_ok=True)
+    logger.info(f"💾 Saved {session_id}: {sample_count} samples to {audio_path}")
+    return {'audio': str(audio_path), 'labels': str(labels_path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming session recorder utilities')
+    parser.add_argument('--data-dir', default='./',
+                        help='Directory with recordings/ and labels/ (default: ./)')
+    parser.add_argument('--list', action='store_true',
+                        help='List sessions that were never finalized')
+    parser.add_argument('--finalize', metavar='SESSION_ID', action='append', default=[],
+                        help='Save an unfinished session as it is (repeatable)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.list:
+        for session_id in unfinished_sessions(args.data_dir):
+            print(session_id)
+    elif args.finalize:
+        for session_id in args.finalize:
+            finalize_session(session_id, Path(args.data_dir))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Room Session Management
+Per-room audio state for the ML Model Server so several devices can share one process
+
+Each room (one ESP32 / browser relay) gets its own buffer, rolling feature state,
+spatial tracker, prediction timer and prediction history. Sessions are bounded in size, evicted
+after a period of inactivity, and the least recently used room is dropped when
+the session limit is reached.
+"""
+
+import time
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, List, Sequence
+
+from feature_engine import RollingFeatureEngine
+from spatial_tracker import SpatialTracker, DEFAULT_HORIZONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOM = 'default'
+MAX_ROOM_ID_LENGTH = 64
+
+
+def normalize_room_id(room) -> str:
+    """Validate a room key from the protocol, falling back to the default room"""
+    if room is None or room == '':
+        return DEFAULT_ROOM
+    room_id = str(room)
+    if len(room_id) > MAX_ROOM_ID_LENGTH:
+        raise ValueError(f"Room id longer than {MAX_ROOM_ID_LENGTH} characters")
+    return room_id
+
+
+def parse_audio_sample(data: Dict[str, Any]) -> Dict[str, float]:
+    """Audio sample of an audio_data message (or recorded sample), with protocol defaults"""
+    return {
+        'leftMic': float(data.get('leftMic', 0)),
+        'rightMic': float(data.get('rightMic', 0)),
+        'difference': float(data.get('difference', 0)),
+        'averageLevel': float(data.get('averageLevel', 0)),
+        'timestamp': float(data.get('timestamp', time.time() * 1000))
+    }
+
+
+class RoomSession:
+    """Audio buffer, feature state and prediction timer of a single room"""
+
+    def __init__(self, room_id: str, buffer_size: int = 150, history_size: int = 100,
+                 spatial_horizons: Sequence[float] = DEFAULT_HORIZONS):
+        self.room_id = room_id
+        self.feature_engine = RollingFeatureEngine(capacity=buffer_size)
+        self.audio_buffer = self.feature_engine.buffer  # Shared ring buffer of raw samples
+        self.spatial = SpatialTracker(spatial_horizons)  # Left/right statistics over time horizons
+        self.prediction_history = deque(maxlen=history_size)
+
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+        self.last_prediction_time = 0  # Last ml_predictions sent (fresh or reused)
+        self.last_check_time = 0
+        self.prediction_task = None  # At most one in-flight prediction per room
+        self.prediction_pending = False  # Set when a request arrives during inference
+        self.prediction_forced = False  # Next run skips the scheduler (request_prediction)
+        self.samples_processed = 0
+        self.predictions_made = 0
+        self.last_spatial_update = 0  # Last spatial_update message sent
+
+        # Last model run, reused while the features barely change
+        self.last_inference_time = 0
+        self.last_feature_vector = None
+        self.last_predictions = None
+        self.last_model_version = None
+
+    def add_sample(self, audio_sample: Dict[str, float], now: Optional[float] = None):
+        """Append one audio sample to the room buffer, feature state and spatial tracker
+
+        now is the sample's time for the spatial horizons (default: arrival time);
+        replays pass the recorded time instead.
+        """
+        self.feature_engine.append(
+            audio_sample['averageLevel'], audio_sample['difference'], audio_sample['timestamp'],
+            audio_sample.get('leftMic', 0.0), audio_sample.get('rightMic', 0.0)
+        )
+        self.last_activity = time.time()
+        self.spatial.update(audio_sample['difference'], self.last_activity if now is None else now)
+        self.samples_processed += 1
+
+    def add_records(self, records):
+        """Append samples decoded from a binary frame (structured NumPy records)"""
+        differences = records['difference'].tolist()
+        self.feature_engine.extend(
+            records['averageLevel'].tolist(), differences, records['timestamp'].tolist(),
+            records['leftMic'].tolist(), records['rightMic'].tolist()
+        )
+        self.last_activity = time.time()
+        self.spatial.extend(differences, self.last_activity)
+        self.samples_processed += len(records)
+
+    def summary(self) -> Dict[str, Any]:
+        """Lightweight description of the session for stats messages"""
+        return {
+            'room': self.room_id,
+            'buffer_size': len(self.audio_buffer),
+            'samples_processed': self.samples_processed,
+            'predictions_made': self.predictions_made,
+            'idle_seconds': time.time() - self.last_activity
+        }
+
+
+class SessionManager:
+    """Bounded registry of room sessions with idle and LRU eviction"""
+
+    def __init__(self, max_sessions: int = 1000, idle_timeout: float = 600.0,
+                 buffer_size: int = 150, history_size: int = 100,
+                 spatial_horizons: Sequence[float] = DEFAULT_HORIZONS):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.buffer_size = buffer_size
+        self.history_size = history_size
+        self.spatial_horizons = tuple(spatial_horizons)
+
+        self._sessions: "OrderedDict[str, RoomSession]" = OrderedDict()
+        self.sessions_created = 0
+        self.sessions_evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self._sessions
+
+    def get(self, room_id: str) -> Optional[RoomSession]:
+        """Existing session for a room, or None"""
+        return self._sessions.get(room_id)
+
+    def get_or_create(self, room_id: str) -> RoomSession:
+        """Session for a room, creating it (and evicting the LRU room if full)"""
+        session = self._sessions.get(room_id)
+        if session is not None:
+            self._sessions.move_to_end(room_id)
+            return session
+
+        while len(self._sessions) >= self.max_sessions:
+            evicted_id, _ = self._sessions.popitem(last=False)
+            self.sessions_evicted += 1
+            logger.info(f"♻️ Session limit reached, evicted room: {evicted_id}")
+
+        session = RoomSession(room_id, buffer_size=self.buffer_size, history_size=self.history_size,
+                              spatial_horizons=self.spatial_horizons)
+        self._sessions[room_id] = session
+        self.sessions_created += 1
+        logger.info(f"🏠 Created session for room: {room_id} (Active: {len(self._sessions)})")
+        return session
+
+    def remove(self, room_id: str) -> Optional[RoomSession]:
+        """Drop a room's session"""
+        return self._sessions.pop(room_id, None)
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Remove sessions that have not received samples within idle_timeout"""
+        now = time.time() if now is None else now
+        # Sessions are kept in last-use order, so idle ones are at the front
+        evicted = []
+        for room_id, session in list(self._sessions.items()):
+            if now - session.last_activity < self.idle_timeout:
+                break
+            del self._sessions[room_id]
+            evicted.append(room_id)
+
+        if evicted:
+            self.sessions_evicted += len(evicted)
+            logger.info(f"♻️ Evicted {len(evicted)} idle sessions (Active: {len(self._sessions)})")
+        return evicted
+
+    def sessions(self) -> List[RoomSession]:
+        """All active sessions, least recently used first"""
+        return list(self._sessions.values())
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per-session summaries for stats messages"""
+        return [session.summary() for session in self._sessions.values()]
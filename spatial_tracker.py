@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Spatial Tracking
+Incremental left/right/center statistics of a room over several time horizons
+
+Every sample's microphone difference (dB, left minus right) is added to one
+window per horizon (by default the last 10 s, 30 s and 5 min). Each window
+keeps running counts of left (> 2 dB), right (< -2 dB) and centered samples,
+the sum and sum of squares of the difference and the number of speaker
+switches (sign changes above 1 dB), so an update or a snapshot costs O(1)
+amortized regardless of the horizon length. Running sums are recomputed from
+the window now and then so float error cannot build up.
+
+The server pushes the snapshots of all horizons as lightweight spatial_update
+messages whenever samples arrive (rate-limited per room), and uses the middle
+horizon for the spatial_analysis field of ml_predictions.
+"""
+
+import math
+import time
+from datetime import datetime
+from collections import deque
+from typing import Dict, Any, Optional, Sequence, List
+
+DEFAULT_HORIZONS = (10.0, 30.0, 300.0)
+DEFAULT_UPDATE_INTERVAL = 0.5  # Minimum seconds between spatial_update messages of a room
+DOMINANCE_THRESHOLD = 2.0  # dB difference for a sample to count as left or right
+SWITCH_THRESHOLD = 1.0  # dB a sign change must exceed to count as a speaker switch
+MIN_SAMPLES = 5
+RESUM_INTERVAL = 100000  # Updates between exact recomputations of the running sums
+UNIT_SECONDS = {'s': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+def horizon_name(seconds: float) -> str:
+    return f"{seconds:g}s"
+
+
+def parse_horizons(spec: str) -> List[float]:
+    """Horizon lengths in seconds of a comma-separated list such as 10,30s,5m"""
+    horizons = []
+    for part in spec.split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        unit = UNIT_SECONDS.get(part[-1])
+        seconds = float(part[:-1]) * unit if unit else float(part)
+        if not seconds > 0:
+            raise ValueError(f"Spatial horizons must be positive: {part!r}")
+        horizons.append(seconds)
+    if not horizons:
+        raise ValueError("At least one spatial horizon is required")
+    return horizons
+
+
+def neutral_snapshot(samples: int = 0) -> Dict[str, Any]:
+    """Spatial state reported before a window has enough samples"""
+    return {
+        'dominant_side': 'center',
+        'left_dominance_pct': 0.0,
+        'right_dominance_pct': 0.0,
+        'center_pct': 100.0,
+        'average_bias': 0.0,
+        'spatial_activity': 0.0,
+        'speaker_switches': 0,
+        'samples': samples
+    }
+
+
+class HorizonWindow:
+    """Running statistics of the samples received in the last `seconds`"""
+
+    __slots__ = ('seconds', 'entries', 'left', 'right', 'total', 'total_squares', 'switches', 'updates')
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.entries = deque()  # (time, difference, switch flag)
+        self.left = 0
+        self.right = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.switches = 0  # Switch flags of every entry, including the oldest
+        self.updates = 0
+
+    def add(self, entry):
+        _, difference, switch = entry
+        self.entries.append(entry)
+        self.left += difference > DOMINANCE_THRESHOLD
+        self.right += difference < -DOMINANCE_THRESHOLD
+        self.total += difference
+        self.total_squares += difference * difference
+        self.switches += switch
+        self.updates += 1
+        if self.updates >= RESUM_INTERVAL:
+            self._resum()
+
+    def expire(self, now: float):
+        """Drop samples that fell out of the horizon"""
+        cutoff = now - self.seconds
+        entries = self.entries
+        while entries and entries[0][0] < cutoff:
+            _, difference, switch = entries.popleft()
+            self.left -= difference > DOMINANCE_THRESHOLD
+            self.right -= difference < -DOMINANCE_THRESHOLD
+            self.total -= difference
+            self.total_squares -= difference * difference
+            self.switches -= switch
+        if not entries:
+            self.total = self.total_squares = 0.0
+
+    def _resum(self):
+        self.total = math.fsum(difference for _, difference, _ in self.entries)
+        self.total_squares = math.fsum(difference * difference for _, difference, _ in self.entries)
+        self.updates = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Same fields as the spatial_analysis of ml_predictions, plus the sample count"""
+        count = len(self.entries)
+        if count < MIN_SAMPLES:
+            return neutral_snapshot(count)
+
+        center = count - self.left - self.right
+        if self.left > self.right and self.left > center:
+            dominant_side = 'left'
+        elif self.right > self.left and self.right > center:
+            dominant_side = 'right'
+        else:
+            dominant_side = 'center'
+
+        mean = self.total / count
+        variance = max(self.total_squares / count - mean * mean, 0.0)
+        return {
+            'dominant_side': dominant_side,
+            'left_dominance_pct': self.left / count * 100,
+            'right_dominance_pct': self.right / count * 100,
+            'center_pct': center / count * 100,
+            'average_bias': mean,
+            'spatial_activity': math.sqrt(variance),
+            # The oldest sample's switch was relative to one that already left the window
+            'speaker_switches': self.switches - self.entries[0][2],
+            'samples': count
+        }
+
+
+class SpatialTracker:
+    """Spatial statistics of one room over several horizons, updated per sample"""
+
+    def __init__(self, horizons: Sequence[float] = DEFAULT_HORIZONS):
+        if not horizons:
+            raise ValueError("At least one spatial horizon is required")
+        self.windows = {horizon_name(seconds): HorizonWindow(seconds) for seconds in sorted(horizons)}
+        names = list(self.windows)
+        self.primary = names[len(names) // 2]  # Horizon used for ml_predictions' spatial_analysis
+        self.last_sign = 0
+        self.samples = 0
+
+    def update(self, difference: float, now: Optional[float] = None):
+        """Add one sample's microphone difference"""
+        now = time.time() if now is None else now
+        difference = float(difference)
+        sign = (difference > 0) - (difference < 0)
+        switch = self.samples > 0 and sign != self.last_sign and abs(difference) > SWITCH_THRESHOLD
+        self.last_sign = sign
+        self.samples += 1
+
+        entry = (now, difference, int(switch))
+        for window in self.windows.values():
+            window.add(entry)
+            window.expire(now)
+
+    def extend(self, differences, now: Optional[float] = None):
+        """Add several samples received together"""
+        now = time.time() if now is None else now
+        for difference in differences:
+            self.update(difference, now)
+
+    def snapshot(self, name: Optional[str] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        """Statistics of one horizon (default: the primary one)"""
+        window = self.windows[name or self.primary]
+        window.expire(time.time() if now is None else now)
+        return window.snapshot()
+
+    def snapshots(self, now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Statistics of every horizon"""
+        now = time.time() if now is None else now
+        return {name: self.snapshot(name, now) for name in self.windows}
+
+
+def spatial_update_message(room_id: str, tracker: SpatialTracker, now: Optional[float] = None) -> Dict[str, Any]:
+    """spatial_update message with every horizon of a room, rounded to keep it small"""
+    now = time.time() if now is None else now
+    horizons = {
+        name: {key: round(value, 3) if isinstance(value, float) else value for key, value in snapshot.items()}
+        for name, snapshot in tracker.snapshots(now).items()
+    }
+    return {
+        'type': 'spatial_update',
+        'room': room_id,
+        'timestamp': datetime.fromtimestamp(now).isoformat(),
+        'primary': tracker.primary,
+        'horizons': horizons
+    }
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Prediction Subscriptions
+Per-client filtering and delta encoding of ml_predictions broadcasts
+
+A client sends a `subscribe` message to pick the models and message fields it
+wants, optionally in delta mode:
+
+    {"type": "subscribe", "rooms": ["room-a"], "models": ["meeting_type_model"],
+     "fields": ["predictions.value", "predictions.confidence", "spatial_analysis"],
+     "delta": true, "epsilon": 0.01}
+
+`fields` names top-level message fields; `predictions.<key>` keeps only those
+keys of every prediction (e.g. drops the class probabilities). The header
+fields type, room, timestamp and model_version are always sent.
+
+Clients with the same subscription shape (models, fields, delta, epsilon) share
+one serialized frame per broadcast. In delta mode each (room, shape) keeps the
+values last sent; a frame carries only values that moved by more than epsilon
+since then. A client that missed a frame (new, re-subscribed, or its outbox
+dropped something) gets a keyframe with the full state instead, so every
+client's view stays within epsilon of the real values. Frames carry a `seq`
+that increases by one per broadcast of the room.
+
+Room subscribers also receive spatial_update messages (see spatial_tracker)
+between predictions unless they subscribe with "spatial_updates": false.
+"""
+
+import json
+from typing import Dict, Any, Optional, List, Tuple, FrozenSet
+
+HEADER_FIELDS = ('type', 'room', 'timestamp', 'model_version')
+PREDICTION_FIELD_PREFIX = 'predictions.'
+MAX_FILTER_ENTRIES = 64
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def diff_values(new: Dict[str, Any], old: Dict[str, Any], epsilon: float) -> Optional[Dict[str, Any]]:
+    """Nested dict of the values in `new` that differ from `old`
+
+    Numbers count as changed when they moved by more than epsilon. Returns None
+    when the key structure differs, which needs a keyframe rather than a delta.
+    """
+    if new.keys() != old.keys():
+        return None
+    changes = {}
+    for key, value in new.items():
+        previous = old[key]
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff_values(value, previous, epsilon)
+            if nested is None:
+                return None
+            if nested:
+                changes[key] = nested
+        elif _is_number(value) and _is_number(previous):
+            if abs(value - previous) > epsilon or (value != value) != (previous != previous):
+                changes[key] = value
+        elif value != previous:
+            changes[key] = value
+    return changes
+
+
+def merge_values(base: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of base with a diff_values() result applied"""
+    merged = dict(base)
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_values(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class Subscription:
+    """What one client wants from a room's ml_predictions messages"""
+
+    def __init__(self, models: Optional[FrozenSet[str]] = None, fields: Optional[FrozenSet[str]] = None,
+                 delta: bool = False, epsilon: float = 0.0, spatial_updates: bool = True):
+        self.models = models
+        self.fields = fields
+        self.delta = delta
+        self.epsilon = epsilon
+        self.spatial_updates = spatial_updates
+
+        # predictions.<key> entries narrow each prediction; a bare field keeps it whole
+        self.top_fields = None
+        self.prediction_keys = None
+        if fields is not None:
+            self.top_fields = {field for field in fields if not field.startswith(PREDICTION_FIELD_PREFIX)}
+            keys = {field[len(PREDICTION_FIELD_PREFIX):] for field in fields
+                    if field.startswith(PREDICTION_FIELD_PREFIX)}
+            if keys:
+                self.top_fields.add('predictions')
+                self.prediction_keys = keys
+            self.top_fields.update(HEADER_FIELDS)
+
+    @classmethod
+    def from_message(cls, data: Dict[str, Any]) -> 'Subscription':
+        """Parse a subscribe message; raises ValueError on malformed options"""
+        def names(key: str) -> Optional[FrozenSet[str]]:
+            value = data.get(key)
+            if value is None:
+                return None
+            if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+                raise ValueError(f"'{key}' must be a list of strings")
+            if len(value) > MAX_FILTER_ENTRIES:
+                raise ValueError(f"At most {MAX_FILTER_ENTRIES} entries in '{key}'")
+            return frozenset(value)
+
+        names('rooms')  # Rooms are routed by the server, but malformed lists are rejected here
+        epsilon = float(data.get('epsilon', 0.0))
+        if not epsilon >= 0:
+            raise ValueError("'epsilon' must be a non-negative number")
+        return cls(models=names('models'), fields=names('fields'),
+                   delta=bool(data.get('delta', False)), epsilon=epsilon,
+                   spatial_updates=bool(data.get('spatial_updates', True)))
+
+    @property
+    def shape(self) -> Tuple:
+        """Key shared by subscriptions that receive identical frames"""
+        return (self.models, self.fields, self.delta, self.epsilon if self.delta else None)
+
+    @property
+    def is_unfiltered(self) -> bool:
+        """Whether this client receives the unmodified ml_predictions broadcast"""
+        return self.models is None and self.fields is None and not self.delta
+
+    @property
+    def is_default(self) -> bool:
+        return self.is_unfiltered and self.spatial_updates
+
+    def apply(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """The part of an ml_predictions message this subscription asked for"""
+        if self.top_fields is None:
+            filtered = dict(response)
+        else:
+            filtered = {key: value for key, value in response.items() if key in self.top_fields}
+
+        predictions = filtered.get('predictions')
+        if isinstance(predictions, dict) and (self.models is not None or self.prediction_keys is not None):
+            selected = {}
+            for name, result in predictions.items():
+                if self.models is not None and name not in self.models:
+                    continue
+                if self.prediction_keys is not None and isinstance(result, dict):
+                    result = {key: value for key, value in result.items() if key in self.prediction_keys}
+                selected[name] = result
+            filtered['predictions'] = selected
+        return filtered
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'models': sorted(self.models) if self.models is not None else None,
+            'fields': sorted(self.fields) if self.fields is not None else None,
+            'delta': self.delta,
+            'epsilon': self.epsilon,
+            'spatial_updates': self.spatial_updates
+        }
+
+
+class DeltaState:
+    """Values last sent to the in-sync clients of one (room, shape)"""
+
+    def __init__(self):
+        self.seq = 0
+        self.values: Optional[Dict[str, Any]] = None
+        self.model_version = None
+
+
+class SubscriptionRouter:
+    """Renders each broadcast once per subscription shape and tracks delta state"""
+
+    def __init__(self):
+        self.subscriptions: Dict[Any, Subscription] = {}
+        self.delta_states: Dict[Tuple[str, Tuple], DeltaState] = {}
+        # (client, room) -> (seq last enqueued, client's drop count at that time)
+        self.client_positions: Dict[Tuple[Any, str], Tuple[int, int]] = {}
+
+        # Statistics
+        self.frames_serialized = 0
+        self.delta_frames = 0
+        self.keyframes = 0
+
+    def set(self, client, subscription: Subscription):
+        """Replace a client's subscription; delta clients restart with a keyframe"""
+        self.remove(client)
+        if not subscription.is_default:
+            self.subscriptions[client] = subscription
+
+    def get(self, client) -> Optional[Subscription]:
+        return self.subscriptions.get(client)
+
+    def wants_spatial_updates(self, client) -> bool:
+        subscription = self.subscriptions.get(client)
+        return subscription is None or subscription.spatial_updates
+
+    def forget(self, client, room_id: str):
+        """A client left a room"""
+        self.client_positions.pop((client, room_id), None)
+
+    def remove(self, client):
+        """Forget a client entirely"""
+        self.subscriptions.pop(client, None)
+        for key in [key for key in self.client_positions if key[0] is client]:
+            del self.client_positions[key]
+
+    def _serialize(self, payload: Dict[str, Any]) -> str:
+        self.frames_serialized += 1
+        return json.dumps(payload)
+
+    def render(self, room_id: str, response: Dict[str, Any], full_message: str,
+               recipients: Dict[Any, int]) -> List[Tuple[Any, str]]:
+        """(client, message) for every recipient of a broadcast
+
+        recipients maps each subscribed client to its outbox's dropped-message
+        count, which tells whether it received every earlier delta frame.
+        """
+        frames: Dict[Tuple, Any] = {}
+        messages = []
+        for client, dropped in recipients.items():
+            subscription = self.subscriptions.get(client)
+            if subscription is None or subscription.is_unfiltered:
+                messages.append((client, full_message))
+                continue
+
+            shape = subscription.shape
+            if shape not in frames:
+                frames[shape] = self._render_shape(room_id, subscription, response)
+            frame = frames[shape]
+            if not subscription.delta:
+                messages.append((client, frame))
+                continue
+
+            seq, delta_message, keyframe_message = frame
+            position = self.client_positions.get((client, room_id))
+            if delta_message is not None and position == (seq - 1, dropped):
+                messages.append((client, delta_message))
+                self.delta_frames += 1
+            else:
+                messages.append((client, keyframe_message()))
+                self.keyframes += 1
+            self.client_positions[(client, room_id)] = (seq, dropped)
+
+        # Delta states of shapes nobody in the room uses any more
+        for key in [key for key in self.delta_states if key[0] == room_id and key[1] not in frames]:
+            del self.delta_states[key]
+        return messages
+
+    def _render_shape(self, room_id: str, subscription: Subscription, response: Dict[str, Any]):
+        """Serialized frame of one shape: a string, or (seq, delta, keyframe factory) in delta mode"""
+        filtered = subscription.apply(response)
+        if not subscription.delta:
+            return self._serialize(filtered)
+
+        state = self.delta_states.setdefault((room_id, subscription.shape), DeltaState())
+        header = {key: filtered[key] for key in HEADER_FIELDS if key in filtered}
+        body = {key: value for key, value in filtered.items() if key not in HEADER_FIELDS}
+
+        changes = None
+        if state.values is not None and state.model_version == filtered.get('model_version'):
+            changes = diff_values(body, state.values, subscription.epsilon)
+        state.seq += 1
+        state.model_version = filtered.get('model_version')
+        state.values = body if changes is None else merge_values(state.values, changes)
+
+        delta_message = None if changes is None else \
+            self._serialize({**header, 'delta': True, 'seq': state.seq, **changes})
+
+        # The keyframe is the in-sync clients' view, so both kinds of client agree afterwards
+        keyframe = []
+        values = state.values
+        seq = state.seq
+
+        def keyframe_message() -> str:
+            if not keyframe:
+                keyframe.append(self._serialize({**header, 'delta': False, 'seq': seq, **values}))
+            return keyframe[0]
+
+        return seq, delta_message, keyframe_message
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'subscribed_clients': len(self.subscriptions),
+            'shapes': len({subscription.shape for subscription in self.subscriptions.values()}),
+            'frames_serialized': self.frames_serialized,
+            'delta_frames': self.delta_frames,
+            'keyframes': self.keyframes
+        }
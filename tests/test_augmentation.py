@@ -0,0 +1,66 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from augmentation import COLUMNS, Recording, augment_dataset, augment_recording, load_augmented
+
+SEED = 0
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Small recordings/ and labels/ tree in the collector's layout"""
+    rng = np.random.default_rng(SEED)
+    (tmp_path / 'recordings').mkdir()
+    (tmp_path / 'labels').mkdir()
+    session_ids = []
+    for index in range(4):
+        session_id = f"synthetic_{index:02d}"
+        count = int(rng.integers(5, 300))
+        left = rng.normal(55, 8, count)
+        right = rng.normal(55, 8, count)
+        samples = [{'leftMic': left[i], 'rightMic': right[i], 'difference': left[i] - right[i],
+                    'averageLevel': (left[i] + right[i]) / 2, 'timestamp': 1000 * i,
+                    'local_timestamp': 1.7e9 + i, 'local_datetime': f'2025-08-12T18:00:{i % 60:02d}'}
+                   for i in range(count)]
+        with open(tmp_path / 'recordings' / f'{session_id}_audio.json', 'w') as f:
+            json.dump(samples, f)
+        with open(tmp_path / 'labels' / f'{session_id}_labels.json', 'w') as f:
+            json.dump({'session_id': session_id, 'duration_seconds': count * 0.5, 'speaker_count': '2',
+                       'meeting_type': 'discussion', 'energy_level': 'medium', 'background_noise': 'low'}, f)
+        session_ids.append(session_id)
+    with open(tmp_path / 'labels' / 'sessions_master.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['session_id'])
+        writer.writerows([session_id] for session_id in session_ids)
+    return tmp_path
+
+
+def test_same_seed_gives_same_dataset_across_process_counts(data_dir):
+    outputs = []
+    for jobs in (1, 2):
+        output = data_dir / f'augmented_{jobs}'
+        augment_dataset(data_dir, output, seed=SEED, variants=20, jobs=jobs)
+        outputs.append(load_augmented(output, mmap=False))
+
+    first, second = outputs
+    assert first['manifest']['sessions'] == 4 * 20
+    for name in first['columns']:
+        assert np.array_equal(first['columns'][name], second['columns'][name], equal_nan=True), name
+    # generated_time is the only label that depends on when the run happened
+    assert ([{**labels, 'generated_time': None} for labels in first['sessions']]
+            == [{**labels, 'generated_time': None} for labels in second['sessions']])
+
+
+def test_identity_variation_reproduces_recording(data_dir):
+    identity = {'time_stretch': 1.0, 'pitch_shift': 0, 'stereo_position': 0, 'background_noise': 'none',
+                'energy_level': 'medium', 'meeting_type': 'discussion'}
+    recording = Recording.load('synthetic_00', data_dir / 'recordings' / 'synthetic_00_audio.json',
+                               data_dir / 'labels' / 'synthetic_00_labels.json')
+
+    variant = augment_recording(recording, 0, [identity], SEED, '')[0]
+
+    for name in COLUMNS:
+        assert np.array_equal(variant['columns'][name], recording.columns[name]), name
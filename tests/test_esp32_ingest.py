@@ -0,0 +1,135 @@
+import json
+import time
+import random
+import socket
+import asyncio
+import contextlib
+
+import pytest
+import websockets
+
+from esp32_ingest import DEFAULT_DEVICE_PORT, DeviceConnection, device_sample, parse_device_spec
+
+SAMPLE_FIELDS = {'leftMic', 'rightMic', 'difference', 'averageLevel', 'timestamp'}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def stand_in_board(port: int, interval: float = 0.05, silent: bool = False, seed: int = 0):
+    """Stand-in for 2micsWebSocket.ino: broadcast level messages to every connected client"""
+    rng = random.Random(seed)
+    clients = set()
+    boot = time.monotonic()
+
+    async def handler(websocket, path=None):
+        clients.add(websocket)
+        try:
+            async for _ in websocket:
+                pass  # The sketch only logs what clients send
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            clients.discard(websocket)
+
+    async with websockets.serve(handler, '127.0.0.1', port):
+        level = 40.0
+        while True:
+            await asyncio.sleep(interval)
+            if silent:
+                continue  # Half-open board: connected, but nothing arrives
+            level = min(80.0, max(20.0, level + rng.gauss(0, 2)))
+            left = level + rng.gauss(0, 1.5)
+            right = level + rng.gauss(0, 1.5)
+            websockets.broadcast(clients, json.dumps({
+                'leftMic': round(left, 2),
+                'rightMic': round(right, 2),
+                'difference': round(left - right, 2),
+                'timestamp': int((time.monotonic() - boot) * 1000),  # millis() since boot
+                'averageLevel': round((left + right) / 2, 2)
+            }))
+
+
+@contextlib.asynccontextmanager
+async def running(coroutine):
+    task = asyncio.ensure_future(coroutine)
+    await asyncio.sleep(0.1)  # Let the server bind
+    try:
+        yield task
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.parametrize('spec, expected', [
+    ('10.0.0.5', ('10.0.0.5', f'ws://10.0.0.5:{DEFAULT_DEVICE_PORT}/')),
+    ('lobby=10.0.0.5:8181', ('lobby', 'ws://10.0.0.5:8181/')),
+    ('lobby=ws://board.local:81/levels', ('lobby', 'ws://board.local:81/levels')),
+])
+def test_parse_device_spec(spec, expected):
+    assert parse_device_spec(spec) == expected
+
+
+def test_device_sample_applies_relay_defaults():
+    sample = device_sample({'leftMic': 40, 'rightMic': 44})
+    assert set(sample) == SAMPLE_FIELDS
+    assert sample['averageLevel'] == 42.0
+    assert sample['difference'] == 0.0
+
+
+def test_reconnects_after_board_restart():
+    async def scenario():
+        port = free_port()
+        received = []
+        connection = DeviceConnection(f"ws://127.0.0.1:{port}/", 'lobby',
+                                      lambda room, sample: received.append((room, sample)),
+                                      stale_timeout=2.0, min_backoff=0.1, max_backoff=0.4)
+        try:
+            async with running(stand_in_board(port)):
+                connection.start()
+                await asyncio.sleep(1.0)
+            before_outage = len(received)
+            assert before_outage > 0
+
+            # The board is gone: attempts fail and the backoff grows up to its cap
+            await asyncio.sleep(1.5)
+            assert not connection.connected
+            assert len(received) == before_outage
+            assert connection.backoff == connection.max_backoff
+
+            async with running(stand_in_board(port, seed=1)):
+                await asyncio.sleep(1.5)
+                assert connection.connected
+                assert len(received) > before_outage
+                # A healthy connection resets the backoff for the next failure
+                assert connection.backoff == connection.min_backoff
+            return received, connection.get_stats()
+        finally:
+            await connection.stop()
+
+    received, stats = asyncio.run(scenario())
+    assert stats['connects'] == 2
+    assert stats['failures'] >= 3
+    assert all(room == 'lobby' and set(sample) == SAMPLE_FIELDS for room, sample in received)
+
+
+def test_silent_board_is_treated_as_disconnected():
+    async def scenario():
+        port = free_port()
+        connection = DeviceConnection(f"ws://127.0.0.1:{port}/", 'lobby', lambda room, sample: None,
+                                      stale_timeout=0.3, min_backoff=0.05, max_backoff=0.1)
+        try:
+            async with running(stand_in_board(port, silent=True)):
+                connection.start()
+                await asyncio.sleep(1.2)
+                return connection.get_stats()
+        finally:
+            await connection.stop()
+
+    stats = asyncio.run(scenario())
+    assert stats['connects'] >= 2  # Dropped after stale_timeout and reconnected
+    assert stats['samples'] == 0
+    assert stats['last_error'] == 'no data for 0.3s'
@@ -0,0 +1,109 @@
+import math
+
+import numpy as np
+import pytest
+
+from feature_engine import RollingFeatureEngine, compute_window_features, sliding_window_features
+
+# NaN/inf samples make NumPy warn inside the batch implementation
+pytestmark = pytest.mark.filterwarnings('ignore::RuntimeWarning')
+
+TRIALS = 64
+RTOL = ATOL = 1e-9
+
+# Features that compare samples against mean/std thresholds. A sample sitting
+# exactly on the threshold may land on either side depending on summation order.
+THRESHOLD_FEATURES = {
+    'high_activity_ratio': lambda m, s: m + s,
+    'low_activity_ratio': lambda m, s: m - s,
+    'activity_variance': lambda m, s: m,
+}
+
+
+def batch_or_none(avg_levels, differences, timestamps):
+    """Batch features, or None where the batch implementation raises"""
+    try:
+        return compute_window_features(avg_levels, differences, timestamps)
+    except ValueError:
+        return None
+
+
+def is_threshold_tie(key, avg_levels):
+    """Whether a mismatch in key is explained by a sample lying on its threshold"""
+    if key not in THRESHOLD_FEATURES:
+        return False
+    threshold = THRESHOLD_FEATURES[key](np.mean(avg_levels), np.std(avg_levels))
+    return bool(np.any(np.isclose(avg_levels, threshold, rtol=1e-9, atol=1e-9)))
+
+
+def random_stream(rng, style, length, hole_rate):
+    """Average levels, differences and timestamps of one of four stream styles"""
+    if style == 0:  # realistic levels
+        avg = rng.normal(55, 12, length)
+        diff = rng.normal(0, 4, length)
+    elif style == 1:  # coarse integer levels: ties, plateaus, zero differences
+        avg = rng.integers(35, 45, length).astype(float)
+        diff = rng.integers(-3, 4, length).astype(float)
+    elif style == 2:  # constant windows
+        avg = np.full(length, float(rng.integers(0, 80)))
+        diff = np.zeros(length)
+    else:  # sparse NaN/inf samples
+        avg = rng.normal(50, 10, length)
+        diff = rng.normal(0, 3, length)
+        for arr in (avg, diff):
+            holes = rng.random(length) < hole_rate
+            arr[holes] = rng.choice([np.nan, np.inf, -np.inf], holes.sum())
+    timestamps = np.cumsum(rng.integers(900, 1100, length)).astype(float)
+    if style == 3 and length > 3:
+        timestamps[rng.integers(0, length)] = np.nan
+    return avg, diff, timestamps
+
+
+def mismatched_features(expected, actual, avg_levels):
+    """Features whose values differ beyond tolerance (and not by a threshold tie)"""
+    assert list(expected) == list(actual)
+    return {key: (expected[key], actual[key]) for key in expected
+            if not math.isclose(expected[key], actual[key], rel_tol=RTOL, abs_tol=ATOL)
+            and not is_threshold_tie(key, avg_levels)}
+
+
+@pytest.mark.parametrize('trial', range(TRIALS))
+def test_rolling_engine_matches_batch(trial):
+    rng = np.random.default_rng(trial)
+    capacity = int(rng.integers(1, 200))
+    length = int(rng.integers(1, 3 * capacity + 2))
+    avg, diff, timestamps = random_stream(rng, trial % 4, length, hole_rate=0.02)
+
+    engine = RollingFeatureEngine(capacity)
+    for i in range(length):
+        engine.append(avg[i], diff[i], timestamps[i])
+        start = max(0, i + 1 - capacity)
+        expected = batch_or_none(avg[start:i + 1], diff[start:i + 1], timestamps[start:i + 1])
+        actual = engine.features()
+
+        if expected is None or actual is None:
+            assert expected is None and actual is None, f"sample {i}: batch={expected is not None} rolling={actual is not None}"
+        else:
+            assert mismatched_features(expected, actual, avg[start:i + 1]) == {}, f"sample {i} (capacity {capacity})"
+
+
+@pytest.mark.parametrize('trial', range(TRIALS))
+def test_sliding_window_features_match_batch(trial):
+    rng = np.random.default_rng(trial)
+    window = int(rng.integers(1, 200))
+    length = int(rng.integers(1, 4 * window + 2))
+    stride = int(rng.integers(1, 8))
+    avg, diff, timestamps = random_stream(rng, trial % 4, length, hole_rate=0.005)
+
+    starts, features = sliding_window_features(avg, diff, timestamps, window=window, stride=stride)
+    assert list(starts) == list(range(0, length - window + 1, stride))
+
+    for row, start in enumerate(starts):
+        end = start + window
+        expected = batch_or_none(avg[start:end], diff[start:end], timestamps[start:end])
+        actual = {name: float(values[row]) for name, values in features.items()}
+
+        if expected is None:
+            assert all(math.isnan(value) for value in actual.values()), f"start {start}"
+        else:
+            assert mismatched_features(expected, actual, avg[start:end]) == {}, f"start {start} (window {window})"
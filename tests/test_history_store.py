@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+
+from history_store import HistoryStore, room_directory_name
+
+
+def record(store, room_id, received_at, rows=10):
+    store.record_samples(room_id, np.random.default_rng(0).random((5, rows)), received_at=received_at)
+    store.record_prediction(room_id, '{"type": "ml_predictions"}', received_at=received_at)
+    store.flush()
+
+
+def test_sweep_removes_idle_room_past_retention(tmp_path):
+    store = HistoryStore(str(tmp_path), retention_seconds=60)
+    now = time.time() * 1000
+    record(store, 'finished', now - 3600 * 1000)
+    record(store, 'live', now)
+    store.close_room('finished')
+
+    store.sweep_retention()
+
+    assert not (tmp_path / room_directory_name('finished')).exists()
+    assert list(store.query_samples('finished', 0, float('inf'))) == []
+    assert sum(len(chunk['timestamp']) for chunk in store.query_samples('live', 0, float('inf'))) == 10
+    assert store.get_stats()['rooms_removed'] == 1
+    store.close()
+
+
+def test_sweep_keeps_recent_idle_room(tmp_path):
+    store = HistoryStore(str(tmp_path), retention_seconds=3600)
+    record(store, 'recent', time.time() * 1000 - 60 * 1000)
+    store.close_room('recent')
+
+    store.sweep_retention()
+
+    assert sum(len(chunk['timestamp']) for chunk in store.query_samples('recent', 0, float('inf'))) == 10
+    store.close()
+
+
+def test_sweep_limits_segments_of_idle_room(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_samples=10)
+    now = time.time() * 1000
+    for index in range(5):
+        record(store, 'idle', now + index)
+    store.close_room('idle')
+
+    store.max_segments = 2
+    store.sweep_retention()
+
+    directory = tmp_path / room_directory_name('idle')
+    assert len(list(directory.glob('samples_*.seg'))) == 2
+    assert sum(len(chunk['timestamp']) for chunk in store.query_samples('idle', 0, float('inf'))) == 20
+    store.close()
+
+
+def test_open_room_keeps_segment_being_written(tmp_path):
+    store = HistoryStore(str(tmp_path), retention_seconds=60)
+    record(store, 'open', time.time() * 1000 - 3600 * 1000)
+
+    store.sweep_retention()
+
+    assert len(list((tmp_path / 'open').glob('samples_*.seg'))) == 1
+    store.close()
@@ -0,0 +1,28 @@
+import json
+import random
+
+import pytest
+
+from offline_scoring import iter_json_array
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 1 << 16])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_iter_json_array_matches_json_load(tmp_path, chunk_size, indent):
+    rng = random.Random(chunk_size)
+    samples = [{'leftMic': rng.uniform(30, 80), 'rightMic': rng.uniform(30, 80), 'timestamp': i * 512,
+                'local_datetime': '2025-08-12T18:00:00'} for i in range(200)]
+    items = samples + [123456789, -0.5, 'x]', [1, [2]]]
+    path = tmp_path / 'session_audio.json'
+    path.write_text(json.dumps(items, indent=indent))
+
+    assert list(iter_json_array(path, chunk_size)) == items
+
+
+@pytest.mark.parametrize('text', ['', 'not json', '{"leftMic": 1}', '[1, 2', '[1 2]', '[1,,2]', '[,1]', '[1,]'])
+def test_iter_json_array_rejects_malformed_files(tmp_path, text):
+    path = tmp_path / 'session_audio.json'
+    path.write_text(text)
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(path, chunk_size=3))
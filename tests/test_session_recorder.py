@@ -0,0 +1,56 @@
+import csv
+import json
+
+from session_recorder import MASTER_CSV_NAME, SessionRecorder, finalize_session, unfinished_sessions
+
+
+def synthetic_samples(count):
+    return [{'leftMic': 40 + i % 17, 'rightMic': 41 + i % 13, 'difference': (i % 17) - (i % 13) - 1,
+             'averageLevel': 40.5 + i % 11, 'timestamp': i * 512, 'local_timestamp': 1.7e9 + i,
+             'local_datetime': f'2025-08-12T18:{i // 60 % 60:02d}:{i % 60:02d}'} for i in range(count)]
+
+
+def test_crash_resume_and_finalize(tmp_path):
+    sent = synthetic_samples(20000)
+    half = len(sent) // 2
+    recorder = SessionRecorder.start(str(tmp_path), session_id='check', labels={'esp32_ip': '127.0.0.1'},
+                                     fsync_interval=0.05)
+    for sample in sent[:half]:
+        recorder.add_sample(sample)
+    recorder.add_label('meeting_type', 'discussion')
+    recorder.close()  # As if the collector died: the journal stays unfinished
+
+    with open(recorder.journal_path, 'a') as f:
+        f.write('{"leftMic": 4')  # Torn write
+    assert unfinished_sessions(str(tmp_path)) == ['check']
+
+    resumed = SessionRecorder.resume('check', str(tmp_path))
+    for sample in sent[half:]:
+        resumed.add_sample(sample)
+    paths = resumed.stop()
+
+    with open(paths['audio']) as f:
+        text = f.read()
+    assert json.loads(text) == sent
+    # Streamed output is byte-identical to the collector's json.dump(indent=2)
+    assert text == json.dumps(sent, indent=2)
+    with open(paths['labels']) as f:
+        labels = json.load(f)
+    assert labels['sample_count'] == len(sent)
+    assert labels['meeting_type'] == 'discussion'
+    with open(tmp_path / 'labels' / MASTER_CSV_NAME, newline='') as f:
+        assert [row['session_id'] for row in csv.DictReader(f)] == ['check']
+    assert unfinished_sessions(str(tmp_path)) == []
+
+
+def test_finalize_unfinished_session_as_is(tmp_path):
+    recorder = SessionRecorder.start(str(tmp_path), session_id='crashed')
+    for sample in synthetic_samples(100):
+        recorder.add_sample(sample)
+    recorder.close()
+
+    paths = finalize_session('crashed', tmp_path)
+
+    with open(paths['audio']) as f:
+        assert json.load(f) == synthetic_samples(100)
+    assert unfinished_sessions(str(tmp_path)) == []